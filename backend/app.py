@@ -1,11 +1,20 @@
+from config import Config
+import os
+
+# Startprofil (Import- und Initialisierungszeiten), muss vor den übrigen Importen aktiv sein
+startup_profiler = None
+if Config.STARTUP_PROFILE:
+    from services.startup_profiler import StartupProfiler
+    startup_profiler = StartupProfiler().install()
+
 from flask import Flask
 from routes import routes
-import os
+from services.container import container
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object('config.Config')  # Lädt bereits alle Konfigurationen
-    
+
     # Erstelle die notwendigen Ordner
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
@@ -14,7 +23,15 @@ def create_app():
     app.register_blueprint(routes)
     return app
 
-app = create_app()
+if startup_profiler:
+    with startup_profiler.step('create_app'):
+        app = create_app()
+    startup_profiler.uninstall()
+    startup_profiler.report()
+    # Services, die erst später erstellt werden, melden ihre Initialisierungszeit selbst
+    container.verbose = True
+else:
+    app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=8000, debug=True)
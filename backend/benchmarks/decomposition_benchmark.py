@@ -0,0 +1,87 @@
+# Vergleicht die Optimierung als eine Anfrage mit der geografischen Zerlegung (ClusteredSolver)
+# Gemessen wird mit dem lokalen Optimierer, damit kein Netzwerkzugriff nötig ist
+#
+# Aufruf aus dem backend-Ordner:
+#   python -m benchmarks.decomposition_benchmark --sizes 200,500,1000,2000 --budget 5
+import argparse
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from services.decomposition import ClusteredSolver
+from services.route_solvers import LocalSolver
+
+
+def build_request(shipment_count, vehicle_count, seed=42):
+    # Anfrage im Format von build_request mit zufälligen Orten im Kreisgebiet
+    rng = random.Random(seed)
+
+    def location():
+        return {'latitude': 51.0 + rng.uniform(-0.3, 0.3), 'longitude': 7.5 + rng.uniform(-0.5, 0.5)}
+
+    shipments = [{'pickups': [{'arrival_location': location(), 'duration': '1800s'}]}
+                 for _ in range(shipment_count)]
+    vehicles = []
+    for _ in range(vehicle_count):
+        depot = location()
+        vehicles.append({
+            'start_location': depot,
+            'end_location': depot,
+            'cost_per_hour': 1,
+            'route_duration_limit': {
+                'max_duration': '27000s',
+                'soft_max_duration': '25200s',
+                'cost_per_hour_after_soft_max': 2
+            }
+        })
+    return {
+        'model': {
+            'shipments': shipments,
+            'vehicles': vehicles,
+            'global_start_time': '2025-01-06T07:00:00Z',
+            'global_end_time': '2025-01-06T17:00:00Z'
+        }
+    }
+
+
+def summarize(response):
+    # (zugewiesene Besuche, Summe der Routendauern in Stunden)
+    assigned = sum(len(route.visits) for route in response.routes)
+    hours = sum((route.vehicle_end_time - route.vehicle_start_time).total_seconds()
+                for route in response.routes if route.visits) / 3600
+    return assigned, hours
+
+
+def run(sizes, budget, cluster_size, workers):
+    for size in sizes:
+        request = build_request(size, max(2, size // 8))
+        print(f"{size} Besuche, {len(request['model']['vehicles'])} Pflegekräfte")
+        solvers = [
+            ('gesamt  ', LocalSolver(time_budget=budget)),
+            ('zerlegt ', ClusteredSolver(LocalSolver(time_budget=budget), cluster_size=cluster_size,
+                                         min_shipments=0, max_workers=workers))
+        ]
+        for label, solver in solvers:
+            started = time.perf_counter()
+            response = solver.solve(request)
+            seconds = time.perf_counter() - started
+            assigned, hours = summarize(response)
+            print(f"  {label}{seconds:7.2f}s  {assigned}/{size} zugewiesen, {hours:.1f} h gesamt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark der geografischen Zerlegung')
+    parser.add_argument('--sizes', default='200,500,1000,2000')
+    parser.add_argument('--budget', type=float, default=5.0, help='Zeitbudget je Optimierung in Sekunden')
+    parser.add_argument('--cluster-size', type=int, default=60)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    run([int(size) for size in args.sizes.split(',')], args.budget, args.cluster_size, args.workers)
+
+
+if __name__ == '__main__':
+    main()
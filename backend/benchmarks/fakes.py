@@ -0,0 +1,101 @@
+# Deterministische Ersatz-Clients für googlemaps.Client und RouteOptimizationClient
+# Sie arbeiten ohne Netzwerk und simulieren die Antwortzeit über eine konfigurierbare Latenz
+import hashlib
+import time
+from datetime import timedelta
+
+# Mittelpunkt und Ausdehnung der erzeugten Koordinaten (Oberbergischer Kreis)
+CENTER_LAT = 51.03
+CENTER_LNG = 7.56
+SPREAD = 0.15
+
+
+def fake_location(address):
+    # Gleiche Adresse ergibt immer die gleiche Koordinate (unabhängig von PYTHONHASHSEED)
+    digest = hashlib.md5(str(address).encode('utf-8')).digest()
+    lat = CENTER_LAT + (int.from_bytes(digest[:4], 'big') / 2**32 - 0.5) * SPREAD
+    lng = CENTER_LNG + (int.from_bytes(digest[4:8], 'big') / 2**32 - 0.5) * SPREAD
+    return round(lat, 6), round(lng, 6)
+
+
+class FakeGoogleMapsClient:
+    # Ersetzt googlemaps.Client (Geocoding und Distance Matrix)
+    latency = 0.0
+
+    def __init__(self, key=None, *args, **kwargs):
+        self.calls = {'geocode': 0, 'distance_matrix': 0}
+
+    def geocode(self, address, *args, **kwargs):
+        self.calls['geocode'] += 1
+        time.sleep(self.latency)
+        lat, lng = fake_location(address)
+        return [{'geometry': {'location': {'lat': lat, 'lng': lng}}}]
+
+    def distance_matrix(self, origins, destinations, *args, **kwargs):
+        # Luftlinie * 1.3 bei 45 km/h, wie die lokale Schätzung des Optimierers
+        from services.local_solver import haversine_travel
+        self.calls['distance_matrix'] += 1
+        time.sleep(self.latency)
+        rows = []
+        for origin in origins:
+            elements = []
+            for destination in destinations:
+                seconds, meters = haversine_travel(origin, destination)
+                elements.append({
+                    'status': 'OK',
+                    'duration': {'value': seconds},
+                    'distance': {'value': meters}
+                })
+            rows.append({'elements': elements})
+        return {'rows': rows}
+
+
+class FakeRouteOptimizationClient:
+    # Ersetzt routeoptimization_v1.RouteOptimizationClient
+    # Verteilt die Besuche reihum auf die Fahrzeuge (30 Minuten je Besuch)
+    latency = 0.0
+
+    def __init__(self, *args, **kwargs):
+        self.calls = 0
+
+    def optimize_tours(self, request, *args, **kwargs):
+        from google.maps import routeoptimization_v1
+
+        self.calls += 1
+        time.sleep(self.latency)
+        model = request.model
+        vehicle_count = len(model.vehicles)
+        if vehicle_count == 0:
+            return routeoptimization_v1.OptimizeToursResponse()
+
+        visits = [[] for _ in range(vehicle_count)]
+        for index in range(len(model.shipments)):
+            visits[index % vehicle_count].append(index)
+
+        start = model.global_start_time
+        routes = []
+        for vehicle_index, shipment_indices in enumerate(visits):
+            if not shipment_indices:
+                routes.append({'vehicle_index': vehicle_index})
+                continue
+            routes.append({
+                'vehicle_index': vehicle_index,
+                'vehicle_start_time': start,
+                'vehicle_end_time': start + timedelta(minutes=30 * len(shipment_indices)),
+                'visits': [
+                    {'shipment_index': shipment_index, 'start_time': start + timedelta(minutes=30 * position)}
+                    for position, shipment_index in enumerate(shipment_indices)
+                ]
+            })
+        return routeoptimization_v1.OptimizeToursResponse(routes=routes)
+
+
+def install(geocode_latency=0.0, optimize_latency=0.0):
+    # Ersetzt die Google-Clients prozessweit; muss vor dem Import der Services aufgerufen werden
+    import googlemaps
+    from google.maps import routeoptimization_v1
+
+    FakeGoogleMapsClient.latency = geocode_latency
+    FakeRouteOptimizationClient.latency = optimize_latency
+    googlemaps.Client = FakeGoogleMapsClient
+    routeoptimization_v1.RouteOptimizationClient = FakeRouteOptimizationClient
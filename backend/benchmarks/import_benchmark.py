@@ -0,0 +1,147 @@
+# Vergleicht den zeilenweisen Import (vorher) mit dem spaltenweisen Import (nachher)
+#
+# Aufruf aus dem backend-Ordner:
+#   python -m benchmarks.import_benchmark --rows 10000
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Der Benchmark benötigt keine echten Google-Zugangsdaten
+TMP_DIR = tempfile.mkdtemp(prefix='import_benchmark_')
+os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'AIza-benchmark')
+os.environ['GEOCODE_CACHE_FILE'] = os.path.join(TMP_DIR, 'geocode_cache.json')
+
+import pandas as pd
+
+from models import Patient, Vehicle, ModelStore, vehicles
+from services.file_service import FileService
+from benchmarks.synthetic import build_patient_frame, build_vehicle_frame
+
+def fake_geocode_all(addresses):
+    # Deterministisches Geocoding ohne Netzwerk
+    return {key: (50.9 + (hash(key) % 1000) / 1e4, 7.5 + (hash(key) % 777) / 1e4) for key in addresses}
+
+
+# Patientenliste eines Tages wie vor der Umstellung (ein Speicher, zeilenweise befüllt)
+patients = ModelStore()
+
+
+def legacy_import_patients(service, df, weekday):
+    # Zeilenweiser Import wie vor der Umstellung (iterrows + Series-Zugriffe)
+    patients.clear()
+    df_filtered = df[df[weekday].isin(service.VALID_VISIT_TYPES)].copy()
+    for _, row in df_filtered.iterrows():
+        name = f"{row['Vorname']} {row['Nachname']}"
+        address = f"{row['Strasse']}, {row['PLZ']} {row['Ort']}"
+        time_info = str(row.get(f"Uhrzeit/Info {weekday}", ""))
+        time_info = "" if time_info.lower() == "nan" else time_info
+        phone1 = str(row.get('Telefon', "")).strip()
+        phone2 = str(row.get('Telefon2', "")).strip()
+        phone1 = "" if phone1.lower() == "nan" else phone1
+        phone2 = "" if phone2.lower() == "nan" else phone2
+        phone_numbers = f"{phone1}\n{phone2}" if phone1 and phone2 else phone1 or phone2 or ""
+        lat, lon = service.geocode_address(address)
+        patients.append(Patient(name, address, row[weekday], time_info, phone_numbers, lat, lon))
+
+
+def legacy_import_vehicles(service, df):
+    # Zeilenweiser Import wie vor der Umstellung (iterrows + Series-Zugriffe)
+    vehicles.clear()
+    for _, row in df.iterrows():
+        address = f"{row['Strasse']}, {row['PLZ']} {row['Ort']}"
+        lat, lon = service.geocode_address(address)
+        try:
+            stellenumfang = int(float(row['Stellenumfang']))
+        except:
+            stellenumfang = 100
+        vehicles.append(Vehicle(
+            name=f"{row['Vorname']} {row['Nachname']}",
+            start_address=address,
+            lat=lat,
+            lon=lon,
+            stellenumfang=max(0, min(100, stellenumfang)),
+            funktion=row.get('Funktion', '')
+        ))
+
+
+def time_call(fn, repeat):
+    # Gibt die beste Laufzeit in Sekunden zurück
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(rows, repeat):
+    service = FileService()
+    service.batch_geocoder.geocode_all = fake_geocode_all
+    service.batch_geocoder.geocode = lambda address: fake_geocode_all({address: address})[address]
+
+    patient_df = build_patient_frame(rows)
+    vehicle_df = build_vehicle_frame(rows)
+
+    # Excel-Parsing wird getrennt gemessen, da es für beide Varianten identisch ist
+    patient_file = os.path.join(TMP_DIR, 'patients.xlsx')
+    patient_df.to_excel(patient_file, index=False)
+    parse_time = time_call(lambda: pd.read_excel(patient_file), 1)
+    # Streaming-Parser je Format (nur benötigte Spalten)
+    csv_file = os.path.join(TMP_DIR, 'patients.csv')
+    parquet_file = os.path.join(TMP_DIR, 'patients.parquet')
+    patient_df.to_csv(csv_file, index=False, sep=';')
+    stream_times = {
+        'xlsx': time_call(lambda: service.read_patient_file(patient_file), 1),
+        'csv': time_call(lambda: service.read_patient_file(csv_file), 1)
+    }
+    try:
+        patient_df.to_parquet(parquet_file, index=False)
+        stream_times['parquet'] = time_call(lambda: service.read_patient_file(parquet_file), 1)
+    except ImportError:
+        pass
+
+    # Cache vorwärmen, damit nur die Verarbeitung gemessen wird
+    service.import_patients(patient_df.copy(), 'Montag')
+    service.import_vehicles(vehicle_df.copy())
+    for _, row in vehicle_df.iterrows():
+        service.geocode_address(f"{row['Strasse']}, {row['PLZ']} {row['Ort']}")
+    for _, row in patient_df.iterrows():
+        service.geocode_address(f"{row['Strasse']}, {row['PLZ']} {row['Ort']}")
+
+    results = {
+        'rows': rows,
+        'excel_parse_s': parse_time,
+        'stream_parse_s': stream_times,
+        'patients_before_s': time_call(lambda: legacy_import_patients(service, patient_df, 'Montag'), repeat),
+        'patients_after_s': time_call(lambda: service.import_patients(patient_df.copy(), 'Montag'), repeat),
+        'vehicles_before_s': time_call(lambda: legacy_import_vehicles(service, vehicle_df), repeat),
+        'vehicles_after_s': time_call(lambda: service.import_vehicles(vehicle_df.copy()), repeat),
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-Benchmark (zeilenweise vs. spaltenweise)')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat)
+    print(f"Zeilen: {results['rows']}")
+    print(f"Excel-Parsing:          {results['excel_parse_s']:.3f}s")
+    for extension, seconds in results['stream_parse_s'].items():
+        print(f"{'Streaming ' + extension + ':':<24}{seconds:.3f}s")
+    for label, key in [('Patienten', 'patients'), ('Mitarbeiter', 'vehicles')]:
+        before = results[f'{key}_before_s']
+        after = results[f'{key}_after_s']
+        print(f"{label + ':':<24}{before:.3f}s -> {after:.3f}s ({before / after:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# Vergleicht den PDF-Export mit einem Dokument je Mitarbeiter + PdfMerger (vorher)
+# mit dem Export in einem Durchlauf bzw. parallel in mehreren Prozessen (nachher)
+#
+# Aufruf aus dem backend-Ordner:
+#   python -m benchmarks.pdf_benchmark --vehicles 40 --stops 12 --workers 4
+import argparse
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from config import Config
+from pypdf import PdfMerger, PdfReader
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate
+
+from services.pdf_service import render_route_pdf, _create_route_section
+
+STREETS = ['Hauptstraße', 'Ringstraße', 'Wiesenweg', 'Bergstr.', 'Kölner Str.', 'Am Markt', 'Lindenallee']
+
+
+def build_routes(vehicle_count, stops_per_route, seed=42):
+    # Erzeugt optimierte Routen im Format von process_optimization_result
+    rng = random.Random(seed)
+    routes = []
+    for v in range(vehicle_count):
+        stops = [{
+            'patient': f"Nachname{v}_{i}, Vorname",
+            'address': f"{rng.choice(STREETS)} {rng.randint(1, 60)}, 51643 Gummersbach",
+            'visit_type': rng.choice(['HB', 'HB', 'NA', 'TK']),
+            'time_info': rng.choice(['', 'vormittags', 'ab 14 Uhr']),
+            'phone_numbers': '02261 12345,0171 1234567',
+            'location': {'lat': 51.0, 'lng': 7.5}
+        } for i in range(stops_per_route)]
+        routes.append({
+            'vehicle': f"Mitarbeiter {v}",
+            'funktion': 'Pflegekraft',
+            'duration_hrs': round(rng.uniform(3, 8), 2),
+            'max_hours': 7.0,
+            'stops': stops
+        })
+    unassigned = [dict(stop, visit_type='HB') for stop in routes[0]['stops'][:5]]
+    tk = [dict(stop, visit_type='TK') for stop in routes[-1]['stops'][:5]]
+    return routes, tk, unassigned
+
+
+def legacy_create_route_pdf(optimized_routes):
+    # Bisheriger Ablauf: ein vollständiges Dokument je Mitarbeiter, danach PdfMerger
+    merger = PdfMerger()
+    for route in optimized_routes:
+        if not route['stops']:
+            continue
+        output = BytesIO()
+        doc = SimpleDocTemplate(output, pagesize=landscape(A4), rightMargin=1*cm, leftMargin=1*cm,
+                                topMargin=1*cm, bottomMargin=1*cm)
+        styles = getSampleStyleSheet()
+        title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=14,
+                                     spaceAfter=20, alignment=1)
+        doc.build(_create_route_section(route, title_style, styles))
+        merger.append(BytesIO(output.getvalue()))
+    output = BytesIO()
+    merger.write(output)
+    merger.close()
+    return output
+
+
+def run(vehicle_count, stops_per_route):
+    routes, tk, unassigned = build_routes(vehicle_count, stops_per_route)
+    print(f"{vehicle_count} Mitarbeiter, {stops_per_route} Stopps je Route")
+
+    started = time.perf_counter()
+    legacy = legacy_create_route_pdf(routes)
+    legacy_seconds = time.perf_counter() - started
+    legacy_pages = len(PdfReader(legacy).pages)
+    print(f"  vorher   {legacy_seconds:7.3f}s  {legacy_pages} Seiten (ohne unzugewiesene Abschnitte)")
+
+    for parallel in (False, True):
+        # Erster paralleler Lauf startet die Prozesse, gemessen wird der zweite
+        runs = 2 if parallel else 1
+        for _ in range(runs):
+            _, stats = render_route_pdf(routes, tk, unassigned, 'Montag', '01_01_2025', parallel=parallel)
+        label = 'parallel' if parallel else 'einfach '
+        print(f"  {label} {stats['seconds']:7.3f}s  {stats['pages']} Seiten, "
+              f"{stats['workers']} Prozess(e), Peak RSS {stats['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PDF-Export-Benchmark')
+    parser.add_argument('--vehicles', type=int, default=40)
+    parser.add_argument('--stops', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=Config.PDF_WORKERS)
+    args = parser.parse_args()
+    Config.PDF_WORKERS = args.workers
+    run(args.vehicles, args.stops)
+
+
+if __name__ == '__main__':
+    main()
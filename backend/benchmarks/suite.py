@@ -0,0 +1,192 @@
+# Misst die einzelnen Verarbeitungsschritte mit synthetischen Listen und Google-Ersatz-Clients
+#
+# Aufruf aus dem backend-Ordner:
+#   python -m benchmarks.suite --sizes 50,500,5000,50000 --output benchmark_results.json
+#   python -m benchmarks.suite --sizes 500 --compare benchmark_results.json
+#
+# Gemessene Schritte je Größe:
+#   excel_parse, geocode_cold, geocode_warm, import, build_request, optimize,
+#   process_result, get_markers, pdf_export
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_SIZES = [50, 500, 5000, 50000]
+
+
+def configure_environment(work_dir, geocode_qps):
+    # Alle Dateien (Uploads, Caches, Matrix) landen im Arbeitsordner des Benchmarks
+    os.chdir(work_dir)
+    os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'AIza-benchmark')
+    os.environ.setdefault('GOOGLE_PROJECT_ID', 'benchmark')
+    os.environ.setdefault('FLASK_SECRET_KEY', 'benchmark')
+    os.environ['ROUTE_SOLVER'] = 'google'
+    os.environ['STATE_STORE'] = 'memory'
+    os.environ['GEOCODE_QPS'] = str(geocode_qps)
+    os.environ['GEOCODE_CACHE_FILE'] = os.path.join(work_dir, 'data', 'geocode_cache.json')
+    os.environ['RESULT_CACHE_DIR'] = os.path.join(work_dir, 'data', 'result_cache')
+    os.environ['TRAVEL_MATRIX_FILE'] = os.path.join(work_dir, 'data', 'travel_matrix.npz')
+
+
+class StageTimer:
+    # Sammelt die Laufzeiten der einzelnen Schritte
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.perf_counter() - start, 4)
+
+
+def run_size(size, work_dir, app):
+    # Führt alle Schritte für eine Listengröße aus und gibt {stage: Sekunden} zurück
+    import pandas as pd
+    from config import Config
+    from models import get_active_nurses, get_active_vehicles, get_day_patients, get_home_visit_patients, get_tk_patients, vehicles
+    from routes import route_optimization_service
+    from services.file_service import FileService
+    from services.pdf_service import render_route_pdf
+    from benchmarks.synthetic import write_workbooks
+
+    patient_file, vehicle_file = write_workbooks(os.path.join(work_dir, 'workbooks'), size, size)
+
+    # Jede Größe beginnt mit einem leeren Geocoding-Cache
+    Config.GEOCODE_CACHE_FILE = os.path.join(work_dir, 'data', f'geocode_cache_{size}.json')
+    service = FileService()
+    timer = StageTimer()
+
+    with timer.stage('excel_parse'):
+        patient_df = service.read_patient_file(patient_file)
+        vehicle_df = service.read_vehicle_file(vehicle_file)
+
+    address_df = pd.concat([patient_df[['Strasse', 'PLZ', 'Ort']], vehicle_df[['Strasse', 'PLZ', 'Ort']]])
+    with timer.stage('geocode_cold'):
+        service.geocode_rows(address_df)
+    with timer.stage('geocode_warm'):
+        service.geocode_rows(address_df)
+
+    with timer.stage('import'):
+        service.import_patients(patient_df, 'Montag')
+        service.import_vehicles(vehicle_df)
+
+    patients = get_day_patients('Montag')
+    non_tk_patients = get_home_visit_patients(patients)
+    tk_patients = get_tk_patients(patients)
+    available_vehicles = get_active_nurses(vehicles)
+    all_active_vehicles = get_active_vehicles(vehicles)
+
+    with timer.stage('build_request'):
+        request = route_optimization_service.build_request(non_tk_patients, available_vehicles, 'Montag', 2)
+
+    with timer.stage('optimize'):
+        response = route_optimization_service.get_solver('google').solve(request)
+
+    with timer.stage('process_result'):
+        optimized_routes, regular_stops, tk_stops = route_optimization_service.process_optimization_result(
+            response, available_vehicles, all_active_vehicles, non_tk_patients, tk_patients
+        )
+
+    client = app.test_client()
+    with timer.stage('get_markers'):
+        markers = client.get('/get_markers')
+        markers.get_data()
+
+    with timer.stage('pdf_export'):
+        _, pdf_stats = render_route_pdf(optimized_routes, tk_stops, regular_stops, 'Montag', '06_01_2025')
+
+    return {
+        'rows': size,
+        'patients': len(patients),
+        'home_visits': len(non_tk_patients),
+        'vehicles': len(vehicles),
+        'nurses': len(available_vehicles),
+        'unique_geocodes': service.gmaps.calls['geocode'],
+        'pdf_pages': pdf_stats['pages'],
+        'stages': timer.stages
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    # Tabelle je Größe; mit baseline zusätzlich der Faktor gegenüber dem früheren Lauf
+    baseline_runs = {run['rows']: run for run in (baseline or {}).get('runs', [])}
+    for run in results['runs']:
+        print(f"\n{run['rows']} Zeilen ({run['home_visits']} Hausbesuche, {run['nurses']} Pflegekräfte, "
+              f"{run['unique_geocodes']} Geocodierungen, {run['pdf_pages']} PDF-Seiten)")
+        previous = baseline_runs.get(run['rows'], {}).get('stages', {})
+        for stage, seconds in run['stages'].items():
+            line = f"  {stage:<16}{seconds:9.4f}s"
+            if previous.get(stage):
+                line += f"  ({seconds / previous[stage]:.2f}x gegenüber Vergleichslauf)"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark-Suite mit synthetischen Listen')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES))
+    parser.add_argument('--geocode-latency', type=float, default=0.02, help='Sekunden je Geocoding-Anfrage')
+    parser.add_argument('--optimize-latency', type=float, default=0.5, help='Sekunden je optimize_tours-Aufruf')
+    parser.add_argument('--geocode-qps', type=float, default=0, help='QPS-Limit beim Geocoding (0 = ohne)')
+    parser.add_argument('--output', help='Ergebnisse als JSON speichern')
+    parser.add_argument('--compare', help='Früheres JSON-Ergebnis zum Vergleich')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    work_dir = tempfile.mkdtemp(prefix='benchmark_suite_')
+    configure_environment(work_dir, args.geocode_qps)
+
+    from benchmarks import fakes
+    fakes.install(geocode_latency=args.geocode_latency, optimize_latency=args.optimize_latency)
+    from app import app
+
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {
+            'geocode_latency': args.geocode_latency,
+            'optimize_latency': args.optimize_latency,
+            'geocode_qps': args.geocode_qps
+        },
+        'runs': []
+    }
+    for size in (int(size) for size in args.sizes.split(',')):
+        results['runs'].append(run_size(size, work_dir, app))
+
+    print_results(results, baseline)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nErgebnisse gespeichert: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Synthetische Patienten- und Mitarbeiterlisten im Format der Dateien in example_import_files
+import os
+import random
+
+import pandas as pd
+
+WEEKDAYS = ['Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag']
+STREETS = ['Hauptstraße', 'Ringstraße', 'Wiesenweg', 'Bergstr.', 'Kölner Str.', 'Am Markt', 'Lindenallee']
+PLACES = [(51643, 'Gummersbach'), (51645, 'Gummersbach'), (51647, 'Bergneustadt'), (51702, 'Bergneustadt')]
+FUNCTIONS = ['Pflegekraft', 'Arzt', 'Honorararzt', 'Physiotherapie', 'PDL']
+
+
+def build_patient_frame(rows, seed=42):
+    # Erzeugt eine synthetische Patientenliste im Format von patient_examples.xlsx
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        plz, ort = rng.choice(PLACES)
+        record = {
+            'Vorname': f"Vorname{i}",
+            'Nachname': f"Nachname{i}",
+            'Strasse': f"{rng.choice(STREETS)} {rng.randint(1, 60)}",
+            'PLZ': plz,
+            'Ort': ort,
+            'Telefon': f"02261/{rng.randint(100000, 999999)}" if rng.random() < 0.9 else None,
+            'Telefon2': f"0171/{rng.randint(1000000, 9999999)}" if rng.random() < 0.3 else None,
+            'KW': 2
+        }
+        for day in WEEKDAYS:
+            record[day] = rng.choice(['HB', 'HB', 'TK', 'NA', None])
+            record[f"Uhrzeit/Info {day}"] = rng.choice(['vormittags', 'nachmittags', '10:00', None])
+        records.append(record)
+    return pd.DataFrame(records)
+
+
+def build_vehicle_frame(rows, seed=42):
+    # Erzeugt eine synthetische Mitarbeiterliste im Format von employee_examples.xlsx
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        plz, ort = rng.choice(PLACES)
+        records.append({
+            'Vorname': f"Vorname{i}",
+            'Nachname': f"Nachname{i}",
+            'Strasse': f"{rng.choice(STREETS)} {rng.randint(1, 60)}",
+            'PLZ': plz,
+            'Ort': ort,
+            'Funktion': rng.choice(FUNCTIONS),
+            'Stellenumfang': rng.choice([100, 80, 75, 50, 120, -5, 'x'])
+        })
+    return pd.DataFrame(records)
+
+
+def write_workbooks(directory, patient_rows, vehicle_rows, seed=42):
+    # Schreibt beide Listen als Excel-Dateien und gibt (patient_file, vehicle_file) zurück
+    os.makedirs(directory, exist_ok=True)
+    patient_file = os.path.join(directory, f"patients_{patient_rows}.xlsx")
+    vehicle_file = os.path.join(directory, f"employees_{vehicle_rows}.xlsx")
+    build_patient_frame(patient_rows, seed).to_excel(patient_file, index=False)
+    build_vehicle_frame(vehicle_rows, seed).to_excel(vehicle_file, index=False)
+    return patient_file, vehicle_file
@@ -14,7 +14,92 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'data', 'uploads')
     SESSION_TYPE = 'filesystem'
     SESSION_FILE_DIR = os.path.join(os.getcwd(), 'data', 'flask_session')
+    # Nicht durchsuchbare Upload-Streams werden bis zu dieser Größe im Speicher gepuffert, darüber auf der Festplatte
+    UPLOAD_SPOOL_MAX_MB = int(os.getenv('UPLOAD_SPOOL_MAX_MB', '16'))
+
+    # JSON/NDJSON-Import (Adressen je Geocoding-Batch, maximal gemeldete Fehler je Anfrage)
+    BULK_IMPORT_BATCH_SIZE = int(os.getenv('BULK_IMPORT_BATCH_SIZE', '500'))
+    BULK_IMPORT_MAX_ERRORS = int(os.getenv('BULK_IMPORT_MAX_ERRORS', '100'))
+
+    # Geocoding-Cache Konfiguration
+    GEOCODE_CACHE_FILE = os.getenv('GEOCODE_CACHE_FILE', os.path.join(os.getcwd(), 'data', 'geocode_cache.json'))
+    GEOCODE_CACHE_TTL_DAYS = int(os.getenv('GEOCODE_CACHE_TTL_DAYS', '180'))
+    GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv('GEOCODE_CACHE_MAX_ENTRIES', '50000'))
+
+    # Batch-Geocoding Konfiguration
+    GEOCODE_MAX_WORKERS = int(os.getenv('GEOCODE_MAX_WORKERS', '8'))
+    GEOCODE_QPS = float(os.getenv('GEOCODE_QPS', '40'))
+    GEOCODE_MAX_RETRIES = int(os.getenv('GEOCODE_MAX_RETRIES', '3'))
+    GEOCODE_BACKOFF_SECONDS = float(os.getenv('GEOCODE_BACKOFF_SECONDS', '0.5'))
+
+    # Gemeinsame Google-Clients (Deadlines in Sekunden, Backoff bei Kontingentfehlern, Circuit Breaker)
+    GOOGLE_API_TIMEOUT = float(os.getenv('GOOGLE_API_TIMEOUT', '10'))
+    GOOGLE_OPTIMIZE_TIMEOUT = float(os.getenv('GOOGLE_OPTIMIZE_TIMEOUT', '90'))
+    GOOGLE_API_MAX_RETRIES = int(os.getenv('GOOGLE_API_MAX_RETRIES', '3'))
+    GOOGLE_API_BACKOFF_SECONDS = float(os.getenv('GOOGLE_API_BACKOFF_SECONDS', '0.5'))
+    GOOGLE_CIRCUIT_FAILURES = int(os.getenv('GOOGLE_CIRCUIT_FAILURES', '5'))
+    GOOGLE_CIRCUIT_RESET_SECONDS = float(os.getenv('GOOGLE_CIRCUIT_RESET_SECONDS', '30'))
+    GOOGLE_HTTP_POOL_SIZE = int(os.getenv('GOOGLE_HTTP_POOL_SIZE', '16'))
     
+    # Routenoptimierung ('google' oder 'local')
+    ROUTE_SOLVER = os.getenv('ROUTE_SOLVER', 'google')
+    LOCAL_SOLVER_TIME_BUDGET = float(os.getenv('LOCAL_SOLVER_TIME_BUDGET', '1.0'))
+
+    # Bisherige Routen als Startlösung verwenden (Anteil bereits geplanter Hausbesuche mindestens)
+    ROUTE_WARM_START = os.getenv('ROUTE_WARM_START', 'true').lower() == 'true'
+    WARM_START_MIN_OVERLAP = float(os.getenv('WARM_START_MIN_OVERLAP', '0.5'))
+
+    # Geografische Zerlegung großer Anfragen ('off' oder 'kmeans')
+    ROUTE_DECOMPOSITION = os.getenv('ROUTE_DECOMPOSITION', 'off')
+    DECOMPOSITION_MIN_SHIPMENTS = int(os.getenv('DECOMPOSITION_MIN_SHIPMENTS', '120'))
+    DECOMPOSITION_CLUSTER_SIZE = int(os.getenv('DECOMPOSITION_CLUSTER_SIZE', '60'))
+    DECOMPOSITION_WORKERS = int(os.getenv('DECOMPOSITION_WORKERS', '4'))
+
+    # Hintergrund-Jobs für die Optimierung
+    OPTIMIZATION_WORKERS = int(os.getenv('OPTIMIZATION_WORKERS', '2'))
+    OPTIMIZATION_JOB_HISTORY = int(os.getenv('OPTIMIZATION_JOB_HISTORY', '50'))
+
+    # Gleichzeitig optimierte Wochentage bei der Wochenplanung
+    WEEK_OPTIMIZATION_WORKERS = int(os.getenv('WEEK_OPTIMIZATION_WORKERS', '5'))
+
+    # Gemeinsamer Zustand für mehrere Worker ('memory' = nur ein Prozess, 'sqlite' = gemeinsame Datei)
+    STATE_STORE = os.getenv('STATE_STORE', 'memory')
+    STATE_DB_FILE = os.getenv('STATE_DB_FILE', os.path.join(os.getcwd(), 'data', 'state.db'))
+    STATE_TEAM = os.getenv('STATE_TEAM', 'default')
+
+    # Cache für Optimierungsergebnisse
+    RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', os.path.join(os.getcwd(), 'data', 'result_cache'))
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '64'))
+    RESULT_CACHE_MAX_DISK_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_DISK_ENTRIES', '500'))
+
+    # PDF-Export (paralleles Rendern ab PDF_PARALLEL_MIN_SECTIONS Abschnitten)
+    PDF_WORKERS = int(os.getenv('PDF_WORKERS', str(min(4, os.cpu_count() or 1))))
+    PDF_PARALLEL_MIN_SECTIONS = int(os.getenv('PDF_PARALLEL_MIN_SECTIONS', '60'))
+    EXPORT_CACHE_MAX_ENTRIES = int(os.getenv('EXPORT_CACHE_MAX_ENTRIES', '256'))
+    EXPORT_CACHE_MAX_MB = int(os.getenv('EXPORT_CACHE_MAX_MB', '100'))
+
+    # JSON-Antworten für Karte und Routen (ETag/304, gzip bzw. brotli ab RESPONSE_COMPRESS_MIN_BYTES)
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '64'))
+    RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES', '1024'))
+
+    # Marker nach Kartenausschnitt (Gitterzellen in Grad; Cluster unter MARKER_CLUSTER_MAX_ZOOM
+    # und ab MARKER_CLUSTER_MIN_POINTS sichtbaren Patienten, Clusterradius in Bildschirmpunkten)
+    MARKER_INDEX_CELL_SIZE = float(os.getenv('MARKER_INDEX_CELL_SIZE', '0.05'))
+    MARKER_CLUSTER_MAX_ZOOM = int(os.getenv('MARKER_CLUSTER_MAX_ZOOM', '14'))
+    MARKER_CLUSTER_MIN_POINTS = int(os.getenv('MARKER_CLUSTER_MIN_POINTS', '200'))
+    MARKER_CLUSTER_RADIUS_PX = int(os.getenv('MARKER_CLUSTER_RADIUS_PX', '60'))
+    # Antworten für Kartenausschnitte in einem eigenen Cache (verdrängen nicht die vollständigen Marker)
+    MARKER_VIEWPORT_CACHE_ENTRIES = int(os.getenv('MARKER_VIEWPORT_CACHE_ENTRIES', '32'))
+
+    # Fahrzeitmatrix ('google' = Distance Matrix API, 'haversine' = lokale Schätzung über die Luftlinie)
+    # Mit API-Key werden Straßenfahrzeiten verwendet; je Provider eine eigene Datei, damit keine Schätzungen übernommen werden
+    TRAVEL_MATRIX_PROVIDER = os.getenv('TRAVEL_MATRIX_PROVIDER', 'google' if GOOGLE_MAPS_API_KEY else 'haversine')
+    TRAVEL_MATRIX_FILE = os.getenv('TRAVEL_MATRIX_FILE', os.path.join(
+        os.getcwd(), 'data', f'travel_matrix_{TRAVEL_MATRIX_PROVIDER}.npz'))
+
+    # Import- und Initialisierungszeiten beim Start ausgeben
+    STARTUP_PROFILE = os.getenv('STARTUP_PROFILE', 'false').lower() == 'true'
+
     # Environment
     ENV = os.getenv('FLASK_ENV', 'production')
     DEBUG = ENV == 'development' 
\ No newline at end of file
@@ -1,8 +1,12 @@
-from .file_handler import handle_patient_upload, handle_vehicle_upload, geocode_address, allowed_file
+from .file_handler import handle_patient_upload, handle_vehicle_upload, geocode_address, allowed_file, geocode_cache_stats
+from .bulk_handler import handle_bulk_patient_import, handle_bulk_vehicle_import
 
 __all__ = [
     'handle_patient_upload', 
     'handle_vehicle_upload', 
     'geocode_address', 
-    'allowed_file'
+    'allowed_file',
+    'geocode_cache_stats',
+    'handle_bulk_patient_import',
+    'handle_bulk_vehicle_import'
 ] 
\ No newline at end of file
@@ -0,0 +1,49 @@
+from flask import jsonify
+from config import Config
+from services.container import container
+from services.session_service import SessionService
+from handlers.file_handler import file_service
+
+def _create_bulk_import_service():
+    # Nutzt denselben FileService (Validierung, Geocoding-Cache) wie der Excel-Upload
+    from services.bulk_import import BulkImportService
+    return BulkImportService(
+        container.get('file_service'),
+        batch_size=Config.BULK_IMPORT_BATCH_SIZE,
+        max_errors=Config.BULK_IMPORT_MAX_ERRORS
+    )
+
+bulk_import_service = container.register('bulk_import', _create_bulk_import_service)
+
+def handle_bulk_patient_import(request):
+    # Handler für den Import von Patienten als JSON-Array oder NDJSON
+    weekday = request.args.get('weekday') or SessionService.get_selected_weekday()
+    if weekday not in file_service.WEEKDAY_MAPPING.values():
+        return jsonify({'status': 'error', 'message': f'Ungültiger Wochentag: {weekday}'}), 400
+
+    try:
+        records = bulk_import_service.read_records(request)
+        result = bulk_import_service.import_patients(records, weekday, partial=_is_partial(request))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    if result['success']:
+        SessionService.set_selected_week(result['week_number'])
+    return _response(result)
+
+def handle_bulk_vehicle_import(request):
+    # Handler für den Import von Mitarbeitern als JSON-Array oder NDJSON
+    try:
+        records = bulk_import_service.read_records(request)
+        result = bulk_import_service.import_vehicles(records, partial=_is_partial(request))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return _response(result)
+
+def _is_partial(request):
+    # ?partial=1: ungültige Datensätze überspringen und die gültigen importieren
+    return request.args.get('partial', '').lower() in ('1', 'true', 'yes')
+
+def _response(result):
+    success = result.pop('success')
+    return jsonify({'status': 'success' if success else 'error', **result}), 200 if success else 422
@@ -1,7 +1,12 @@
 from flask import flash, redirect, url_for, current_app as app
-from services.file_service import FileService
+from services.container import container
 
-file_service = FileService()
+def _create_file_service():
+    # pandas und der Geocoding-Client werden erst beim ersten Upload geladen
+    from services.file_service import FileService
+    return FileService()
+
+file_service = container.register('file_service', _create_file_service)
 
 def handle_patient_upload(request, selected_weekday=None):
     # Handler für den Upload von Patientendaten
@@ -19,7 +24,7 @@ def handle_patient_upload(request, selected_weekday=None):
         return redirect(url_for('main.upload_file'))
 
     if not file_service.allowed_file(file.filename):
-        flash('Nur Excel-Dateien sind erlaubt.')
+        flash('Nur Excel-, CSV- oder Parquet-Dateien sind erlaubt.')
         return redirect(url_for('main.upload_file'))
 
     try:
@@ -48,7 +53,7 @@ def handle_vehicle_upload(request):
         return redirect(url_for('main.upload_file'))
 
     if not file_service.allowed_file(file.filename):
-        flash('Nur Excel-Dateien sind erlaubt.')
+        flash('Nur Excel-, CSV- oder Parquet-Dateien sind erlaubt.')
         return redirect(url_for('main.upload_file'))
 
     try:
@@ -65,6 +70,10 @@ def geocode_address(address):
     # Handler für die Geocodierung einer Adresse
     return file_service.geocode_address(address)
 
+def geocode_cache_stats():
+    # Handler für die Statistik des Geocoding-Caches
+    return file_service.geocode_cache_stats()
+
 def allowed_file(filename):
     # Handler für die Überprüfung der Dateiendung
     return file_service.allowed_file(filename) 
\ No newline at end of file
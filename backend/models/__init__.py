@@ -1,4 +1,14 @@
-from .patient import Patient, patients
-from .vehicle import Vehicle, vehicles
+from .patient import (Patient, patients_by_weekday, set_week_patients, get_day_patients,
+                      get_home_visit_patients, get_tk_patients)
+from .vehicle import (Vehicle, vehicles, set_vehicles, update_vehicle_activity,
+                      get_active_vehicles, get_active_nurses)
+from .base import mark_changed, get_revision
+from .store import ModelStore
 
-__all__ = ['Patient', 'patients', 'Vehicle', 'vehicles'] 
\ No newline at end of file
+__all__ = [
+    'Patient', 'patients_by_weekday', 'set_week_patients', 'get_day_patients',
+    'get_home_visit_patients', 'get_tk_patients',
+    'Vehicle', 'vehicles', 'set_vehicles', 'update_vehicle_activity',
+    'get_active_vehicles', 'get_active_nurses',
+    'mark_changed', 'get_revision', 'ModelStore'
+] 
\ No newline at end of file
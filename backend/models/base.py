@@ -1,5 +1,7 @@
 class Entity:
-    # Basisklasse für alle Entitäten
+    # Basisklasse für alle Entitäten (__slots__ statt __dict__ spart Speicher bei großen Listen)
+    __slots__ = ('id', 'name', 'lat', 'lon')
+
     def __init__(self, name, lat=None, lon=None):
         self.id = None
         self.name = name
@@ -7,4 +9,15 @@ class Entity:
         self.lon = lon
 
     def __str__(self):
-        return f"{self.name} ({self.lat}, {self.lon})" 
\ No newline at end of file
+        return f"{self.name} ({self.lat}, {self.lon})" 
+
+# Änderungszähler je Datenbestand (z.B. 'patients', 'vehicles')
+revisions = {}
+
+def mark_changed(name):
+    # Markiert einen Datenbestand als geändert
+    revisions[name] = revisions.get(name, 0) + 1
+
+def get_revision(name):
+    # Gibt den aktuellen Änderungszähler eines Datenbestands zurück
+    return revisions.get(name, 0)
@@ -1,17 +1,50 @@
-from .base import Entity
+import threading
 
-# Liste für Patienten
-patients = []
+from .base import Entity, mark_changed
+from .store import ModelStore
+
+# Patienten der gesamten KW je Wochentag
+patients_by_weekday = {}
+
+# Speicher je Wochentag: {weekday: (Liste aus patients_by_weekday, ModelStore)}
+# Jede Anfrage wählt ihren Tag über get_day_patients; es gibt keinen global ausgewählten Tag
+_day_stores = {}
+_day_stores_lock = threading.Lock()
 
 class Patient(Entity):
-    # Patientenklasse
+    # Patientenklasse (die ID vergibt der ModelStore bzw. der Import)
+    __slots__ = ('address', 'visit_type', 'time_info', 'phone_numbers')
+
     def __init__(self, name, address, visit_type, time_info="", phone_numbers="", lat=None, lon=None):
         super().__init__(name, lat, lon)
-        self.id = len(patients) + 1
         self.address = address
         self.visit_type = visit_type
         self.time_info = time_info
         self.phone_numbers = phone_numbers
 
     def __str__(self):
-        return f"Patient: {self.name}, {self.address} ({self.lat}, {self.lon})" 
\ No newline at end of file
+        return f"Patient: {self.name}, {self.address} ({self.lat}, {self.lon})"
+
+def set_week_patients(week_patients):
+    # Ersetzt die Patienten aller Wochentage
+    patients_by_weekday.clear()
+    patients_by_weekday.update(week_patients)
+    mark_changed('patients')
+
+def get_day_patients(weekday):
+    # Patienten eines Wochentags als eigener ModelStore
+    # Der Speicher samt Ansichten und Index wird bis zum nächsten Import wiederverwendet
+    day_patients = patients_by_weekday.get(weekday)
+    with _day_stores_lock:
+        cached = _day_stores.get(weekday)
+        if cached is None or cached[0] is not day_patients:
+            cached = _day_stores[weekday] = (day_patients, ModelStore(day_patients or []))
+        return cached[1]
+
+def get_home_visit_patients(store):
+    # Patienten mit Hausbesuch (werden optimiert)
+    return store.view('home_visits', lambda p: p.visit_type in ("Neuaufnahme", "HB"))
+
+def get_tk_patients(store):
+    # Patienten mit Telefonkontakt
+    return store.view('tk', lambda p: p.visit_type == "TK")
@@ -0,0 +1,79 @@
+import math
+from collections import defaultdict
+
+
+class GridIndex:
+    # Räumlicher Index über lat/lon: Entitäten werden festen Gitterzellen (cell_size Grad) zugeordnet
+    # Abfragen für einen Kartenausschnitt prüfen nur die Zellen im Ausschnitt statt aller Entitäten
+    def __init__(self, entities, cell_size=0.05):
+        self.cell_size = cell_size
+        self._cells = defaultdict(list)
+        self.size = 0
+        for entity in entities:
+            if not _has_position(entity):
+                continue
+            self._cells[self._cell(entity.lat, entity.lon)].append(entity)
+            self.size += 1
+
+    def query(self, south, west, north, east):
+        # Entitäten innerhalb des Ausschnitts; west > east bedeutet einen Ausschnitt über die Datumsgrenze
+        wraps = west > east
+        rows = range(math.floor(south / self.cell_size), math.floor(north / self.cell_size) + 1)
+        cols = range(math.floor(west / self.cell_size), math.floor(east / self.cell_size) + 1)
+        if wraps or len(rows) * len(cols) > len(self._cells):
+            # Großer Ausschnitt: alle belegten Zellen prüfen ist günstiger als alle Zellen im Ausschnitt
+            candidates = (cell for key, cell in self._cells.items()
+                          if wraps or (key[0] in rows and key[1] in cols))
+        else:
+            candidates = (self._cells[(row, col)] for row in rows for col in cols if (row, col) in self._cells)
+
+        result = []
+        for cell in candidates:
+            for entity in cell:
+                if south <= entity.lat <= north and (
+                        (west <= entity.lon or entity.lon <= east) if wraps else west <= entity.lon <= east):
+                    result.append(entity)
+        return result
+
+    def cluster(self, south, west, north, east, cell_size, category=None):
+        # Fasst die Entitäten im Ausschnitt in Zellen der Größe cell_size zusammen
+        # Gibt (Cluster, Einzelpunkte) zurück; Zellen mit nur einer Entität bleiben Einzelpunkte
+        groups = defaultdict(list)
+        for entity in self.query(south, west, north, east):
+            groups[(math.floor(entity.lat / cell_size), math.floor(entity.lon / cell_size))].append(entity)
+
+        clusters = []
+        singles = []
+        for members in groups.values():
+            if len(members) == 1:
+                singles.append(members[0])
+                continue
+            lats = [entity.lat for entity in members]
+            lons = [entity.lon for entity in members]
+            counts = defaultdict(int)
+            if category:
+                for entity in members:
+                    counts[category(entity)] += 1
+            clusters.append({
+                'lat': sum(lats) / len(lats),
+                'lng': sum(lons) / len(lons),
+                'count': len(members),
+                'counts': dict(counts),
+                'bounds': [min(lats), min(lons), max(lats), max(lons)]
+            })
+        return clusters, singles
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+
+def _has_position(entity):
+    # Entitäten ohne gültige Koordinaten (fehlgeschlagenes Geocoding) werden nicht indexiert
+    lat, lon = entity.lat, entity.lon
+    return (lat is not None and lon is not None and isinstance(lat, (int, float)) and isinstance(lon, (int, float))
+            and not math.isnan(lat) and not math.isnan(lon))
+
+
+def cluster_cell_size(zoom, radius_px=60):
+    # Zellgröße in Grad, die bei dieser Zoomstufe etwa radius_px Bildschirmpunkten entspricht
+    return 360.0 / (256 * 2 ** zoom) * radius_px
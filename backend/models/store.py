@@ -0,0 +1,114 @@
+import threading
+
+from .spatial_index import GridIndex
+
+
+class ModelStore:
+    # Listenähnlicher Speicher für Entitäten mit Indizes nach ID und Name
+    # Gefilterte Ansichten und das Koordinaten-Array werden bis zur nächsten Änderung zwischengespeichert
+    def __init__(self, entities=()):
+        self._items = []
+        self._by_id = {}
+        self._by_name = {}
+        self._next_id = 1
+        self._version = 0
+        self._views = {}
+        self._coordinates = None
+        self._spatial_index = None
+        self._lock = threading.RLock()
+        self.extend(entities)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __repr__(self):
+        return f"ModelStore({len(self._items)} entities)"
+
+    @property
+    def version(self):
+        return self._version
+
+    def append(self, entity):
+        self.extend([entity])
+
+    def extend(self, entities):
+        # Fügt Entitäten hinzu; Entitäten ohne ID erhalten die nächste freie ID
+        with self._lock:
+            for entity in entities:
+                if entity.id is None:
+                    entity.id = self._next_id
+                self._next_id = max(self._next_id, entity.id + 1)
+                self._items.append(entity)
+                self._by_id[entity.id] = entity
+                self._by_name.setdefault(entity.name, entity)
+            self.touch()
+
+    def replace(self, entities):
+        # Ersetzt den gesamten Inhalt (z.B. nach einem Import oder Wechsel des Wochentags)
+        with self._lock:
+            self._items = []
+            self._by_id = {}
+            self._by_name = {}
+            self._next_id = 1
+            self.extend(entities)
+
+    def clear(self):
+        self.replace([])
+
+    def touch(self):
+        # Verwirft zwischengespeicherte Ansichten nach Änderungen an einzelnen Entitäten
+        with self._lock:
+            self._version += 1
+            self._views = {}
+            self._coordinates = None
+            self._spatial_index = None
+
+    def get(self, entity_id):
+        # O(1)-Zugriff über die ID
+        return self._by_id.get(entity_id)
+
+    def by_name(self, name):
+        # O(1)-Zugriff über den Namen (bei Duplikaten der erste Eintrag)
+        return self._by_name.get(name)
+
+    def view(self, name, predicate):
+        # Gefilterte Liste, die bis zur nächsten Änderung wiederverwendet wird
+        with self._lock:
+            items = self._views.get(name)
+            if items is None:
+                items = [entity for entity in self._items if predicate(entity)]
+                self._views[name] = items
+            return items
+
+    def coordinates(self):
+        # (n, 2)-Array mit [lat, lon] aller Entitäten; fehlende Koordinaten sind NaN
+        with self._lock:
+            if self._coordinates is None:
+                import numpy as np
+                coordinates = np.array(
+                    [(entity.lat, entity.lon) for entity in self._items], dtype=np.float64
+                ).reshape(-1, 2)
+                coordinates.flags.writeable = False
+                self._coordinates = coordinates
+            return self._coordinates
+
+    def spatial_index(self, cell_size=0.05):
+        # Gitterindex über lat/lon für Abfragen nach Kartenausschnitt (bis zur nächsten Änderung gespeichert)
+        with self._lock:
+            if self._spatial_index is None or self._spatial_index.cell_size != cell_size:
+                self._spatial_index = GridIndex(self._items, cell_size)
+            return self._spatial_index
+
+    def snapshot(self):
+        # Unabhängige Kopie der aktuellen Zusammensetzung (die Entitäten selbst werden geteilt)
+        with self._lock:
+            return ModelStore(self._items)
@@ -1,14 +1,16 @@
-from .base import Entity
+from .base import Entity, mark_changed
+from .store import ModelStore
 
 # Mitarbeiter = Fahrzeuge
-# Liste für Fahrzeuge bzw. Mitarbeiter
-vehicles = []
+# Speicher für Fahrzeuge bzw. Mitarbeiter
+vehicles = ModelStore()
 
 class Vehicle(Entity):
-    # Fahrzeugklasse
+    # Fahrzeugklasse (die ID vergibt der ModelStore bzw. der Import)
+    __slots__ = ('start_address', 'stellenumfang', 'funktion', 'is_active')
+
     def __init__(self, name, start_address, lat=None, lon=None, stellenumfang=100, funktion=""):
         super().__init__(name, lat, lon)
-        self.id = len(vehicles) + 1
         self.start_address = start_address
         self.stellenumfang = stellenumfang
         self.funktion = funktion
@@ -17,4 +19,26 @@ class Vehicle(Entity):
     def __str__(self):
         return (f"Vehicle: {self.name}, {self.start_address} "
                 f"({self.lat}, {self.lon}), Stellenumfang={self.stellenumfang}, "
-                f"Funktion={self.funktion}, Active={self.is_active}") 
\ No newline at end of file
+                f"Funktion={self.funktion}, Active={self.is_active}") 
+
+def set_vehicles(new_vehicles):
+    # Ersetzt alle Fahrzeuge
+    vehicles.replace(new_vehicles)
+    mark_changed('vehicles')
+
+def update_vehicle_activity(updates):
+    # Setzt is_active für {id: aktiv} und verwirft die gefilterten Ansichten
+    for vehicle_id, is_active in updates.items():
+        vehicle = vehicles.get(vehicle_id)
+        if vehicle is not None:
+            vehicle.is_active = is_active
+    vehicles.touch()
+    mark_changed('vehicles')
+
+def get_active_vehicles(store=vehicles):
+    # Alle aktiven Mitarbeiter
+    return store.view('active', lambda v: v.is_active)
+
+def get_active_nurses(store=vehicles):
+    # Aktive Pflegekräfte (werden für die Optimierung verwendet)
+    return store.view('active_nurses', lambda v: v.is_active and v.funktion == 'Pflegekraft')
@@ -1,26 +1,274 @@
-from flask import Blueprint, render_template, request, jsonify, flash, send_file
-from services.pdf_service import create_route_pdf
+from flask import Blueprint, render_template, request, jsonify, flash, send_file, Response, g
 from services.date_time_service import DateTimeService
-from handlers import handle_patient_upload, handle_vehicle_upload
-from models import patients, vehicles
+from handlers import (handle_patient_upload, handle_vehicle_upload, geocode_cache_stats, handle_bulk_patient_import,
+                      handle_bulk_vehicle_import)
+from models import (vehicles, patients_by_weekday, set_week_patients, set_vehicles,
+                    update_vehicle_activity, get_home_visit_patients, get_tk_patients, get_active_vehicles,
+                    get_active_nurses, get_day_patients, get_revision, mark_changed, ModelStore)
 from config import Config
 from services.route_service import RouteOptimizationService
+from services.container import container
 from services.session_service import SessionService
+from services.job_service import JobService, Job
+from services.state_service import StateService, create_state_store
+from services.export_cache import ExportCache
+from services.result_cache import ResultCache
+from services.response_cache import ResponseCache
+from services.google_clients import google_clients
+from models.spatial_index import cluster_cell_size
+from services.metrics import registry as metrics_registry, MetricsExporter, HTTP_REQUEST_SECONDS, ROSTER_SIZE
+import json
+import math
+from io import BytesIO
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 # Blueprint erstellen
 routes = Blueprint('main', __name__)
 
-# Services initialisieren
-route_optimization_service = RouteOptimizationService()
+# Services initialisieren (der Optimierungsservice wird erst bei der ersten Verwendung erstellt)
+route_optimization_service = container.register('route_optimization', RouteOptimizationService)
 session_service = SessionService()
 
-# Globale Variablen für optimierte Routen
-optimized_routes = []
-unassigned_tk_stops = []
-unassigned_regular_stops = []
+# Gemeinsamer Speicher, damit mehrere Gunicorn-Worker denselben Stand sehen
+state_store = create_state_store(Config.STATE_STORE, Config.STATE_DB_FILE)
+state_service = StateService(state_store, Config.STATE_TEAM)
+job_service = JobService(
+    max_workers=Config.OPTIMIZATION_WORKERS,
+    history_size=Config.OPTIMIZATION_JOB_HISTORY,
+    store=state_store if Config.STATE_STORE != 'memory' else None,
+    scope=f'{Config.STATE_TEAM}:jobs'
+)
+
+# Erzeugte PDF-Exporte (Schlüssel: Hash von Routen, Wochentag und Datum)
+export_cache = ExportCache(
+    max_entries=Config.EXPORT_CACHE_MAX_ENTRIES,
+    max_bytes=Config.EXPORT_CACHE_MAX_MB * 1024 * 1024
+)
+
+# Serialisierte und komprimierte Antworten von /get_markers und /get_saved_routes
+response_cache = ResponseCache(
+    max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES,
+    min_compress_bytes=Config.RESPONSE_COMPRESS_MIN_BYTES
+)
+# Antworten für Kartenausschnitte (/get_markers?bbox=...); jedes Verschieben der Karte erzeugt
+# neue Schlüssel, daher getrennt, damit sie die Einträge oben nicht aus dem LRU verdrängen
+viewport_cache = ResponseCache(
+    max_entries=Config.MARKER_VIEWPORT_CACHE_ENTRIES,
+    min_compress_bytes=Config.RESPONSE_COMPRESS_MIN_BYTES
+)
+
+# Metriken aller Worker (über den gemeinsamen Speicher zusammengeführt)
+metrics_exporter = MetricsExporter(
+    metrics_registry,
+    store=state_store if Config.STATE_STORE != 'memory' else None,
+    scope=f'{Config.STATE_TEAM}:metrics'
+)
+
+def collect_cache_metrics():
+    # Treffer und Fehlzugriffe der Caches, die ohnehin mitgezählt werden
+    # Noch nicht erstellte Services werden für die Metriken nicht erzeugt
+    samples = {}
+    caches = {'export': export_cache.stats(), 'response': response_cache.stats(), 'viewport': viewport_cache.stats()}
+    if container.created('file_service'):
+        caches['geocode'] = geocode_cache_stats()
+    if container.created('route_optimization'):
+        caches['result'] = route_optimization_service.result_cache.stats()
+        if route_optimization_service._travel_matrix is not None:
+            caches['travel_matrix'] = route_optimization_service._travel_matrix.stats()
+    for cache, stats in caches.items():
+        samples[(cache, 'hit')] = stats['hits'] + stats.get('disk_hits', 0)
+        samples[(cache, 'miss')] = stats['misses']
+    return [('palliroute_cache_requests_total', 'counter', 'Cache-Zugriffe nach Ergebnis',
+             ('cache', 'result'), samples)]
+
+metrics_registry.add_collector(collect_cache_metrics)
+
+# Zustand der Circuit Breaker: 0 = geschlossen, 1 = Probeaufruf, 2 = gesperrt
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+def collect_google_api_metrics():
+    # Zustand und Wiederholungen je Google-API (nur wenn die Clients schon erstellt wurden)
+    if not container.created('google_clients'):
+        return []
+    health = google_clients.health()
+    states = {(api,): CIRCUIT_STATES[stats['circuit']['state']] for api, stats in health.items() if 'circuit' in stats}
+    retries = {(api,): stats['retries'] for api, stats in health.items()}
+    return [
+        ('palliroute_google_circuit_state', 'gauge', 'Circuit Breaker je Google-API (0 geschlossen, 1 Probe, 2 offen)',
+         ('api',), states),
+        ('palliroute_google_retries_total', 'counter', 'Wiederholte Google-API-Aufrufe nach Kontingent- oder Serverfehlern',
+         ('api',), retries)
+    ]
+
+metrics_registry.add_collector(collect_google_api_metrics)
+
+# Gespeichertes Optimierungsergebnis; wird immer als Ganzes ersetzt,
+# damit Leser nie einen halb aktualisierten Stand sehen
+saved_result = {'routes': [], 'tk_patients': [], 'regular_stops': []}
+publish_lock = threading.Lock()
+
+def publish_result(optimized_routes, unassigned_regular_stops, unassigned_tk_stops):
+    # Veröffentlicht ein neues Optimierungsergebnis atomar
+    global saved_result
+    with publish_lock:
+        saved_result = {
+            'routes': optimized_routes,
+            'tk_patients': unassigned_tk_stops,
+            'regular_stops': unassigned_regular_stops
+        }
+        mark_changed('result')
+        state_service.save('result')
+    return saved_result
+
+def load_result(result):
+    # Übernimmt ein von einem anderen Worker veröffentlichtes Ergebnis
+    global saved_result
+    with publish_lock:
+        saved_result = result
+        mark_changed('result')
+
+# Ergebnisse der Wochenplanung je Wochentag (gehören zur KW des Imports)
+week_results = {'week_number': None, 'days': {}}
+
+def publish_week_results(week_number, days):
+    # Veröffentlicht die Ergebnisse der Wochenplanung atomar
+    global week_results
+    with publish_lock:
+        week_results = {'week_number': week_number, 'days': days}
+        state_service.save('week_results')
+    return week_results
+
+def load_week_results(results):
+    global week_results
+    with publish_lock:
+        week_results = results
+
+def get_week_result(weekday, week_number):
+    # Gespeichertes Ergebnis der Wochenplanung für einen Tag oder None
+    current = week_results
+    if current['week_number'] != week_number:
+        return None
+    return current['days'].get(weekday)
+
+state_service.register('patients', lambda: dict(patients_by_weekday), set_week_patients,
+                       revision=lambda: get_revision('patients'))
+state_service.register('vehicles', lambda: list(vehicles), set_vehicles,
+                       revision=lambda: get_revision('vehicles'))
+state_service.register('result', lambda: saved_result, load_result)
+state_service.register('week_results', lambda: week_results, load_week_results)
+
+@routes.before_request
+def sync_state():
+    # Stand anderer Worker übernehmen (der Wochentag wird je Anfrage über session_patients gewählt,
+    # da parallele Anfragen verschiedener Sessions denselben Prozess teilen)
+    g.request_started = time.perf_counter()
+    state_service.sync()
+
+def session_patients():
+    # Patienten des Wochentags der aktuellen Session
+    return get_day_patients(session_service.get_selected_weekday())
+
+@routes.after_request
+def flush_state(response):
+    # Lokale Änderungen (Import, Fahrzeugauswahl) für andere Worker speichern
+    state_service.flush()
+    started = g.pop('request_started', None)
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unknown',
+            status=response.status_code
+        )
+    metrics_exporter.publish()
+    return response
+
+def run_optimization(current_patients, current_vehicles, weekday, week_number, solver=None, job=None, use_cache=True,
+                     previous_routes=None):
+    # Führt die Optimierung für einen Stand von Patienten und Fahrzeugen durch
+    # previous_routes: bisher veröffentlichte Routen als Startlösung (bei ?refresh=1 ohne)
+    report = job.report if job else (lambda progress, message: None)
+
+    # Fahrzeuge und Patienten filtern
+    available_vehicles = get_active_nurses(current_vehicles)
+    all_active_vehicles = get_active_vehicles(current_vehicles)
+    non_tk_patients = get_home_visit_patients(current_patients)
+    tk_patients = get_tk_patients(current_patients)
+
+    # Optimierung mit nur Pflegekräften durchführen und Ergebnis verarbeiten
+    report(10, 'Routen werden optimiert')
+    result = route_optimization_service.optimize_and_process(
+        non_tk_patients,
+        available_vehicles,
+        all_active_vehicles,
+        tk_patients,
+        weekday,
+        week_number,
+        solver=solver,
+        should_stop=job.is_cancelled if job else None,
+        use_cache=use_cache,
+        previous_routes=previous_routes
+    )
+    if result['cached']:
+        logger.info("Route optimization served from result cache")
+
+    if job:
+        job.check_cancelled()
+    report(90, 'Ergebnis wird gespeichert')
+    return {**publish_result(result['routes'], result['regular_stops'], result['tk_patients']), 'cached': result['cached']}
+
+def run_week_optimization(week_patients, current_vehicles, selected_weekday, week_number, solver=None, job=None,
+                          use_cache=True):
+    # Optimiert alle Wochentage der KW gleichzeitig und speichert die Ergebnisse je Tag
+    report = job.report if job else (lambda progress, message: None)
+    available_vehicles = get_active_nurses(current_vehicles)
+    all_active_vehicles = get_active_vehicles(current_vehicles)
+
+    days = {}
+    for weekday, day_patients in week_patients.items():
+        day_store = ModelStore(day_patients)
+        if get_home_visit_patients(day_store) or get_tk_patients(day_store):
+            days[weekday] = (get_home_visit_patients(day_store), get_tk_patients(day_store))
+
+    def day_done(weekday, done):
+        report(10 + int(80 * done / len(days)), f'{weekday} optimiert ({done}/{len(days)})')
+
+    report(5, f'{len(days)} Wochentage werden optimiert')
+    previous = week_results['days'] if week_results['week_number'] == week_number and use_cache else None
+    results = route_optimization_service.optimize_week(
+        days,
+        available_vehicles,
+        all_active_vehicles,
+        week_number,
+        solver=solver,
+        should_stop=job.is_cancelled if job else None,
+        use_cache=use_cache,
+        previous_results=previous,
+        on_day_done=day_done
+    )
+
+    if job:
+        job.check_cancelled()
+    report(90, 'Ergebnisse werden gespeichert')
+    publish_week_results(week_number, results)
+    # Der ausgewählte Tag wird direkt auf der Karte angezeigt
+    if selected_weekday in results:
+        day = results[selected_weekday]
+        publish_result(day['routes'], day['regular_stops'], day['tk_patients'])
+    return {
+        'week_number': week_number,
+        'days': {
+            weekday: {
+                'routes': sum(1 for route in result['routes'] if route['stops']),
+                'stops': sum(len(route['stops']) for route in result['routes']),
+                'unassigned': len(result['regular_stops']),
+                'cached': result['cached']
+            } for weekday, result in results.items()
+        }
+    }
 
 @routes.route('/', methods=['GET', 'POST'])
 def upload_file():
@@ -33,10 +281,10 @@ def upload_file():
 
     return render_template(
         'index.html',
-        patients=patients,
+        patients=session_patients(),
         vehicles=vehicles,
         google_maps_api_key=Config.GOOGLE_MAPS_API_KEY,
-        saved_routes=optimized_routes
+        saved_routes=saved_result['routes']
     )
 
 @routes.route('/update-weekday', methods=['POST'])
@@ -46,10 +294,15 @@ def update_weekday():
         weekday = data.get('weekday')
         if weekday:
             session_service.set_selected_weekday(weekday)
+            # Ergebnis der Wochenplanung für diesen Tag anzeigen, falls vorhanden
+            day_result = get_week_result(weekday, session_service.get_selected_week())
+            if day_result is not None:
+                publish_result(day_result['routes'], day_result['regular_stops'], day_result['tk_patients'])
             return jsonify({
                 'status': 'success', 
                 'weekday': weekday,
-                'patient_count': len(patients)
+                'patient_count': len(get_day_patients(weekday)),
+                'routes_restored': day_result is not None
             })
         return jsonify({'status': 'error', 'message': 'No weekday provided'})
     except Exception as e:
@@ -59,72 +312,222 @@ def update_weekday():
 def optimize_route():
     try:
         logger.info("Starting route optimization")
+        day_patients = session_patients()
         # Validierung
-        is_valid, error_message = route_optimization_service.validate_optimization_input(vehicles, patients)
+        is_valid, error_message = route_optimization_service.validate_optimization_input(vehicles, day_patients)
         if not is_valid:
             flash(error_message, 'error')
             return jsonify({'status': 'error', 'message': error_message})
 
-        # Fahrzeuge und Patienten filtern
-        available_vehicles = [v for v in vehicles if v.is_active and v.funktion == 'Pflegekraft']
-        all_active_vehicles = [v for v in vehicles if v.is_active]
-        non_tk_patients = [p for p in patients if p.visit_type in ("Neuaufnahme", "HB")]
-        tk_patients = [p for p in patients if p.visit_type == "TK"]
-
-        # Optimierung durchführen mit nur Pflegekräften
-        response = route_optimization_service.optimize_routes(
-            non_tk_patients,
-            available_vehicles,
+        result = run_optimization(
+            day_patients.snapshot(),
+            vehicles.snapshot(),
             session_service.get_selected_weekday(),
-            session_service.get_selected_week()
+            session_service.get_selected_week(),
+            solver=request.args.get('solver'),
+            use_cache=not request.args.get('refresh'),
+            previous_routes=None if request.args.get('refresh') else saved_result['routes']
         )
 
-        # Ergebnis verarbeiten
-        global optimized_routes, unassigned_tk_stops, unassigned_regular_stops
-        optimized_routes, unassigned_regular_stops, unassigned_tk_stops = route_optimization_service.process_optimization_result(
-            response,
-            available_vehicles,
-            all_active_vehicles,
-            non_tk_patients,
-            tk_patients
-        )
-
-        return jsonify({
-            'status': 'success',
-            'routes': optimized_routes,
-            'tk_patients': unassigned_tk_stops,
-            'regular_stops': unassigned_regular_stops
-        })
+        return jsonify({'status': 'success', **result})
 
     except Exception as e:
         logger.error(f"Error during optimization: {e}")
         raise
 
+@routes.route('/optimize_jobs', methods=['POST'])
+def submit_optimization_job():
+    # Startet die Optimierung im Hintergrund und gibt sofort die Job-ID zurück
+    day_patients = session_patients()
+    is_valid, error_message = route_optimization_service.validate_optimization_input(vehicles, day_patients)
+    if not is_valid:
+        flash(error_message, 'error')
+        return jsonify({'status': 'error', 'message': error_message}), 400
+
+    # Stand zum Zeitpunkt des Absendens festhalten (Session ist im Worker nicht verfügbar)
+    current_patients = day_patients.snapshot()
+    current_vehicles = vehicles.snapshot()
+    weekday = session_service.get_selected_weekday()
+    week_number = session_service.get_selected_week()
+    solver = request.args.get('solver')
+    use_cache = not request.args.get('refresh')
+    previous_routes = saved_result['routes'] if use_cache else None
+
+    logger.info(f"Submitting route optimization job for {weekday}")
+    job = job_service.submit(
+        lambda job: run_optimization(current_patients, current_vehicles, weekday, week_number, solver=solver, job=job,
+                                     use_cache=use_cache, previous_routes=previous_routes),
+        description=f'Routenoptimierung {weekday}'
+    )
+    return jsonify({'status': 'success', 'job': job.to_dict()}), 202
+
+@routes.route('/optimize_week', methods=['POST'])
+def submit_week_optimization_job():
+    # Startet die Planung aller Wochentage der importierten KW als Hintergrund-Job
+    week_patients = dict(patients_by_weekday)
+    if not week_patients:
+        return jsonify({'status': 'error', 'message': 'Keine Patienten importiert'}), 400
+    is_valid, error_message = route_optimization_service.validate_optimization_input(
+        vehicles, [p for day in week_patients.values() for p in day])
+    if not is_valid:
+        return jsonify({'status': 'error', 'message': error_message}), 400
+
+    current_vehicles = vehicles.snapshot()
+    weekday = session_service.get_selected_weekday()
+    week_number = session_service.get_selected_week()
+    solver = request.args.get('solver')
+    use_cache = not request.args.get('refresh')
+
+    logger.info(f"Submitting week optimization job for KW {week_number}")
+    job = job_service.submit(
+        lambda job: run_week_optimization(week_patients, current_vehicles, weekday, week_number, solver=solver,
+                                          job=job, use_cache=use_cache),
+        description=f'Wochenplanung KW {week_number}'
+    )
+    return jsonify({'status': 'success', 'job': job.to_dict()}), 202
+
+@routes.route('/week_results')
+def get_week_results():
+    # Gespeicherte Ergebnisse der Wochenplanung (alle Tage oder ?weekday=...)
+    current = week_results
+    weekday = request.args.get('weekday')
+    if weekday:
+        day_result = current['days'].get(weekday)
+        if day_result is None:
+            return jsonify({'status': 'error', 'message': f'Kein Ergebnis für {weekday}'}), 404
+        return jsonify({'status': 'success', 'week_number': current['week_number'], 'weekday': weekday, **day_result})
+    return jsonify({'status': 'success', **current})
+
+@routes.route('/optimize_jobs/<job_id>')
+def get_optimization_job(job_id):
+    job = job_service.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job nicht gefunden'}), 404
+    return jsonify({'status': 'success', 'job': job.to_dict()})
+
+@routes.route('/optimize_jobs/<job_id>/result')
+def get_optimization_job_result(job_id):
+    job = job_service.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job nicht gefunden'}), 404
+    if job.status != 'succeeded':
+        return jsonify({'status': 'error', 'message': f'Job ist nicht abgeschlossen ({job.status})', 'job': job.to_dict()}), 409
+    return jsonify({'status': 'success', **job.result})
+
+@routes.route('/optimize_jobs/<job_id>/events')
+def stream_optimization_job(job_id):
+    # Server-Sent Events mit dem Fortschritt eines Jobs
+    job = job_service.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job nicht gefunden'}), 404
+
+    def generate():
+        version = None
+        while True:
+            state = job_service.wait_for_update(job, version)
+            if state['version'] == version:
+                yield ": keepalive\n\n"
+                continue
+            version = state['version']
+            yield f"data: {json.dumps(state)}\n\n"
+            if state['status'] in Job.TERMINAL_STATES:
+                break
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@routes.route('/optimize_jobs/<job_id>/cancel', methods=['POST'])
+def cancel_optimization_job(job_id):
+    job = job_service.cancel(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job nicht gefunden'}), 404
+    return jsonify({'status': 'success', 'job': job.to_dict()})
+
+def patient_marker(p):
+    return {
+        'name': p.name,
+        'address': p.address,
+        'lat': p.lat,
+        'lng': p.lon,
+        'visit_type': p.visit_type
+    }
+
+def vehicle_marker(v):
+    return {
+        'name': v.name,
+        'start_address': v.start_address,
+        'lat': v.lat,
+        'lng': v.lon,
+        'funktion': v.funktion
+    }
+
+def parse_bbox(value):
+    # "süd,west,nord,ost" in Grad; None, wenn kein Ausschnitt angegeben ist
+    if not value:
+        return None
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError('bbox erwartet süd,west,nord,ost')
+    south, west, north, east = (round(float(part), 5) for part in parts)
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError('bbox liegt außerhalb des gültigen Bereichs')
+    return south, west, north, east
+
+def snap_bbox(bbox, cell_size):
+    # Erweitert den Ausschnitt auf ganze Gitterzellen, damit kleine Verschiebungen denselben Schlüssel ergeben
+    south, west, north, east = bbox
+    return (
+        max(-90.0, round(math.floor(south / cell_size) * cell_size, 5)),
+        max(-180.0, round(math.floor(west / cell_size) * cell_size, 5)),
+        min(90.0, round(math.ceil(north / cell_size) * cell_size, 5)),
+        min(180.0, round(math.ceil(east / cell_size) * cell_size, 5))
+    )
+
+def build_viewport_markers(day_patients, bbox, zoom):
+    # Nur Punkte im Kartenausschnitt; bei niedriger Zoomstufe und vielen Punkten werden
+    # Patienten zu Clustern mit Anzahl je Besuchsart zusammengefasst
+    index = day_patients.spatial_index(Config.MARKER_INDEX_CELL_SIZE)
+    visible = index.query(*bbox)
+    clusters = []
+    if (zoom is not None and zoom < Config.MARKER_CLUSTER_MAX_ZOOM
+            and len(visible) > Config.MARKER_CLUSTER_MIN_POINTS):
+        clusters, visible = index.cluster(*bbox, cluster_cell_size(zoom, Config.MARKER_CLUSTER_RADIUS_PX),
+                                          category=lambda p: p.visit_type)
+    visible_vehicles = [v for v in vehicles.spatial_index(Config.MARKER_INDEX_CELL_SIZE).query(*bbox) if v.is_active]
+    return {
+        'patients': [patient_marker(p) for p in visible],
+        'vehicles': [vehicle_marker(v) for v in visible_vehicles],
+        'clusters': clusters,
+        'total_patients': len(day_patients)
+    }
+
 @routes.route('/get_markers')
 def get_markers():
-    # Hole aktive Vehicles
-    all_active_vehicles = [v for v in vehicles if v.is_active]
-    
-    return jsonify({
-        'patients': [
-            {
-                'name': p.name,
-                'address': p.address,
-                'lat': p.lat,
-                'lng': p.lon,
-                'visit_type': p.visit_type
-            } for p in patients
-        ],
-        'vehicles': [
-            {
-                'name': v.name,
-                'start_address': v.start_address,
-                'lat': v.lat,
-                'lng': v.lon,
-                'funktion': v.funktion
-            } for v in all_active_vehicles
-        ]
-    })
+    # Patienten des Wochentags und aktive Fahrzeuge; neu aufgebaut nur nach Änderungen
+    # Mit ?bbox=süd,west,nord,ost&zoom=z nur der sichtbare Ausschnitt (bei vielen Punkten als Cluster)
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    zoom = request.args.get('zoom', type=int)
+    if bbox is not None:
+        bbox = snap_bbox(bbox, Config.MARKER_INDEX_CELL_SIZE)
+    # Schlüssel und Inhalt beziehen sich auf denselben Wochentag (den der Session) und Stand
+    weekday = session_service.get_selected_weekday()
+    key = ('markers', weekday, get_revision('patients'), get_revision('vehicles'),
+           bbox, zoom if bbox is not None else None)
+    day_patients = get_day_patients(weekday)
+
+    def build():
+        if bbox is not None:
+            return build_viewport_markers(day_patients, bbox, zoom)
+        return {
+            'patients': [patient_marker(p) for p in day_patients],
+            'vehicles': [vehicle_marker(v) for v in get_active_vehicles()]
+        }
+
+    if bbox is not None:
+        return viewport_cache.respond(request, key, build)
+    return response_cache.respond(request, key, build)
 
 @routes.route('/patients', methods=['GET', 'POST'])
 def show_patients():
@@ -132,28 +535,42 @@ def show_patients():
     week_number = session_service.get_selected_week()
     date = DateTimeService.get_date_from_week(week_number, selected_weekday)
     return render_template('show_patient.html',
-                         patients=patients,
+                         patients=get_day_patients(selected_weekday),
                          weekday=selected_weekday, week_number=week_number, date=date)
 
 @routes.route('/vehicles')
 def show_vehicles():
     return render_template('show_vehicle.html', vehicles=vehicles)
 
+@routes.route('/patients/bulk', methods=['POST'])
+def bulk_import_patients():
+    # Patienten als JSON-Array oder NDJSON importieren (ersetzt die Patienten der Woche wie der Excel-Upload)
+    return handle_bulk_patient_import(request)
+
+@routes.route('/vehicles/bulk', methods=['POST'])
+def bulk_import_vehicles():
+    # Mitarbeiter als JSON-Array oder NDJSON importieren (ersetzt die Mitarbeiterliste)
+    return handle_bulk_vehicle_import(request)
+
 @routes.route('/update_routes', methods=['POST'])
 def update_routes():
     try:
         data = request.get_json()
-        optimized_routes, unassigned_tk_stops, unassigned_regular_stops = route_optimization_service.process_optimization_result(
+        updated_routes, changed_vehicles = route_optimization_service.evaluate_routes(
             data.get('optimized_routes', []),
-            data.get('unassigned_tk_stops', []),
-            data.get('unassigned_regular_stops', [])
+            saved_result['routes'],
+            vehicles
+        )
+        result = publish_result(
+            updated_routes,
+            data.get('unassigned_regular_stops', []),
+            data.get('unassigned_tk_stops', [])
         )
         
         return jsonify({
             'status': 'success',
-            'routes': optimized_routes,
-            'tk_patients': unassigned_tk_stops,
-            'regular_stops': unassigned_regular_stops
+            **result,
+            'changed_vehicles': changed_vehicles
         })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
@@ -164,12 +581,30 @@ def get_current_weekday():
 
 @routes.route('/get_saved_routes')
 def get_saved_routes():
-    return jsonify({
-        'status': 'success',
-        'routes': optimized_routes,
-        'tk_patients': unassigned_tk_stops,
-        'regular_stops': unassigned_regular_stops
-    })
+    # Ergebnis und Änderungszähler gemeinsam lesen (publish_result ändert beide unter publish_lock)
+    with publish_lock:
+        current = saved_result
+        revision = get_revision('result')
+    return response_cache.respond(request, ('saved_routes', revision),
+                                  lambda: {'status': 'success', **current})
+
+@routes.route('/geocode_cache_stats')
+def get_geocode_cache_stats():
+    return jsonify({'status': 'success', 'stats': geocode_cache_stats()})
+
+@routes.route('/travel_matrix_stats')
+def get_travel_matrix_stats():
+    return jsonify({'status': 'success', 'stats': route_optimization_service.travel_matrix.stats()})
+
+@routes.route('/result_cache_stats')
+def get_result_cache_stats():
+    return jsonify({'status': 'success', 'stats': route_optimization_service.result_cache.stats()})
+
+@routes.route('/result_cache/invalidate', methods=['POST'])
+def invalidate_result_cache():
+    # Leert den Ergebniscache (z.B. nach Änderungen an Straßen oder Besuchsdauern)
+    removed = route_optimization_service.result_cache.invalidate()
+    return jsonify({'status': 'success', 'removed': removed})
 
 @routes.route('/update_vehicle_selection', methods=['POST'])
 def update_vehicle_selection():
@@ -177,14 +612,7 @@ def update_vehicle_selection():
         data = request.get_json()
         vehicle_updates = data.get('vehicles', [])
         
-        for update in vehicle_updates:
-            vehicle_id = update.get('id')
-            is_active = update.get('active')
-            
-            for vehicle in vehicles:
-                if vehicle.id == vehicle_id:
-                    vehicle.is_active = is_active
-                    break
+        update_vehicle_activity({update.get('id'): update.get('active') for update in vehicle_updates})
         
         return jsonify({'status': 'success'})
     except Exception as e:
@@ -197,21 +625,75 @@ def export_routes():
     target_date = DateTimeService.get_date_from_week(week_number, selected_weekday)
     formatted_date = target_date.strftime("%d_%m_%Y")
     
-    output = create_route_pdf(
-        optimized_routes,
-        unassigned_tk_stops,
-        unassigned_regular_stops,
-        selected_weekday,
-        formatted_date
-    )
+    result = saved_result
+    if request.args.get('format') == 'zip':
+        return export_routes_zip(result, selected_weekday, formatted_date)
+
+    def create_pdf():
+        # reportlab wird erst beim ersten Export geladen
+        from services.pdf_service import render_route_pdf
+        output, stats = render_route_pdf(
+            result['routes'],
+            result['tk_patients'],
+            result['regular_stops'],
+            selected_weekday,
+            formatted_date
+        )
+        logger.info(f"PDF export: {stats}")
+        return output.getvalue()
+
+    # Unveränderte Routen werden nicht erneut gerendert
+    key = ResultCache.make_key('pdf', result, selected_weekday, formatted_date)
+    pdf_bytes = export_cache.get_or_create(key, create_pdf)
     
     return send_file(
-        output,
+        BytesIO(pdf_bytes),
         mimetype='application/pdf',
         as_attachment=True,
         download_name=f'Optimierte_Routen_{formatted_date}_{selected_weekday}.pdf'
     )
 
+def export_routes_zip(result, selected_weekday, formatted_date):
+    # ZIP mit einem PDF je Mitarbeiter, wird während der Erzeugung gestreamt
+    from services.pdf_service import render_section_pdf, collect_sections, stream_route_zip
+    sections = collect_sections(result['routes'], result['tk_patients'], result['regular_stops'])
+
+    def render_section(section):
+        key = ResultCache.make_key('section', section, selected_weekday, formatted_date)
+        return export_cache.get_or_create(
+            key, lambda: render_section_pdf(section, selected_weekday, formatted_date)
+        )
+
+    return Response(
+        stream_route_zip(sections, selected_weekday, formatted_date, render_section=render_section),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename="Optimierte_Routen_{formatted_date}_{selected_weekday}.zip"'
+        }
+    )
+
+@routes.route('/metrics')
+def get_metrics():
+    # Metriken im Prometheus-Textformat
+    ROSTER_SIZE.set(len(session_patients()), kind='patients')
+    ROSTER_SIZE.set(len(vehicles), kind='vehicles')
+    ROSTER_SIZE.set(len(get_active_nurses(vehicles)), kind='active_nurses')
+    return Response(metrics_exporter.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@routes.route('/response_cache_stats')
+def get_response_cache_stats():
+    return jsonify({'status': 'success', 'stats': response_cache.stats(), 'viewport': viewport_cache.stats()})
+
+@routes.route('/google_api_health')
+def get_google_api_health():
+    # Aufrufe, Fehler und Circuit Breaker je Google-API
+    apis = google_clients.health() if container.created('google_clients') else {}
+    return jsonify({'status': 'success', 'apis': apis})
+
+@routes.route('/export_cache_stats')
+def get_export_cache_stats():
+    return jsonify({'status': 'success', 'stats': export_cache.stats()})
+
 @routes.errorhandler(Exception)
 def handle_error(error):
     return jsonify({'status': 'error', 'message': str(error)}), 500 
\ No newline at end of file
@@ -0,0 +1,62 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RateLimiter:
+    # Begrenzt die Anfragen pro Sekunde über alle Threads hinweg
+    def __init__(self, qps):
+        self.interval = 1.0 / qps if qps and qps > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Blockiert, bis der nächste freie Zeitslot erreicht ist
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class BatchGeocoder:
+    # Geocodiert viele Adressen parallel mit QPS-Limit und Retry/Backoff
+    def __init__(self, request_fn, max_workers=8, qps=40, max_retries=3, backoff_seconds=0.5):
+        # request_fn(address) -> (lat, lng) oder (None, None); wirft bei Übertragungsfehlern
+        self.request_fn = request_fn
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(0, max_retries)
+        self.backoff_seconds = backoff_seconds
+        self.rate_limiter = RateLimiter(qps)
+
+    def geocode(self, address):
+        # Geocodiert eine einzelne Adresse mit Retry und exponentiellem Backoff
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return self.request_fn(address)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Geocoding error: {e}")
+                    return None, None
+                delay = self.backoff_seconds * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay / 2))
+
+    def geocode_all(self, addresses):
+        # Geocodiert {key: address} und gibt {key: (lat, lng)} zurück
+        if not addresses:
+            return {}
+
+        keys = list(addresses.keys())
+        if len(keys) == 1 or self.max_workers == 1:
+            return {key: self.geocode(addresses[key]) for key in keys}
+
+        workers = min(self.max_workers, len(keys))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='geocode') as executor:
+            results = executor.map(lambda key: self.geocode(addresses[key]), keys)
+            return dict(zip(keys, results))
@@ -0,0 +1,183 @@
+import json
+
+import pandas as pd
+
+from services.geocode_cache import GeocodeCache
+from services.metrics import timed_stage
+
+NDJSON_MIMETYPES = {'application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines'}
+
+
+class BulkImportService:
+    # Importiert Patienten und Mitarbeiter aus JSON-Arrays oder NDJSON-Streams (ohne Excel-Datei)
+    # Jeder Datensatz wird einzeln geprüft; gültige Datensätze werden in Batches vorab geocodiert
+    # und anschließend über import_patients/import_vehicles übernommen (gleiche Regeln wie beim Upload)
+    def __init__(self, file_service, batch_size=500, max_errors=100):
+        self.file_service = file_service
+        self.batch_size = max(1, batch_size)
+        self.max_errors = max_errors
+
+    def read_records(self, request):
+        # Liefert (index, record) aus dem Request; NDJSON wird zeilenweise aus dem Stream gelesen
+        # index: Position im JSON-Array (ab 0) bzw. Zeilennummer bei NDJSON (ab 1)
+        if request.mimetype in NDJSON_MIMETYPES:
+            return self._read_ndjson(request.stream)
+        return self._read_json(request.get_data(cache=False))
+
+    def import_patients(self, records, weekday, partial=False):
+        # Prüft und importiert Patientendatensätze (Schlüssel wie die Spalten der Excel-Datei)
+        # partial: ungültige Datensätze überspringen statt den ganzen Import abzulehnen
+        columns = self.file_service.patient_columns()
+        required = [col for col in columns if col not in ('Telefon', 'Telefon2')]
+        weekdays = list(self.file_service.WEEKDAY_MAPPING.values())
+        week_number = None
+
+        def validate(record):
+            nonlocal week_number
+            errors = self._missing_fields(record, required)
+            errors += self._empty_address_fields(record)
+            kw = self._parse_week(record.get('KW'))
+            if 'KW' in record and kw is None:
+                errors.append('KW muss eine Zahl zwischen 1 und 53 sein.')
+            elif kw is not None:
+                if week_number is None:
+                    week_number = kw
+                elif kw != week_number:
+                    errors.append(f'Abweichende Kalenderwoche {kw} (erwartet {week_number}).')
+            invalid_types = [str(record[day]) for day in weekdays
+                             if not self._is_empty(record.get(day))
+                             and record[day] not in self.file_service.VALID_VISIT_TYPES]
+            if invalid_types:
+                errors.append(f'Fehlerhafte Besuchsarten: {", ".join(invalid_types)}. '
+                              f'Erlaubte Besuchsarten sind: {", ".join(self.file_service.VALID_VISIT_TYPES)}')
+            return errors
+
+        def has_visit(record):
+            return any(record.get(day) in self.file_service.VALID_VISIT_TYPES for day in weekdays)
+
+        df, summary = self._collect(records, columns, validate, has_visit, partial)
+        if not self._accepted(summary, partial):
+            return self._rejected(summary, 'Patienten')
+        if df.empty:
+            return self._result({'success': False, 'message': 'Keine gültigen Patientendatensätze gefunden.'}, summary)
+        return self._result(self.file_service.import_patients(df, weekday), summary)
+
+    def import_vehicles(self, records, partial=False):
+        # Prüft und importiert Mitarbeiterdatensätze (Schlüssel wie die Spalten der Excel-Datei)
+        columns = self.file_service.vehicle_columns()
+
+        def validate(record):
+            errors = self._missing_fields(record, columns)
+            errors += self._empty_address_fields(record)
+            funktion = record.get('Funktion')
+            if not self._is_empty(funktion) and funktion not in self.file_service.VALID_FUNCTIONS:
+                errors.append(f'Fehlerhafte Funktion: {funktion}. '
+                              f'Erlaubte Funktionen sind: {", ".join(self.file_service.VALID_FUNCTIONS)}')
+            return errors
+
+        df, summary = self._collect(records, columns, validate, lambda record: True, partial)
+        if not self._accepted(summary, partial):
+            return self._rejected(summary, 'Mitarbeiter')
+        if df.empty:
+            return self._result({'success': False, 'message': 'Keine gültigen Mitarbeiterdatensätze gefunden.'}, summary)
+        return self._result(self.file_service.import_vehicles(df), summary)
+
+    @timed_stage('bulk_validate')
+    def _collect(self, records, columns, validate, needs_geocoding, partial):
+        # Prüft alle Datensätze, sammelt die gültigen spaltenweise und geocodiert sie batchweise vorab
+        # Ohne partial wird nach dem ersten ungültigen Datensatz nicht mehr geocodiert (Import wird abgelehnt)
+        data = {col: [] for col in columns}
+        summary = {'received': 0, 'valid': 0, 'rejected': 0, 'errors': []}
+        pending = {}
+        for index, record in records:
+            summary['received'] += 1
+            if isinstance(record, Exception):
+                errors = [f'Ungültiges JSON: {record}']
+            elif not isinstance(record, dict):
+                errors = ['Datensatz muss ein JSON-Objekt sein.']
+            else:
+                errors = validate(record)
+            if errors:
+                summary['rejected'] += 1
+                if len(summary['errors']) < self.max_errors:
+                    summary['errors'].append({'index': index, 'errors': errors})
+                continue
+
+            summary['valid'] += 1
+            for col in columns:
+                value = record.get(col)
+                data[col].append(float('nan') if self._is_empty(value) else value)
+            if needs_geocoding(record) and (partial or summary['rejected'] == 0):
+                key = GeocodeCache.normalize_key(record['Strasse'], record['PLZ'], record['Ort'])
+                pending.setdefault(key, f"{record['Strasse']}, {record['PLZ']} {record['Ort']}")
+                if len(pending) >= self.batch_size:
+                    self.file_service.warm_geocode_cache(pending)
+                    pending = {}
+        if pending and self._accepted(summary, partial):
+            self.file_service.warm_geocode_cache(pending)
+        return pd.DataFrame(data, columns=columns), summary
+
+    def _accepted(self, summary, partial):
+        return summary['rejected'] == 0 or (partial and summary['valid'] > 0)
+
+    def _rejected(self, summary, label):
+        return self._result({
+            'success': False,
+            'message': f"{summary['rejected']} von {summary['received']} {label}-Datensätzen sind ungültig. "
+                       f"Es wurde nichts importiert."
+        }, summary, imported=False)
+
+    def _result(self, result, summary, imported=True):
+        # Ergebnis des Imports mit Zählern und Fehlern je Datensatz
+        return {
+            **result,
+            'received': summary['received'],
+            'imported': summary['valid'] if imported and result.get('success') else 0,
+            'rejected': summary['rejected'],
+            'errors': summary['errors'],
+            'errors_truncated': summary['rejected'] > len(summary['errors'])
+        }
+
+    def _read_ndjson(self, stream):
+        # Eine Zeile = ein Datensatz; leere Zeilen werden übersprungen
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+
+    def _read_json(self, body):
+        # JSON-Array oder Objekt mit 'records'
+        try:
+            payload = json.loads(body or b'null')
+        except ValueError as e:
+            raise ValueError(f'Ungültiges JSON: {e}')
+        if isinstance(payload, dict):
+            payload = payload.get('records')
+        if not isinstance(payload, list):
+            raise ValueError('Erwartet wird ein JSON-Array oder ein Objekt mit "records".')
+        return enumerate(payload)
+
+    def _missing_fields(self, record, fields):
+        missing = [field for field in fields if field not in record]
+        return [f'Fehlende Felder: {", ".join(missing)}'] if missing else []
+
+    def _empty_address_fields(self, record):
+        empty = [field for field in ('Nachname', 'Strasse', 'PLZ', 'Ort')
+                 if field in record and self._is_empty(record[field])]
+        return [f'Leere Felder: {", ".join(empty)}'] if empty else []
+
+    def _parse_week(self, value):
+        try:
+            week = int(float(value))
+        except (TypeError, ValueError):
+            return None
+        return week if 1 <= week <= 53 and week == float(value) else None
+
+    @staticmethod
+    def _is_empty(value):
+        return value is None or (isinstance(value, str) and value.strip() == '') or (
+            isinstance(value, float) and value != value)
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from werkzeug.local import LocalProxy
+
+
+class ServiceContainer:
+    # Erstellt Services erst beim ersten Zugriff, damit schwere Importe (pandas, Google-Clients)
+    # und Zugangsdaten erst dann benötigt werden, wenn der Service wirklich gebraucht wird
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+        self.init_seconds = {}
+        self.verbose = False
+
+    def register(self, name, factory):
+        # Registriert eine Factory und gibt einen Platzhalter zurück, der beim ersten Zugriff erstellt
+        self._factories[name] = factory
+        return self.proxy(name)
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                started = time.perf_counter()
+                instance = self._factories[name]()
+                self.init_seconds[name] = round(time.perf_counter() - started, 4)
+                self._instances[name] = instance
+                if self.verbose:
+                    print(f"Service {name} initialized in {self.init_seconds[name]:.3f}s")
+            return instance
+
+    def proxy(self, name):
+        # Verhält sich wie der Service selbst (Attributzugriffe werden weitergereicht)
+        return LocalProxy(lambda: self.get(name))
+
+    def created(self, name):
+        return name in self._instances
+
+    def stats(self):
+        return {
+            'registered': sorted(self._factories),
+            'created': dict(self.init_seconds)
+        }
+
+
+container = ServiceContainer()
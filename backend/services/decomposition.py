@@ -0,0 +1,287 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.local_solver import LocalOptimizeToursResponse, LocalSkippedShipment, parse_duration
+from services.metrics import timed_stage
+from services.route_solvers import RouteSolver
+
+# Geschätzte Fahrzeit je Besuch für die Lastverteilung (Sekunden)
+TRAVEL_ALLOWANCE_SECONDS = 600
+# Besuche, deren zweitnächstes Cluster höchstens 25 % weiter entfernt ist, gelten als Grenzbesuche
+BORDER_MARGIN = 0.25
+
+
+class ClusteredSolver(RouteSolver):
+    # Zerlegt große Anfragen geografisch (k-means) und löst die Teilgebiete parallel
+    # Kleine Anfragen werden unverändert an den eigentlichen Optimierer weitergegeben
+    def __init__(self, solver, cluster_size=60, min_shipments=120, max_workers=4):
+        self.solver = solver
+        self.name = solver.name
+        self.cluster_size = max(1, cluster_size)
+        self.min_shipments = min_shipments
+        self.max_workers = max(1, max_workers)
+
+    def solve(self, request, should_stop=None):
+        model = request['model']
+        shipments = model.get('shipments', [])
+        vehicles = model.get('vehicles', [])
+        cluster_count = min(len(vehicles), math.ceil(len(shipments) / self.cluster_size))
+        if len(shipments) < self.min_shipments or cluster_count < 2:
+            return self.solver.solve(request, should_stop=should_stop)
+
+        reference_lat = float(np.mean([_shipment_location(s)[0] for s in shipments]))
+        points = _project([_shipment_location(s) for s in shipments], reference_lat)
+        depots = _project([(v['start_location']['latitude'], v['start_location']['longitude']) for v in vehicles],
+                          reference_lat)
+        with timed_stage('decompose'):
+            clusters = self._build_clusters(points, depots, shipments, vehicles, cluster_count)
+
+        responses = self._solve_all(request, clusters, should_stop)
+
+        # Nicht zugewiesene Besuche einmalig im benachbarten Teilgebiet nachplanen
+        if not (should_stop and should_stop()):
+            self._retry_skipped(request, points, clusters, responses, should_stop)
+
+        return self._merge(clusters, responses)
+
+    def _build_clusters(self, points, depots, shipments, vehicles, cluster_count):
+        # Gibt [{'shipments': [...], 'vehicles': [...], 'centroid': (y, x)}] mit Originalindizes zurück
+        centroids, labels = kmeans(points, cluster_count)
+
+        demand = np.array([(parse_duration(s['pickups'][0].get('duration')) or 0) + TRAVEL_ALLOWANCE_SECONDS
+                           for s in shipments], dtype=np.float64)
+        capacity = np.array([_vehicle_capacity(v) for v in vehicles], dtype=np.float64)
+        vehicle_labels = _assign_vehicles(depots, centroids, labels, demand, capacity)
+        labels = _rebalance_borders(points, centroids, labels, vehicle_labels, demand, capacity)
+
+        clusters = []
+        for cluster in range(cluster_count):
+            shipment_indices = np.flatnonzero(labels == cluster).tolist()
+            vehicle_indices = np.flatnonzero(vehicle_labels == cluster).tolist()
+            if not shipment_indices and not vehicle_indices:
+                continue
+            clusters.append({
+                'shipments': shipment_indices,
+                'vehicles': vehicle_indices,
+                'centroid': centroids[cluster]
+            })
+        return clusters
+
+    def _solve_all(self, request, clusters, should_stop, extra=None):
+        # Löst die Teilgebiete parallel; extra = {Clusterindex: zusätzliche Besuche}
+        # Mit extra werden nur diese Teilgebiete erneut gelöst (die übrigen Ergebnisse bleiben None)
+        candidates = range(len(clusters)) if extra is None else sorted(extra)
+        extra = extra or {}
+        indices = [i for i in candidates if clusters[i]['vehicles'] and
+                   (clusters[i]['shipments'] or extra.get(i))]
+
+        def solve_cluster(i):
+            shipment_indices = clusters[i]['shipments'] + extra.get(i, [])
+            return self.solver.solve(
+                _sub_request(request, shipment_indices, clusters[i]['vehicles']),
+                should_stop=should_stop
+            )
+
+        workers = min(self.max_workers, len(indices)) or 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cluster') as executor:
+            results = dict(zip(indices, executor.map(solve_cluster, indices)))
+        return [results.get(i) for i in range(len(clusters))]
+
+    def _retry_skipped(self, request, points, clusters, responses, should_stop):
+        # Übergibt nicht eingeplante Besuche an das nächstgelegene andere Teilgebiet mit Fahrzeugen
+        staffed = [i for i, cluster in enumerate(clusters) if cluster['vehicles']]
+        if len(staffed) < 2:
+            return
+
+        extra = {}
+        for i, cluster in enumerate(clusters):
+            for shipment in _skipped_originals(cluster, responses[i]):
+                neighbour = min(
+                    (j for j in staffed if j != i),
+                    key=lambda j: float(np.sum((clusters[j]['centroid'] - points[shipment]) ** 2))
+                )
+                extra.setdefault(neighbour, []).append(shipment)
+
+        if not extra:
+            return
+
+        retried = self._solve_all(request, clusters, should_stop, extra=extra)
+        for i, shipment_indices in extra.items():
+            if retried[i] is None or _assigned_count(retried[i]) <= _assigned_count(responses[i]):
+                continue
+            # Bessere Lösung übernehmen; im ursprünglichen Teilgebiet bleiben die Besuche
+            # als nicht eingeplant stehen und werden beim Zusammenführen bereinigt
+            responses[i] = retried[i]
+            clusters[i]['shipments'] = clusters[i]['shipments'] + shipment_indices
+
+    def _merge(self, clusters, responses):
+        # Führt die Teilergebnisse mit den ursprünglichen Fahrzeug- und Besuchsindizes zusammen
+        routes = []
+        assigned = set()
+        skipped = set()
+        for cluster, response in zip(clusters, responses):
+            if response is None:
+                skipped.update(cluster['shipments'])
+                continue
+            for route in response.routes:
+                route.vehicle_index = cluster['vehicles'][route.vehicle_index]
+                for visit in route.visits:
+                    visit.shipment_index = cluster['shipments'][visit.shipment_index]
+                    assigned.add(visit.shipment_index)
+                routes.append(route)
+            skipped.update(
+                cluster['shipments'][s.index] for s in getattr(response, 'skipped_shipments', [])
+            )
+
+        routes.sort(key=lambda route: route.vehicle_index)
+        return LocalOptimizeToursResponse(
+            routes,
+            [LocalSkippedShipment(index) for index in sorted(skipped - assigned)]
+        )
+
+
+def kmeans(points, k, iterations=25, seed=0):
+    # k-means mit k-means++-Start; fester Seed, damit gleiche Anfragen gleich zerlegt werden
+    rng = np.random.default_rng(seed)
+    centroids = np.empty((k, 2))
+    centroids[0] = points[rng.integers(len(points))]
+    closest = ((points - centroids[0]) ** 2).sum(axis=1)
+    for cluster in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(points), p=closest / total) if total > 0 else rng.integers(len(points))
+        centroids[cluster] = points[index]
+        closest = np.minimum(closest, ((points - centroids[cluster]) ** 2).sum(axis=1))
+
+    labels = None
+    for _ in range(iterations):
+        new_labels = _nearest(points, centroids)[:, 0]
+        counts = np.bincount(new_labels, minlength=k)
+        filled = counts > 0
+        for axis in range(2):
+            sums = np.bincount(new_labels, weights=points[:, axis], minlength=k)
+            centroids[filled, axis] = sums[filled] / counts[filled]
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return centroids, labels
+
+
+def _nearest(points, centroids, count=1, chunk_size=4096):
+    # Indizes der count nächsten Zentren je Punkt (blockweise, damit große Listen wenig Speicher brauchen)
+    result = np.empty((len(points), count), dtype=np.int64)
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    for start in range(0, len(points), chunk_size):
+        block = points[start:start + chunk_size]
+        distances = centroid_norms[None, :] - 2 * block @ centroids.T
+        if count == 1:
+            result[start:start + len(block), 0] = distances.argmin(axis=1)
+        else:
+            candidates = np.argpartition(distances, count - 1, axis=1)[:, :count]
+            order = np.argsort(np.take_along_axis(distances, candidates, axis=1), axis=1)
+            result[start:start + len(block)] = np.take_along_axis(candidates, order, axis=1)
+    return result
+
+
+def _assign_vehicles(depots, centroids, labels, demand, capacity):
+    # Verteilt die Fahrzeuge nach Bedarf: das Cluster mit dem höchsten Bedarf je Kapazität
+    # erhält jeweils das nächstgelegene freie Fahrzeug
+    k = len(centroids)
+    cluster_demand = np.bincount(labels, weights=demand, minlength=k)
+    cluster_capacity = np.zeros(k)
+    vehicle_labels = np.full(len(depots), -1, dtype=np.int64)
+    distances = ((depots[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+
+    for _ in range(len(depots)):
+        cluster = int(np.argmax(cluster_demand / (cluster_capacity + 1.0)))
+        free = np.flatnonzero(vehicle_labels == -1)
+        vehicle = int(free[np.argmin(distances[free, cluster])])
+        vehicle_labels[vehicle] = cluster
+        cluster_capacity[cluster] += capacity[vehicle]
+    return vehicle_labels
+
+
+def _rebalance_borders(points, centroids, labels, vehicle_labels, demand, capacity):
+    # Verschiebt Grenzbesuche vom stärker ausgelasteten in das benachbarte, weniger ausgelastete Cluster
+    k = len(centroids)
+    labels = labels.copy()
+    cluster_demand = np.bincount(labels, weights=demand, minlength=k)
+    cluster_capacity = np.bincount(vehicle_labels, weights=capacity, minlength=k)
+
+    order = _nearest(points, centroids, count=2)
+    # Nächstes Cluster außer dem eigenen
+    second = np.where(order[:, 0] == labels, order[:, 1], order[:, 0])
+    nearest = np.sqrt(((points - centroids[labels]) ** 2).sum(axis=1))
+    second_distance = np.sqrt(((points - centroids[second]) ** 2).sum(axis=1))
+
+    border = np.flatnonzero(second_distance <= nearest * (1 + BORDER_MARGIN))
+    # Besuche nahe der Grenze zuerst
+    for shipment in border[np.argsort(second_distance[border] / np.maximum(nearest[border], 1e-9))]:
+        source, target = labels[shipment], second[shipment]
+        if cluster_capacity[target] <= 0:
+            continue
+        source_load = cluster_demand[source] / max(cluster_capacity[source], 1.0)
+        target_load = (cluster_demand[target] + demand[shipment]) / cluster_capacity[target]
+        if target_load < source_load:
+            labels[shipment] = target
+            cluster_demand[source] -= demand[shipment]
+            cluster_demand[target] += demand[shipment]
+    return labels
+
+
+def _sub_request(request, shipment_indices, vehicle_indices):
+    # Teilanfrage mit ausgewählten Besuchen und Fahrzeugen (übrige Felder unverändert)
+    model = request['model']
+    sub_request = {
+        **request,
+        'model': {
+            **model,
+            'shipments': [model['shipments'][i] for i in shipment_indices],
+            'vehicles': [model['vehicles'][i] for i in vehicle_indices]
+        }
+    }
+    if request.get('injected_first_solution_routes'):
+        # Startlösung auf die Indizes der Teilanfrage umrechnen
+        shipment_map = {original: i for i, original in enumerate(shipment_indices)}
+        vehicle_map = {original: i for i, original in enumerate(vehicle_indices)}
+        injected = []
+        for route in request['injected_first_solution_routes']:
+            vehicle = vehicle_map.get(route.get('vehicle_index', 0))
+            visits = [{**visit, 'shipment_index': shipment_map[visit.get('shipment_index', 0)]}
+                      for visit in route.get('visits', []) if visit.get('shipment_index', 0) in shipment_map]
+            if vehicle is not None and visits:
+                injected.append({**route, 'vehicle_index': vehicle, 'visits': visits})
+        sub_request['injected_first_solution_routes'] = injected
+    return sub_request
+
+
+def _skipped_originals(cluster, response):
+    # Originalindizes der nicht eingeplanten Besuche eines Teilergebnisses
+    if response is None:
+        return list(cluster['shipments'])
+    return [cluster['shipments'][s.index] for s in getattr(response, 'skipped_shipments', [])]
+
+
+def _assigned_count(response):
+    if response is None:
+        return 0
+    return sum(len(route.visits) for route in response.routes)
+
+
+def _shipment_location(shipment):
+    location = shipment['pickups'][0]['arrival_location']
+    return location['latitude'], location['longitude']
+
+
+def _vehicle_capacity(vehicle):
+    # Kapazität in Sekunden (Soft-Limit, sonst hartes Limit, sonst ein Arbeitstag)
+    limit = vehicle.get('route_duration_limit', {})
+    return parse_duration(limit.get('soft_max_duration')) or parse_duration(limit.get('max_duration')) or 8 * 3600
+
+
+def _project(coordinates, reference_lat):
+    # Grobe Projektion auf eine Ebene (Längengrade mit cos(Bezugsbreite) gestaucht)
+    projected = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2).copy()
+    projected[:, 1] *= math.cos(math.radians(reference_lat))
+    return projected
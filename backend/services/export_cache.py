@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+
+
+class ExportCache:
+    # Speicher für erzeugte Exporte (PDF-Bytes), begrenzt nach Anzahl und Gesamtgröße (LRU)
+    def __init__(self, max_entries=256, max_bytes=100 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        # Gibt die gespeicherten Bytes zurück oder None
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def set(self, key, data):
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            # Einzelne Exporte über dem Limit werden nicht gespeichert
+            if self.max_bytes and len(data) > self.max_bytes:
+                return
+            self._entries[key] = data
+            self._size += len(data)
+            self._evict()
+
+    def get_or_create(self, key, create):
+        # Gibt den gespeicherten Export zurück oder erzeugt ihn über create()
+        data = self.get(key)
+        if data is None:
+            data = create()
+            self.set(key, data)
+        return data
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+    def _evict(self):
+        # Entfernt die am längsten nicht genutzten Exporte
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries) or
+            (self.max_bytes and self._size > self.max_bytes)
+        ):
+            _, data = self._entries.popitem(last=False)
+            self._size -= len(data)
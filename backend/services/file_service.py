@@ -1,16 +1,35 @@
 import pandas as pd
-import googlemaps
-from flask import session, current_app
-from models import Patient, Vehicle, patients, vehicles
+from flask import session
+from models import Patient, Vehicle, vehicles, set_week_patients, set_vehicles
 from config import Config
-import os
-from werkzeug.utils import secure_filename
+from services.geocode_cache import GeocodeCache
+from services.batch_geocoder import BatchGeocoder
+from services.metrics import GEOCODE_FAILURES, timed_stage
+from services.google_clients import google_clients
+from services.table_reader import DEFAULT_NA_VALUES, SUPPORTED_EXTENSIONS, read_table
+
+# 'NA' ist in der Patientendatei eine Besuchsart und darf nicht als leere Zelle gelesen werden
+PATIENT_NA_VALUES = [value for value in DEFAULT_NA_VALUES if value != 'NA']
+
+# Namen und Adressen werden als Text gelesen (sonst wird z.B. aus der PLZ "01067" die Zahl 1067)
+TEXT_COLUMNS = ['Nachname', 'Vorname', 'Strasse', 'Ort', 'PLZ']
 
 
 class FileService:
     def __init__(self):
-        self.gmaps = googlemaps.Client(Config.GOOGLE_MAPS_API_KEY)
-        self.ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+        self.geocode_cache = GeocodeCache(
+            Config.GEOCODE_CACHE_FILE,
+            ttl_days=Config.GEOCODE_CACHE_TTL_DAYS,
+            max_entries=Config.GEOCODE_CACHE_MAX_ENTRIES
+        )
+        # Wiederholungen mit Backoff übernimmt der gemeinsame Google-Client (siehe _geocode_request)
+        self.batch_geocoder = BatchGeocoder(
+            self._geocode_request,
+            max_workers=Config.GEOCODE_MAX_WORKERS,
+            qps=Config.GEOCODE_QPS,
+            max_retries=0
+        )
+        self.ALLOWED_EXTENSIONS = set(SUPPORTED_EXTENSIONS)
         self.VALID_VISIT_TYPES = {'HB', 'TK', 'NA'}
         self.VALID_FUNCTIONS = {'Arzt', 'Pflegekraft', 'Honorararzt', 'Physiotherapie', 'PDL'}
         self.WEEKDAY_MAPPING = {
@@ -21,157 +40,261 @@ class FileService:
             4: 'Freitag'
         }
 
+    @property
+    def gmaps(self):
+        # Gemeinsamer Google-Maps-Client (wird erst beim ersten Geocoding erstellt)
+        return google_clients.maps
+
     def allowed_file(self, filename):
         # Überprüft, ob die Dateiendung erlaubt ist
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in self.ALLOWED_EXTENSIONS
 
-    def geocode_address(self, address):
-        # Geocodiert eine Adresse zu Koordinaten
-        try:
-            result = self.gmaps.geocode(address)
-            if result:
-                location = result[0]['geometry']['location']
-                return location['lat'], location['lng']
-            return None, None
-        except Exception as e:
-            print(f"Geocoding error: {e}")
-            return None, None
+    def geocode_address(self, address, cache_key=None):
+        # Geocodiert eine Adresse zu Koordinaten (zuerst aus dem Cache)
+        key = cache_key or GeocodeCache.key_from_address(address)
+        cached = self.geocode_cache.get(key)
+        if cached is not None:
+            return cached
+
+        lat, lon = self.batch_geocoder.geocode(address)
+        self.geocode_cache.set(key, lat, lon)
+        return lat, lon
+
+    @timed_stage('geocode')
+    def geocode_rows(self, df):
+        # Geocodiert alle Zeilen eines DataFrames; identische Adressen werden nur einmal aufgelöst
+        # Gibt eine Liste von (lat, lon) in der Reihenfolge der Zeilen zurück
+        triples = list(zip(df['Strasse'], df['PLZ'], df['Ort']))
+        keys_by_triple = {}
+        addresses = {}
+        for street, plz, ort in triples:
+            if (street, plz, ort) not in keys_by_triple:
+                key = GeocodeCache.normalize_key(street, plz, ort)
+                keys_by_triple[(street, plz, ort)] = key
+                addresses.setdefault(key, f"{street}, {plz} {ort}")
+        keys = [keys_by_triple[triple] for triple in triples]
+
+        results = self.warm_geocode_cache(addresses)
+        failures = sum(1 for key in addresses if results.get(key, (None, None))[0] is None)
+        if failures:
+            GEOCODE_FAILURES.inc(failures)
+        return [results.get(key, (None, None)) for key in keys]
+
+    def warm_geocode_cache(self, addresses):
+        # Füllt den Cache für {key: address}; fehlende Adressen werden gebündelt parallel geocodiert
+        return self.geocode_cache.warm_up(addresses, self.batch_geocoder.geocode_all)
+
+    def geocode_cache_stats(self):
+        # Gibt die Statistik des Geocoding-Caches zurück
+        return self.geocode_cache.stats()
+
+    def _geocode_request(self, address):
+        # Fragt die Google Geocoding API ab (mit Deadline, Backoff und Circuit Breaker)
+        # Verbleibende Fehler werden vom BatchGeocoder behandelt
+        result = google_clients.geocode(
+            address,
+            retries=Config.GEOCODE_MAX_RETRIES,
+            backoff_seconds=Config.GEOCODE_BACKOFF_SECONDS
+        )
+        if result:
+            location = result[0]['geometry']['location']
+            return location['lat'], location['lng']
+        return None, None
 
     def process_patient_file(self, file, selected_weekday=None):
         if not file or not self.allowed_file(file.filename):
             return {'success': False, 'message': 'Ungültige Datei'}
-            
-        # Sichere Datei temporär speichern
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
+
         try:
-            na_values = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', 
-                                '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A',
-                                'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+            # Direkt aus dem Upload-Stream lesen (ohne Zwischenspeichern im UPLOAD_FOLDER)
+            df = self.read_patient_file(file, file.filename)
             
-            df = pd.read_excel(
-                filepath,
-                keep_default_na=False,
-                na_values=na_values,
-                na_filter=True
-            )
-            
-            # Validiere Spalten
-            if not self._validate_patient_columns(df):
-                return {
-                    'success': False,
-                    'message': 'Excel-Datei hat nicht alle erforderlichen Spalten.'
-                }
-
-            # Validiere Kalenderwoche
-            validation_result = self._validate_calendar_week(df)
-            if not validation_result['success']:
-                return validation_result
-
             weekday = selected_weekday or session.get('selected_weekday', 'Montag')
-            week_number = int(df['KW'].iloc[0])
-            session['selected_week'] = week_number
-
-            # Überprüfe auf ungültige Visit-Types
-            invalid_types = df[weekday].dropna().unique()
-            invalid_types = [t for t in invalid_types if t not in self.VALID_VISIT_TYPES]
-            
-            if invalid_types:
-                return {
-                    'success': False,
-                    'message': f'Fehlerhafte Besuchsarten gefunden: {", ".join(invalid_types)}. ' 
-                              f'Erlaubte Besuchsarten sind: {", ".join(self.VALID_VISIT_TYPES)}'
-                }
-
-            # Verarbeite Patienten
-            patients.clear()
-            df_filtered = df[df[weekday].isin(self.VALID_VISIT_TYPES)].copy()
-            
-            for _, row in df_filtered.iterrows():
-                self._create_patient_from_row(row, weekday)
-
-            message = (f'Keine Patienten für {weekday} gefunden.' if len(patients) == 0 
-                      else f'{len(patients)} Patienten für {weekday} erfolgreich importiert.')
-            
-            return {
-                'success': True,
-                'message': message
-            }
+            result = self.import_patients(df, weekday)
+            if result['success']:
+                session['selected_week'] = result['week_number']
+            return result
 
         except Exception as e:
             return {
                 'success': False,
                 'message': f'Fehler beim Verarbeiten der Datei: {str(e)}'
             }
-        finally:
-            # Lösche temporäre Datei
-            if os.path.exists(filepath):
-                os.remove(filepath)
+
+    @timed_stage('excel_parse')
+    def read_patient_file(self, source, filename=None):
+        # Liest eine Patientendatei (Excel, CSV oder Parquet) aus einem Pfad oder Stream
+        # Nur die benötigten Spalten werden übernommen; leere Zellen und NA-Schreibweisen werden zu NaN
+        return read_table(source, filename, columns=self.patient_columns(), na_values=PATIENT_NA_VALUES,
+                          text_columns=self.patient_text_columns())
+
+    @timed_stage('excel_parse')
+    def read_vehicle_file(self, source, filename=None):
+        # Liest eine Mitarbeiterdatei (Excel, CSV oder Parquet) aus einem Pfad oder Stream
+        return read_table(source, filename, columns=self.vehicle_columns(), text_columns=TEXT_COLUMNS)
 
     def process_vehicle_file(self, file):
         if not file or not self.allowed_file(file.filename):
             return {'success': False, 'message': 'Ungültige Datei'}
-            
-        # Sichere Datei temporär speichern
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
+
         try:
-            df = pd.read_excel(filepath)
-            
-            if not self._validate_vehicle_columns(df):
-                return {
-                    'success': False,
-                    'message': 'Excel-Datei hat nicht alle erforderlichen Spalten.'
-                }
-
-            # Überprüfe auf ungültige Funktionen der Mitarbeiter
-            invalid_functions = df['Funktion'].dropna().unique()
-            invalid_functions = [f for f in invalid_functions if f not in self.VALID_FUNCTIONS]
-            
-            if invalid_functions:
-                return {
-                    'success': False,
-                    'message': f'Fehlerhafte Funktionen gefunden: {", ".join(invalid_functions)}. ' 
-                              f'Erlaubte Funktionen sind: {", ".join(self.VALID_FUNCTIONS)}'
-                }
-
-            vehicles.clear()
-            for _, row in df.iterrows():
-                self._create_vehicle_from_row(row)
-
-            message = (f'Keine Mitarbeiter importiert.' if len(vehicles) == 0 
-                      else f'{len(vehicles)} Mitarbeiter erfolgreich importiert.')
-            
-            return {
-                'success': True,
-                'message': message
-            }
+            df = self.read_vehicle_file(file, file.filename)
+            return self.import_vehicles(df)
 
         except Exception as e:
             return {
                 'success': False,
                 'message': f'Fehler beim Verarbeiten der Datei: {str(e)}'
             }
-        finally:
-            # Lösche temporäre Datei
-            if os.path.exists(filepath):
-                os.remove(filepath)
+
+    def patient_columns(self):
+        # Spalten der Patientendatei, die beim Import verwendet werden
+        weekdays = list(self.WEEKDAY_MAPPING.values())
+        return (['Nachname', 'Vorname', 'Strasse', 'Ort', 'PLZ', 'KW'] + weekdays
+                + [f"Uhrzeit/Info {day}" for day in weekdays] + ['Telefon', 'Telefon2'])
+
+    def patient_text_columns(self):
+        # Spalten der Patientendatei, die unverändert als Text übernommen werden (PLZ, Telefon, Uhrzeit)
+        weekdays = list(self.WEEKDAY_MAPPING.values())
+        return TEXT_COLUMNS + ['Telefon', 'Telefon2'] + [f"Uhrzeit/Info {day}" for day in weekdays]
+
+    def vehicle_columns(self):
+        # Spalten der Mitarbeiterdatei, die beim Import verwendet werden
+        return ['Nachname', 'Vorname', 'Strasse', 'Ort', 'PLZ', 'Stellenumfang', 'Funktion']
+
+    @timed_stage('import_patients')
+    def import_patients(self, df, weekday):
+        # Validiert und importiert die Patienten aller Wochentage der KW aus einem DataFrame
+        # Validiere Spalten
+        if not self._validate_patient_columns(df):
+            return {
+                'success': False,
+                'message': 'Excel-Datei hat nicht alle erforderlichen Spalten.'
+            }
+
+        # Validiere Kalenderwoche
+        validation_result = self._validate_calendar_week(df)
+        if not validation_result['success']:
+            return validation_result
+
+        week_number = int(df['KW'].iloc[0])
+        weekdays = list(self.WEEKDAY_MAPPING.values())
+
+        # Überprüfe auf ungültige Visit-Types (für alle Wochentage)
+        invalid_types = pd.unique(df[weekdays].to_numpy().ravel())
+        invalid_types = [t for t in invalid_types if pd.notna(t) and t not in self.VALID_VISIT_TYPES]
+        
+        if invalid_types:
+            return {
+                'success': False,
+                'message': f'Fehlerhafte Besuchsarten gefunden: {", ".join(invalid_types)}. ' 
+                          f'Erlaubte Besuchsarten sind: {", ".join(self.VALID_VISIT_TYPES)}'
+            }
+
+        # Nur Patienten mit mindestens einem Besuch in der Woche werden geocodiert (jede Adresse einmal)
+        df_week = df[df[weekdays].isin(self.VALID_VISIT_TYPES).any(axis=1)]
+        base_columns = {
+            'name': self._build_names(df_week),
+            'address': self._build_addresses(df_week),
+            'phone_numbers': self._merge_phone_numbers(df_week)
+        }
+        coordinates = self.geocode_rows(df_week)
+
+        # Verarbeite Patienten je Wochentag spaltenweise und erstelle die Objekte gebündelt
+        week_patients = {}
+        for day in weekdays:
+            mask = df_week[day].isin(self.VALID_VISIT_TYPES).tolist()
+            day_patients = []
+            self._append_entities(day_patients, [
+                Patient(
+                    name=name,
+                    address=address,
+                    visit_type=visit_type,
+                    time_info=time_info,
+                    phone_numbers=phone_numbers,
+                    lat=lat,
+                    lon=lon
+                )
+                for is_visit, name, address, visit_type, time_info, phone_numbers, (lat, lon) in zip(
+                    mask, base_columns['name'], base_columns['address'], df_week[day].tolist(),
+                    self._clean_text_column(df_week, f"Uhrzeit/Info {day}", strip=False),
+                    base_columns['phone_numbers'], coordinates
+                )
+                if is_visit
+            ])
+            week_patients[day] = day_patients
+
+        set_week_patients(week_patients)
+
+        day_count = len(week_patients.get(weekday, []))
+        message = (f'Keine Patienten für {weekday} gefunden.' if day_count == 0
+                  else f'{day_count} Patienten für {weekday} erfolgreich importiert.')
+        message += ' Wochenübersicht: ' + ', '.join(
+            f'{day} {len(week_patients[day])}' for day in weekdays
+        ) + '.'
+        
+        return {
+            'success': True,
+            'message': message,
+            'week_number': week_number
+        }
+
+    @timed_stage('import_vehicles')
+    def import_vehicles(self, df):
+        # Validiert und importiert Mitarbeiter aus einem DataFrame
+        if not self._validate_vehicle_columns(df):
+            return {
+                'success': False,
+                'message': 'Excel-Datei hat nicht alle erforderlichen Spalten.'
+            }
+
+        # Überprüfe auf ungültige Funktionen der Mitarbeiter
+        invalid_functions = df['Funktion'].dropna().unique()
+        invalid_functions = [f for f in invalid_functions if f not in self.VALID_FUNCTIONS]
+        
+        if invalid_functions:
+            return {
+                'success': False,
+                'message': f'Fehlerhafte Funktionen gefunden: {", ".join(invalid_functions)}. ' 
+                          f'Erlaubte Funktionen sind: {", ".join(self.VALID_FUNCTIONS)}'
+            }
+
+        columns = self._prepare_vehicle_columns(df)
+        coordinates = self.geocode_rows(df)
+
+        new_vehicles = []
+        self._append_entities(new_vehicles, [
+            Vehicle(
+                name=name,
+                start_address=address,
+                lat=lat,
+                lon=lon,
+                stellenumfang=stellenumfang,
+                funktion=funktion
+            )
+            for name, address, stellenumfang, funktion, (lat, lon) in zip(
+                columns['name'], columns['address'], columns['stellenumfang'],
+                columns['funktion'], coordinates
+            )
+        ])
+        set_vehicles(new_vehicles)
+
+        message = (f'Keine Mitarbeiter importiert.' if len(vehicles) == 0 
+                  else f'{len(vehicles)} Mitarbeiter erfolgreich importiert.')
+        
+        return {
+            'success': True,
+            'message': message
+        }
 
     def _validate_patient_columns(self, df):
         # Validiert die Spalten der Patientendatei
-        required_columns = ['Nachname', 'Vorname', 'Strasse', 'Ort', 'PLZ', 'KW']
-        required_columns += list(self.WEEKDAY_MAPPING.values())
-        required_columns += [f"Uhrzeit/Info {day}" for day in self.WEEKDAY_MAPPING.values()]
+        required_columns = [col for col in self.patient_columns() if col not in ('Telefon', 'Telefon2')]
         return all(col in df.columns for col in required_columns)
 
     def _validate_vehicle_columns(self, df):
         # Validiert die Spalten der Fahrzeugdatei
-        required_columns = ['Nachname', 'Vorname', 'Strasse', 'Ort', 'PLZ', 'Stellenumfang', 'Funktion']
-        return all(col in df.columns for col in required_columns)
+        return all(col in df.columns for col in self.vehicle_columns())
 
     def _validate_calendar_week(self, df):
         # Validiert die Kalenderwoche in der Patientendatei
@@ -198,61 +321,50 @@ class FileService:
 
         return {'success': True}
 
-    def _create_patient_from_row(self, row, weekday):
-        # Erstellt einen Patienten aus einer Excel-Zeile
-        name = f"{row['Vorname']} {row['Nachname']}"
-        address = f"{row['Strasse']}, {row['PLZ']} {row['Ort']}"
-        visit_type = row[weekday]   
-        time_info = str(row.get(f"Uhrzeit/Info {weekday}", ""))
-        time_info = "" if time_info.lower() == "nan" else time_info
-        
-        phone_numbers = self._process_phone_numbers(row)
-        lat, lon = self.geocode_address(address)
-        
-        patient = Patient(
-            name=name,
-            address=address,
-            visit_type=visit_type,
-            time_info=time_info,
-            phone_numbers=phone_numbers,
-            lat=lat,
-            lon=lon
-        )
-        patients.append(patient)
+    def _prepare_vehicle_columns(self, df):
+        # Bereitet alle Mitarbeiterfelder als Spalten auf (ohne Zeilen-Schleife)
+        funktion = df['Funktion'] if 'Funktion' in df.columns else pd.Series('', index=df.index)
+        return {
+            'name': self._build_names(df),
+            'address': self._build_addresses(df),
+            'stellenumfang': self._clamp_stellenumfang(df['Stellenumfang']),
+            'funktion': funktion.tolist()
+        }
 
-    def _create_vehicle_from_row(self, row):
-        # Erstellt ein Fahrzeug aus einer Excel-Zeile
-        address = f"{row['Strasse']}, {row['PLZ']} {row['Ort']}"
-        lat, lon = self.geocode_address(address)
-        
-        stellenumfang_val = self._process_stellenumfang(row)
-        
-        vehicle = Vehicle(
-            name=f"{row['Vorname']} {row['Nachname']}",
-            start_address=address,
-            lat=lat,
-            lon=lon,
-            stellenumfang=stellenumfang_val,
-            funktion=row.get('Funktion', '')
-        )
-        vehicles.append(vehicle)
-
-    def _process_phone_numbers(self, row):
-        # Verarbeitet Telefonnummern aus einer Excel-Zeile
-        phone1 = str(row.get('Telefon', "")).strip()
-        phone2 = str(row.get('Telefon2', "")).strip()
-        phone1 = "" if phone1.lower() == "nan" else phone1
-        phone2 = "" if phone2.lower() == "nan" else phone2
-        
-        if phone1 and phone2:
-            return f"{phone1}\n{phone2}"
-        return phone1 or phone2 or ""
+    def _build_names(self, df):
+        # Baut die Namen spaltenweise zusammen
+        return (df['Vorname'].astype(str) + " " + df['Nachname'].astype(str)).tolist()
 
-    def _process_stellenumfang(self, row):
-        # Verarbeitet den Stellenumfang aus einer Excel-Zeile
-        try:
-            stellenumfang_val = int(float(row['Stellenumfang']))
-        except:
-            stellenumfang_val = 100
+    def _build_addresses(self, df):
+        # Baut die Adressen spaltenweise zusammen ("Strasse, PLZ Ort")
+        return (df['Strasse'].astype(str) + ", " + df['PLZ'].astype(str) + " " + df['Ort'].astype(str)).tolist()
+
+    def _clean_text_column(self, df, column, strip=True):
+        # Wandelt eine Spalte in Text um; fehlende Spalten und NaN werden zu ""
+        if column not in df.columns:
+            return [''] * len(df)
+        values = df[column].astype(str)
+        if strip:
+            values = values.str.strip()
+        return values.mask(values.str.lower() == 'nan', '').tolist()
+
+    def _merge_phone_numbers(self, df):
+        # Führt Telefon und Telefon2 spaltenweise zusammen
+        phone1 = pd.Series(self._clean_text_column(df, 'Telefon'), index=df.index, dtype=object)
+        phone2 = pd.Series(self._clean_text_column(df, 'Telefon2'), index=df.index, dtype=object)
+        has_phone1 = phone1 != ''
+        has_phone2 = phone2 != ''
+        merged = phone1.where(has_phone1, phone2)
+        merged = merged.mask(has_phone1 & has_phone2, phone1 + "\n" + phone2)
+        return merged.tolist()
+
+    def _clamp_stellenumfang(self, column):
+        # Stellenumfang als ganze Zahl zwischen 0 und 100; ungültige Werte werden zu 100
+        values = pd.to_numeric(column, errors='coerce').astype(float).fillna(100)
+        return values.clip(0, 100).astype(int).tolist()
 
-        return max(0, min(100, stellenumfang_val)) 
\ No newline at end of file
+    def _append_entities(self, target, entities):
+        # Fügt gebündelt erstellte Objekte mit fortlaufenden IDs an
+        for index, entity in enumerate(entities, start=len(target) + 1):
+            entity.id = index
+        target.extend(entities)
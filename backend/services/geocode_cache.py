@@ -0,0 +1,171 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class GeocodeCache:
+    # Persistenter Cache für Geocoding-Ergebnisse (Schlüssel: normalisierte Adresse)
+    def __init__(self, path, ttl_days=180, max_entries=50000):
+        self.path = path
+        self.ttl_seconds = ttl_days * 24 * 3600
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def normalize_key(street, plz, ort):
+        # Erstellt einen normalisierten Schlüssel aus Strasse, PLZ und Ort
+        return "|".join([
+            GeocodeCache._normalize_text(street),
+            GeocodeCache._normalize_plz(plz),
+            GeocodeCache._normalize_text(ort)
+        ])
+
+    @staticmethod
+    def key_from_address(address):
+        # Erstellt einen Schlüssel aus einer Adresse im Format "Strasse, PLZ Ort"
+        street, _, rest = str(address).rpartition(',')
+        if not street:
+            return GeocodeCache._normalize_text(address)
+        plz, _, ort = rest.strip().partition(' ')
+        return GeocodeCache.normalize_key(street, plz, ort)
+
+    @staticmethod
+    def _normalize_text(value):
+        # Vereinheitlicht Schreibweisen (Groß-/Kleinschreibung, ß, Abkürzungen, Leerzeichen)
+        text = str(value).strip().lower()
+        text = text.replace('ß', 'ss')
+        text = re.sub(r'str\.(?=\s|\d|$)', 'strasse', text)
+        text = re.sub(r'[,;]', ' ', text)
+        return re.sub(r'\s+', ' ', text).strip()
+
+    @staticmethod
+    def _normalize_plz(value):
+        # PLZ aus Excel kann als Zahl (51643.0) oder Text vorliegen
+        try:
+            return str(int(float(value))).zfill(5)
+        except (TypeError, ValueError):
+            return str(value).strip()
+
+    def get(self, key):
+        # Gibt (lat, lng) zurück oder None, wenn kein gültiger Eintrag vorhanden ist
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry['lat'], entry['lng']
+
+    def set(self, key, lat, lng):
+        # Speichert ein Ergebnis (fehlgeschlagene Geocodierungen werden nicht gespeichert)
+        if lat is None or lng is None:
+            return
+        with self._lock:
+            self._entries[key] = {'lat': lat, 'lng': lng, 'ts': time.time()}
+            self._entries.move_to_end(key)
+            self._evict()
+            self._dirty = True
+
+    def warm_up(self, addresses, batch_resolver):
+        # Löst {key: address} auf; nur fehlende Einträge gehen an batch_resolver
+        # Gibt {key: (lat, lng)} für alle erfolgreich aufgelösten Adressen zurück
+        results = {}
+        missing = {}
+        for key, address in addresses.items():
+            cached = self.get(key)
+            if cached is None:
+                missing[key] = address
+            else:
+                results[key] = cached
+
+        if missing:
+            for key, (lat, lng) in batch_resolver(missing).items():
+                if lat is not None and lng is not None:
+                    self.set(key, lat, lng)
+                    results[key] = (lat, lng)
+
+        self.flush()
+        return results
+
+    def flush(self):
+        # Schreibt den Cache atomar auf die Festplatte
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._entries)
+            self._dirty = False
+
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.geocode_cache_')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def clear(self):
+        # Leert den Cache vollständig
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        self.flush()
+
+    def stats(self):
+        # Gibt Trefferstatistiken des Caches zurück
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+    def _load(self):
+        # Lädt den Cache von der Festplatte und verwirft abgelaufene Einträge
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Geocode cache could not be loaded: {e}")
+            return
+
+        for key, entry in sorted(data.items(), key=lambda item: item[1].get('ts', 0)):
+            if not self._is_expired(entry):
+                self._entries[key] = entry
+        self._evict()
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._is_expired(entry):
+            del self._entries[key]
+            self._dirty = True
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _is_expired(self, entry):
+        return self.ttl_seconds > 0 and time.time() - entry.get('ts', 0) > self.ttl_seconds
+
+    def _evict(self):
+        # Entfernt die am längsten nicht genutzten Einträge
+        while self.max_entries and len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._dirty = True
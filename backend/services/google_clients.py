@@ -0,0 +1,249 @@
+import random
+import threading
+import time
+
+from config import Config
+from services.container import container
+from services.metrics import timed_call
+
+# Fehler, die auf Überlastung oder Kontingent hindeuten: Wiederholung mit Backoff lohnt sich
+# (Klassennamen von googlemaps.exceptions und google.api_core.exceptions, ohne diese zu importieren)
+RETRYABLE_ERRORS = {'_OverQueryLimit', '_RetriableRequest', 'TransportError', 'ResourceExhausted',
+                    'TooManyRequests', 'ServiceUnavailable', 'InternalServerError', 'BadGateway'}
+RETRYABLE_STATUSES = {'OVER_QUERY_LIMIT', 'OVER_DAILY_LIMIT', 'UNKNOWN_ERROR', 'RESOURCE_EXHAUSTED'}
+# Überschrittene Deadlines zählen als Störung, werden aber nicht wiederholt (sonst vervielfacht sich die Wartezeit)
+TIMEOUT_ERRORS = {'Timeout', 'DeadlineExceeded', 'TimeoutError'}
+
+
+class CircuitOpenError(Exception):
+    # Die API gilt als gestört; Aufrufe scheitern sofort, bis die Wartezeit abgelaufen ist
+    pass
+
+
+class CircuitBreaker:
+    # closed: normale Aufrufe; open: nach failure_threshold Störungen in Folge sofortiger Abbruch;
+    # half_open: nach reset_seconds wird ein einzelner Probeaufruf durchgelassen
+    def __init__(self, name, failure_threshold=5, reset_seconds=30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        # Wirft CircuitOpenError, solange die API als gestört gilt
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name}: API vorübergehend gesperrt nach wiederholten Fehlern")
+                self.state = 'half_open'
+            if self.state == 'half_open':
+                if self._trial_running:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name}: Probeaufruf läuft bereits")
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_running = False
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.times_opened += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        # Aufruf ohne Aussage über den Zustand der API (z.B. ungültige Anfrage)
+        with self._lock:
+            self._trial_running = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected
+            }
+
+
+class GoogleClients:
+    # Gemeinsame Google-Clients für Geocoding, Distance Matrix und Route Optimization
+    # Die Clients (HTTP-Verbindungspool bzw. gRPC-Kanal) werden einmal erstellt und von allen Services
+    # geteilt; call() ergänzt Deadlines, Backoff mit Jitter bei Kontingentfehlern und je API einen Circuit Breaker
+    def __init__(self, api_key=None, timeout=10.0, optimize_timeout=90.0, max_retries=3, backoff_seconds=0.5,
+                 max_backoff_seconds=8.0, failure_threshold=5, reset_seconds=30.0, pool_size=16):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.optimize_timeout = optimize_timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.pool_size = pool_size
+        self._maps = None
+        self._route_optimization = None
+        self._breakers = {}
+        self._health = {}
+        self._lock = threading.Lock()
+
+    @property
+    def maps(self):
+        # googlemaps.Client mit eigenem Verbindungspool; Wiederholungen übernimmt ausschließlich call()
+        if self._maps is None:
+            with self._lock:
+                if self._maps is None:
+                    import googlemaps
+                    import requests
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    self._maps = _single_attempt_client(googlemaps)(
+                        self.api_key,
+                        timeout=self.timeout,
+                        retry_over_query_limit=False,
+                        requests_session=session
+                    )
+        return self._maps
+
+    @property
+    def route_optimization(self):
+        # gRPC-Client der Route Optimization API (ein Kanal für alle Anfragen)
+        if self._route_optimization is None:
+            with self._lock:
+                if self._route_optimization is None:
+                    from google.maps import routeoptimization_v1
+                    self._route_optimization = routeoptimization_v1.RouteOptimizationClient()
+        return self._route_optimization
+
+    def call(self, api, fn, *args, retries=None, backoff_seconds=None, **kwargs):
+        # Führt fn(*args, **kwargs) mit Circuit Breaker und Backoff aus; wirft den letzten Fehler weiter
+        breaker = self.breaker(api)
+        retries = self.max_retries if retries is None else retries
+        backoff_seconds = self.backoff_seconds if backoff_seconds is None else backoff_seconds
+        for attempt in range(retries + 1):
+            breaker.before_call()
+            started = time.perf_counter()
+            try:
+                with timed_call(api):
+                    result = fn(*args, **kwargs)
+            except Exception as e:
+                kind = self.classify(e)
+                self._record(api, time.perf_counter() - started, error=e)
+                if kind == 'client':
+                    # Fehler in der Anfrage selbst: die API ist erreichbar
+                    breaker.release()
+                    raise
+                breaker.record_failure()
+                # Nach dem Öffnen des Circuit Breakers nicht weiter warten, sondern den eigentlichen Fehler melden
+                if kind != 'retryable' or attempt == retries or breaker.state == 'open':
+                    raise
+                self._record_retry(api)
+                delay = min(self.max_backoff_seconds, backoff_seconds * (2 ** attempt))
+                time.sleep(random.uniform(delay / 2, delay))
+            else:
+                breaker.record_success()
+                self._record(api, time.perf_counter() - started)
+                return result
+
+    def geocode(self, address, **policy):
+        return self.call('geocode', self.maps.geocode, address, **policy)
+
+    def distance_matrix(self, origins, destinations, **kwargs):
+        return self.call('distance_matrix', self.maps.distance_matrix, origins, destinations, **kwargs)
+
+    def optimize_tours(self, request):
+        # Deadline für den gRPC-Aufruf, damit ein hängender Aufruf nicht den Worker-Timeout aufbraucht
+        return self.call('optimize_tours', self.route_optimization.optimize_tours, request,
+                         timeout=self.optimize_timeout)
+
+    def breaker(self, api):
+        with self._lock:
+            if api not in self._breakers:
+                self._breakers[api] = CircuitBreaker(api, self.failure_threshold, self.reset_seconds)
+            return self._breakers[api]
+
+    @staticmethod
+    def classify(error):
+        # 'retryable' (Kontingent, Überlastung), 'timeout', 'client' (ungültige Anfrage) oder 'failure'
+        names = {cls.__name__ for cls in type(error).__mro__}
+        if names & RETRYABLE_ERRORS or getattr(error, 'status', None) in RETRYABLE_STATUSES:
+            return 'retryable'
+        if names & TIMEOUT_ERRORS:
+            return 'timeout'
+        if 'ApiError' in names or names & {'InvalidArgument', 'NotFound', 'PermissionDenied', 'Unauthenticated'}:
+            return 'client'
+        return 'failure'
+
+    def health(self):
+        # Zustand je API: Aufrufe, Fehler, Wiederholungen, letzte Dauer und Zustand des Circuit Breakers
+        with self._lock:
+            apis = {api: dict(stats) for api, stats in self._health.items()}
+            breakers = dict(self._breakers)
+        for api, breaker in breakers.items():
+            apis.setdefault(api, self._empty_health())['circuit'] = breaker.stats()
+        return apis
+
+    def _record(self, api, seconds, error=None):
+        with self._lock:
+            stats = self._health.setdefault(api, self._empty_health())
+            stats['calls'] += 1
+            stats['last_seconds'] = round(seconds, 4)
+            if error is None:
+                stats['successes'] += 1
+            else:
+                stats['errors'] += 1
+                stats['last_error'] = f"{type(error).__name__}: {error}"[:300]
+                stats['last_error_at'] = time.time()
+
+    def _record_retry(self, api):
+        with self._lock:
+            self._health.setdefault(api, self._empty_health())['retries'] += 1
+
+    @staticmethod
+    def _empty_health():
+        return {'calls': 0, 'successes': 0, 'errors': 0, 'retries': 0,
+                'last_seconds': None, 'last_error': None, 'last_error_at': None}
+
+
+def _single_attempt_client(googlemaps):
+    # googlemaps.Client wiederholt 5xx-Antworten selbst (bis retry_timeout) und würde die Versuche von call()
+    # vervielfachen; hier schlägt der Aufruf stattdessen sofort mit _RetriableRequest fehl
+    class SingleAttemptClient(googlemaps.Client):
+        def _request(self, url, params, first_request_time=None, retry_counter=0, *args, **kwargs):
+            if retry_counter > 0:
+                raise googlemaps.exceptions._RetriableRequest()
+            return super()._request(url, params, first_request_time, retry_counter, *args, **kwargs)
+
+    return SingleAttemptClient
+
+
+def _create_google_clients():
+    return GoogleClients(
+        api_key=Config.GOOGLE_MAPS_API_KEY,
+        timeout=Config.GOOGLE_API_TIMEOUT,
+        optimize_timeout=Config.GOOGLE_OPTIMIZE_TIMEOUT,
+        max_retries=Config.GOOGLE_API_MAX_RETRIES,
+        backoff_seconds=Config.GOOGLE_API_BACKOFF_SECONDS,
+        failure_threshold=Config.GOOGLE_CIRCUIT_FAILURES,
+        reset_seconds=Config.GOOGLE_CIRCUIT_RESET_SECONDS,
+        pool_size=Config.GOOGLE_HTTP_POOL_SIZE
+    )
+
+
+# Von allen Services geteilt (wird beim ersten Zugriff erstellt)
+google_clients = container.register('google_clients', _create_google_clients)
@@ -0,0 +1,212 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    # Wird ausgelöst, wenn ein Job während der Ausführung abgebrochen wurde
+    pass
+
+
+class Job:
+    # Hintergrund-Job mit Status, Fortschritt und Ergebnis
+    TERMINAL_STATES = {'succeeded', 'failed', 'cancelled'}
+
+    def __init__(self, description, condition, on_update=None, cancel_requested=None):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.status = 'queued'
+        self.progress = 0
+        self.message = 'Wartet auf freien Worker'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.version = 0
+        self._cancel_event = threading.Event()
+        self._condition = condition
+        self._on_update = on_update
+        self._cancel_requested = cancel_requested
+
+    @property
+    def is_finished(self):
+        return self.status in self.TERMINAL_STATES
+
+    def is_cancelled(self):
+        # Abbruch kann lokal oder (bei gemeinsamem Speicher) von einem anderen Worker angefordert werden
+        if not self._cancel_event.is_set() and self._cancel_requested and self._cancel_requested(self):
+            self._cancel_event.set()
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        # Bricht die Ausführung an einem sicheren Punkt ab
+        if self.is_cancelled():
+            raise JobCancelled()
+
+    def report(self, progress, message):
+        # Meldet den Fortschritt (0-100) und benachrichtigt wartende Leser
+        self._update(progress=progress, message=message)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'description': self.description,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'version': self.version
+        }
+
+    def _update(self, **fields):
+        with self._condition:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            # Erst speichern, dann benachrichtigen, damit andere Worker keinen älteren Stand lesen
+            if self._on_update:
+                self._on_update(self)
+            self._condition.notify_all()
+
+
+class StoredJob:
+    # Lesende Sicht auf einen Job, der in einem anderen Worker läuft
+    def __init__(self, record):
+        self.result = record.get('result')
+        self._record = {key: value for key, value in record.items() if key != 'result'}
+        for name, value in self._record.items():
+            setattr(self, name, value)
+
+    @property
+    def is_finished(self):
+        return self.status in Job.TERMINAL_STATES
+
+    def to_dict(self):
+        return dict(self._record)
+
+
+class JobService:
+    # Führt Jobs in einem kleinen Worker-Pool aus und hält die letzten Jobs vor
+    # Mit store werden Status und Ergebnis auch für andere Worker gespeichert
+    CANCEL_CHECK_INTERVAL = 0.5
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, max_workers=2, history_size=50, store=None, scope='jobs'):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='optimization-job')
+        self.history_size = history_size
+        self.store = store
+        self.scope = scope
+        self._jobs = OrderedDict()
+        self._condition = threading.Condition()
+        self._cancel_checks = {}
+
+    def submit(self, fn, description=''):
+        # Startet fn(job) im Hintergrund und gibt den Job sofort zurück
+        job = Job(
+            description,
+            self._condition,
+            on_update=self._persist if self.store else None,
+            cancel_requested=self._cancel_requested if self.store else None
+        )
+        if self.store:
+            self._persist(job)
+        with self._condition:
+            self._jobs[job.id] = job
+            self._trim_history()
+        self.executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id):
+        with self._condition:
+            job = self._jobs.get(job_id)
+        if job is None and self.store:
+            return self._load(job_id)
+        return job
+
+    def cancel(self, job_id):
+        # Markiert einen Job als abgebrochen; laufende Jobs beenden sich am nächsten sicheren Punkt
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if isinstance(job, StoredJob):
+            # Job läuft in einem anderen Worker, dieser prüft die Anforderung regelmäßig
+            if not job.is_finished:
+                self.store.put(self.scope, f"{job_id}:cancel", True)
+            return job
+        if not job.is_finished:
+            job._cancel_event.set()
+            if job.status == 'queued':
+                job._update(status='cancelled', message='Abgebrochen', finished_at=time.time())
+            else:
+                job._update(message='Abbruch angefordert')
+        return job
+
+    def wait_for_update(self, job, version, timeout=15):
+        # Blockiert, bis sich der Job nach version geändert hat oder der Timeout abläuft
+        if isinstance(job, StoredJob):
+            return self._poll(job, version, timeout)
+        with self._condition:
+            self._condition.wait_for(lambda: job.version != version or job.is_finished, timeout=timeout)
+            return job.to_dict()
+
+    def _run(self, job, fn):
+        if job.is_cancelled():
+            return
+        job._update(status='running', message='Wird ausgeführt')
+        try:
+            result = fn(job)
+            job._update(status='succeeded', progress=100, message='Abgeschlossen',
+                        result=result, finished_at=time.time())
+        except JobCancelled:
+            job._update(status='cancelled', message='Abgebrochen', finished_at=time.time())
+        except Exception as e:
+            job._update(status='failed', message='Fehlgeschlagen', error=str(e), finished_at=time.time())
+
+    def _trim_history(self):
+        # Entfernt die ältesten abgeschlossenen Jobs
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        while len(self._jobs) > self.history_size and finished:
+            job_id = finished.pop(0)
+            del self._jobs[job_id]
+            self._cancel_checks.pop(job_id, None)
+            if self.store:
+                self.store.delete(self.scope, job_id)
+                self.store.delete(self.scope, f"{job_id}:cancel")
+
+    def _persist(self, job):
+        # Schreibt Status und Ergebnis in den gemeinsamen Speicher
+        try:
+            self.store.put(self.scope, job.id, {**job.to_dict(), 'result': job.result})
+        except Exception as e:
+            print(f"Job state could not be stored: {e}")
+
+    def _load(self, job_id):
+        version, record = self.store.get(self.scope, job_id)
+        return StoredJob(record) if record else None
+
+    def _poll(self, job, version, timeout):
+        # Fragt den gemeinsamen Speicher ab, bis sich der Job geändert hat
+        deadline = time.monotonic() + timeout
+        state = job.to_dict()
+        while state['version'] == version and state['status'] not in Job.TERMINAL_STATES:
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(self.POLL_INTERVAL)
+            current = self._load(job.id)
+            if current is None:
+                break
+            state = current.to_dict()
+        return state
+
+    def _cancel_requested(self, job):
+        # Prüft höchstens alle CANCEL_CHECK_INTERVAL Sekunden, ob ein anderer Worker abbrechen will
+        now = time.monotonic()
+        if now - self._cancel_checks.get(job.id, 0) < self.CANCEL_CHECK_INTERVAL:
+            return False
+        self._cancel_checks[job.id] = now
+        version, requested = self.store.get(self.scope, f"{job.id}:cancel")
+        return bool(requested)
@@ -0,0 +1,420 @@
+import math
+import time
+from datetime import datetime, timedelta, timezone
+
+# Annahmen für die Luftlinien-Schätzung der Fahrzeit
+ROAD_DETOUR_FACTOR = 1.3
+AVERAGE_SPEED_KMH = 45.0
+
+
+def haversine_travel(origin, destination):
+    # Schätzt Fahrzeit (Sekunden) und Strecke (Meter) zwischen zwei (lat, lon)-Punkten
+    lat1, lon1 = origin
+    lat2, lon2 = destination
+    if lat1 == lat2 and lon1 == lon2:
+        return 0, 0
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    meters = 2 * 6371000 * math.asin(math.sqrt(a)) * ROAD_DETOUR_FACTOR
+    seconds = meters / (AVERAGE_SPEED_KMH * 1000 / 3600)
+    return int(round(seconds)), int(round(meters))
+
+
+def parse_duration(value):
+    # Wandelt "1500s" (API-Format) in Sekunden um
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(float(str(value).rstrip('s')))
+
+
+def parse_timestamp(value):
+    # Wandelt "2025-01-06T08:00:00Z" in ein datetime (UTC) um
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+
+class LocalVisit:
+    # Entspricht ShipmentRoute.Visit der Route Optimization API
+    def __init__(self, shipment_index, start_time):
+        self.shipment_index = shipment_index
+        self.start_time = start_time
+
+
+class LocalTransition:
+    # Entspricht ShipmentRoute.Transition der Route Optimization API
+    def __init__(self, travel_duration, travel_distance_meters, start_time):
+        self.travel_duration = travel_duration
+        self.travel_distance_meters = travel_distance_meters
+        self.start_time = start_time
+
+
+class LocalShipmentRoute:
+    # Entspricht ShipmentRoute der Route Optimization API
+    def __init__(self, vehicle_index, vehicle_start_time=None, vehicle_end_time=None, visits=None, transitions=None):
+        self.vehicle_index = vehicle_index
+        self.vehicle_start_time = vehicle_start_time
+        self.vehicle_end_time = vehicle_end_time
+        self.visits = visits or []
+        self.transitions = transitions or []
+
+
+class LocalSkippedShipment:
+    # Entspricht SkippedShipment der Route Optimization API
+    def __init__(self, index):
+        self.index = index
+
+
+class LocalOptimizeToursResponse:
+    # Entspricht OptimizeToursResponse; kann von process_optimization_result verarbeitet werden
+    def __init__(self, routes, skipped_shipments=None):
+        self.routes = routes
+        self.skipped_shipments = skipped_shipments or []
+
+
+class LocalRouteSolver:
+    # Lokale Routenoptimierung: Regret-Einfügeheuristik + lokale Suche (Relocate, 2-opt)
+    def __init__(self, time_budget=1.0, travel_fn=haversine_travel):
+        self.time_budget = time_budget
+        self.travel_fn = travel_fn
+
+    def solve(self, request, should_stop=None):
+        # Löst eine Anfrage im Format von OptimizeToursRequest ({"model": ..., ...})
+        model = request['model']
+        deadline = time.monotonic() + self._time_budget(request)
+        problem = _Problem(model, self.travel_fn)
+
+        routes, unassigned = self._initial_routes(problem, request.get('injected_first_solution_routes'))
+        warm_start = len(unassigned) < len(problem.shipments)
+        before = [list(route) for route in routes]
+        unassigned = self._construct(problem, routes, unassigned, deadline, should_stop)
+        # Beim Warmstart werden nur die Routen verbessert, die sich beim Einfügen geändert haben
+        focus = {v for v, route in enumerate(routes) if route != before[v]} if warm_start else None
+        self._improve(problem, routes, deadline, should_stop, focus)
+        if unassigned:
+            unassigned = self._construct(problem, routes, unassigned, deadline, should_stop)
+
+        return self._build_response(problem, routes, unassigned)
+
+    def _initial_routes(self, problem, injected_routes):
+        # Übernimmt eine vorherige Lösung (injected_first_solution_routes) als Startlösung
+        # Routen, die das Zeitlimit überschreiten (z.B. nach geändertem Stellenumfang), werden von hinten gekürzt
+        routes = [[] for _ in problem.vehicles]
+        seen = set()
+        for injected in injected_routes or []:
+            vehicle = injected.get('vehicle_index', 0)
+            if not 0 <= vehicle < len(routes):
+                continue
+            for visit in injected.get('visits', []):
+                shipment = visit.get('shipment_index', 0)
+                if 0 <= shipment < len(problem.shipments) and shipment not in seen:
+                    routes[vehicle].append(shipment)
+                    seen.add(shipment)
+            while routes[vehicle] and problem.route_duration(vehicle, routes[vehicle]) > problem.max_duration(vehicle):
+                seen.discard(routes[vehicle].pop())
+        unassigned = [s for s in range(len(problem.shipments)) if s not in seen]
+        return routes, unassigned
+
+    def _time_budget(self, request):
+        # Ein "timeout" in der Anfrage hat Vorrang vor dem Standard-Zeitbudget
+        timeout = parse_duration(request.get('timeout'))
+        return timeout if timeout else self.time_budget
+
+    def _construct(self, problem, routes, unassigned, deadline, should_stop):
+        # Fügt Besuche nach Regret-Kriterium an der günstigsten zulässigen Position ein
+        durations = [problem.route_duration(v, route) for v, route in enumerate(routes)]
+        remaining = set(unassigned)
+        best = {}
+        for s in unassigned:
+            if time.monotonic() > deadline or (should_stop and should_stop()):
+                return self._append_greedy(problem, routes, durations, remaining)
+            best[s] = self._best_insertions(problem, routes, durations, s)
+
+        while remaining:
+            if time.monotonic() > deadline or (should_stop and should_stop()):
+                return self._append_greedy(problem, routes, durations, remaining)
+
+            choice = None
+            for s in remaining:
+                options = best[s]
+                if not options:
+                    continue
+                regret = options[1][0] - options[0][0] if len(options) > 1 else float('inf')
+                key = (regret, -options[0][0])
+                if choice is None or key > choice[0]:
+                    choice = (key, s, options[0])
+            if choice is None:
+                break
+
+            _, s, (_, vehicle, position, new_duration) = choice
+            routes[vehicle].insert(position, s)
+            durations[vehicle] = new_duration
+            remaining.discard(s)
+            for other in remaining:
+                best[other] = self._update_insertions(problem, routes, durations, other, best[other], vehicle)
+
+        return sorted(remaining)
+
+    def _best_insertions(self, problem, routes, durations, shipment):
+        # Beste Einfügeposition je Fahrzeug, sortiert nach Zusatzkosten
+        options = []
+        for vehicle in range(len(routes)):
+            option = self._best_insertion_in_route(problem, vehicle, routes[vehicle], durations[vehicle], shipment)
+            if option is not None:
+                options.append(option)
+        options.sort(key=lambda o: o[0])
+        return options
+
+    def _update_insertions(self, problem, routes, durations, shipment, options, vehicle):
+        # Aktualisiert nur die Einfügeoption für das geänderte Fahrzeug
+        options = [o for o in options if o[1] != vehicle]
+        option = self._best_insertion_in_route(problem, vehicle, routes[vehicle], durations[vehicle], shipment)
+        if option is not None:
+            options.append(option)
+            options.sort(key=lambda o: o[0])
+        return options
+
+    def _best_insertion_in_route(self, problem, vehicle, route, duration, shipment):
+        # Günstigste zulässige Position für einen Besuch in einer Route
+        nodes = problem.route_nodes(vehicle, route)
+        old_cost = problem.route_cost(vehicle, duration)
+        node = problem.shipment_node(shipment)
+        service = problem.shipments[shipment]['duration']
+        best = None
+        for position in range(len(route) + 1):
+            a, b = nodes[position], nodes[position + 1]
+            delta = problem.insertion_delta(a, b, node, service, bool(route))
+            new_duration = duration + delta
+            if new_duration > problem.max_duration(vehicle):
+                continue
+            cost = problem.route_cost(vehicle, new_duration) - old_cost
+            if best is None or cost < best[0]:
+                best = (cost, vehicle, position, new_duration)
+        return best
+
+    def _append_greedy(self, problem, routes, durations, remaining):
+        # Schnelle Rückfallebene bei überschrittenem Zeitbudget: Anhängen an die günstigste Route
+        unassigned = []
+        for s in sorted(remaining):
+            best = None
+            node = problem.shipment_node(s)
+            for vehicle, route in enumerate(routes):
+                nodes = problem.route_nodes(vehicle, route)
+                a, b = nodes[-2], nodes[-1]
+                delta = problem.insertion_delta(a, b, node, problem.shipments[s]['duration'], bool(route))
+                new_duration = durations[vehicle] + delta
+                if new_duration <= problem.max_duration(vehicle) and (best is None or delta < best[0]):
+                    best = (delta, vehicle, new_duration)
+            if best is None:
+                unassigned.append(s)
+                continue
+            _, vehicle, new_duration = best
+            routes[vehicle].append(s)
+            durations[vehicle] = new_duration
+        return unassigned
+
+    def _improve(self, problem, routes, deadline, should_stop, focus=None):
+        # Lokale Suche bis kein verbessernder Zug mehr existiert oder das Zeitbudget abläuft
+        # focus: nur diese Routen werden umgestellt bzw. geben Besuche ab (Zielrouten kommen hinzu)
+        improved = True
+        while improved:
+            improved = False
+            for vehicle in range(len(routes)):
+                if focus is not None and vehicle not in focus:
+                    continue
+                if time.monotonic() > deadline or (should_stop and should_stop()):
+                    return
+                if self._two_opt(problem, routes, vehicle):
+                    improved = True
+            if self._relocate(problem, routes, deadline, should_stop, focus):
+                improved = True
+
+    def _two_opt(self, problem, routes, vehicle):
+        # Dreht Teilstücke einer Route um, solange sich die Kosten verbessern
+        route = routes[vehicle]
+        if len(route) < 3:
+            return False
+        best_cost = problem.route_cost(vehicle, problem.route_duration(vehicle, route))
+        changed = False
+        improved = True
+        while improved:
+            improved = False
+            for i in range(len(route) - 1):
+                for j in range(i + 1, len(route)):
+                    candidate = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+                    duration = problem.route_duration(vehicle, candidate)
+                    if duration > problem.max_duration(vehicle):
+                        continue
+                    cost = problem.route_cost(vehicle, duration)
+                    if cost < best_cost - 1e-9:
+                        route[:] = candidate
+                        best_cost = cost
+                        improved = changed = True
+        return changed
+
+    def _relocate(self, problem, routes, deadline, should_stop, focus=None):
+        # Verschiebt einzelne Besuche an die beste Position (auch in andere Routen)
+        changed = False
+        durations = [problem.route_duration(v, route) for v, route in enumerate(routes)]
+        for source in range(len(routes)):
+            if focus is not None and source not in focus:
+                continue
+            position = 0
+            while position < len(routes[source]):
+                if time.monotonic() > deadline or (should_stop and should_stop()):
+                    return changed
+                shipment = routes[source][position]
+                reduced = routes[source][:position] + routes[source][position + 1:]
+                reduced_duration = problem.route_duration(source, reduced)
+                saving = (problem.route_cost(source, durations[source])
+                          - problem.route_cost(source, reduced_duration))
+
+                best = None
+                for target in range(len(routes)):
+                    target_route = reduced if target == source else routes[target]
+                    target_duration = reduced_duration if target == source else durations[target]
+                    option = self._best_insertion_in_route(
+                        problem, target, target_route, target_duration, shipment)
+                    if option is None:
+                        continue
+                    if target == source and option[2] == position:
+                        continue
+                    if option[0] < saving - 1e-9 and (best is None or option[0] < best[0]):
+                        best = option
+
+                if best is None:
+                    position += 1
+                    continue
+
+                _, target, target_position, new_duration = best
+                routes[source] = reduced
+                durations[source] = reduced_duration
+                routes[target].insert(target_position, shipment)
+                durations[target] = new_duration
+                if focus is not None:
+                    focus.add(target)
+                changed = True
+        return changed
+
+    def _build_response(self, problem, routes, unassigned):
+        # Erstellt eine Antwort im Format der Route Optimization API
+        response_routes = []
+        for vehicle, route in enumerate(routes):
+            if not route:
+                response_routes.append(LocalShipmentRoute(vehicle_index=vehicle))
+                continue
+
+            current = problem.global_start
+            nodes = problem.route_nodes(vehicle, route)
+            visits = []
+            transitions = []
+            for index, shipment in enumerate(route):
+                seconds, meters = problem.travel_details(nodes[index], nodes[index + 1])
+                transitions.append(LocalTransition(timedelta(seconds=seconds), meters, current))
+                current += timedelta(seconds=seconds)
+                visits.append(LocalVisit(shipment, current))
+                current += timedelta(seconds=problem.shipments[shipment]['duration'])
+            seconds, meters = problem.travel_details(nodes[-2], nodes[-1])
+            transitions.append(LocalTransition(timedelta(seconds=seconds), meters, current))
+            current += timedelta(seconds=seconds)
+
+            response_routes.append(LocalShipmentRoute(
+                vehicle_index=vehicle,
+                vehicle_start_time=problem.global_start,
+                vehicle_end_time=current,
+                visits=visits,
+                transitions=transitions
+            ))
+
+        return LocalOptimizeToursResponse(
+            response_routes,
+            [LocalSkippedShipment(index) for index in unassigned]
+        )
+
+
+class _Problem:
+    # Aufbereitetes Modell mit Reisezeit-Cache für die lokale Suche
+    def __init__(self, model, travel_fn):
+        self.travel_fn = travel_fn
+        self.global_start = parse_timestamp(model['global_start_time'])
+        global_end = parse_timestamp(model['global_end_time'])
+        self.horizon = int((global_end - self.global_start).total_seconds())
+
+        self.shipments = []
+        for shipment in model.get('shipments', []):
+            pickup = shipment['pickups'][0]
+            location = pickup['arrival_location']
+            self.shipments.append({
+                'location': (location['latitude'], location['longitude']),
+                'duration': parse_duration(pickup.get('duration')) or 0
+            })
+
+        self.vehicles = []
+        for vehicle in model.get('vehicles', []):
+            start = vehicle['start_location']
+            end = vehicle.get('end_location', start)
+            limit = vehicle.get('route_duration_limit', {})
+            max_duration = parse_duration(limit.get('max_duration'))
+            self.vehicles.append({
+                'start': (start['latitude'], start['longitude']),
+                'end': (end['latitude'], end['longitude']),
+                'cost_per_hour': vehicle.get('cost_per_hour', 0),
+                'max_duration': min(max_duration, self.horizon) if max_duration else self.horizon,
+                'soft_max_duration': parse_duration(limit.get('soft_max_duration')),
+                'cost_per_hour_after_soft_max': limit.get('cost_per_hour_after_soft_max', 0)
+            })
+
+        # Knoten: Besuche 0..n-1, danach Start/Ende je Fahrzeug
+        self.locations = [s['location'] for s in self.shipments]
+        for vehicle in self.vehicles:
+            self.locations.append(vehicle['start'])
+            self.locations.append(vehicle['end'])
+        self._travel_cache = {}
+
+    def shipment_node(self, shipment):
+        return shipment
+
+    def route_nodes(self, vehicle, route):
+        # Knotenfolge Start -> Besuche -> Ende
+        start = len(self.shipments) + 2 * vehicle
+        return [start] + list(route) + [start + 1]
+
+    def travel_details(self, a, b):
+        key = (a, b)
+        cached = self._travel_cache.get(key)
+        if cached is None:
+            cached = self.travel_fn(self.locations[a], self.locations[b])
+            self._travel_cache[key] = cached
+        return cached
+
+    def travel(self, a, b):
+        return self.travel_details(a, b)[0]
+
+    def insertion_delta(self, a, b, node, service, route_in_use):
+        # Zusatzdauer beim Einfügen zwischen a und b; leere Routen haben noch keine Dauer
+        delta = self.travel(a, node) + service + self.travel(node, b)
+        return delta - self.travel(a, b) if route_in_use else delta
+
+    def route_duration(self, vehicle, route):
+        # Gesamtdauer einer Route in Sekunden (Fahrzeit + Verweilzeit); leere Routen kosten nichts
+        if not route:
+            return 0
+        nodes = self.route_nodes(vehicle, route)
+        duration = sum(self.shipments[s]['duration'] for s in route)
+        for a, b in zip(nodes, nodes[1:]):
+            duration += self.travel(a, b)
+        return duration
+
+    def max_duration(self, vehicle):
+        return self.vehicles[vehicle]['max_duration']
+
+    def route_cost(self, vehicle, duration):
+        # Kosten wie im API-Modell: cost_per_hour plus Aufschlag nach dem Soft-Limit
+        v = self.vehicles[vehicle]
+        cost = v['cost_per_hour'] * duration / 3600.0
+        soft = v['soft_max_duration']
+        if soft is not None and duration > soft:
+            cost += v['cost_per_hour_after_soft_max'] * (duration - soft) / 3600.0
+        return cost
@@ -0,0 +1,308 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+
+# Standard-Buckets in Sekunden (von schnellen Cache-Zugriffen bis zu langen Optimierungen)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class _Metric:
+    # Gemeinsame Basis für Counter, Gauge und Histogram; Werte je Label-Kombination
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if not self.labelnames and self.type != 'histogram':
+            # Metriken ohne Labels erscheinen von Anfang an mit 0
+            self._values[()] = 0
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: erwartete Labels {self.labelnames}, erhalten {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [Anzahl je Bucket (nicht kumuliert) + Überlauf, Summe, Anzahl]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        # Misst die Dauer eines Blocks oder einer Funktion (als with-Block oder Dekorator)
+        return _Timer(self, labels)
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+
+class _Timer(ContextDecorator):
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self._start, **self.labels)
+        return False
+
+    def _recreate_cm(self):
+        # Als Dekorator eine eigene Instanz je Aufruf, sonst überschreiben sich parallele Aufrufe den Startzeitpunkt
+        return _Timer(self.histogram, self.labels)
+
+
+class MetricsRegistry:
+    # Sammelt alle Metriken eines Prozesses; Collector-Funktionen liefern zusätzliche Werte beim Abruf
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        # collector() gibt [(name, type, documentation, labelnames, {label_tuple: value})] zurück
+        # (z.B. Trefferzahlen der Caches, die ohnehin gezählt werden)
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        # Aktueller Stand aller Metriken als einfache Datenstruktur (für Ausgabe und Zusammenführung)
+        with self._lock:
+            metrics = list(self._metrics.values())
+        families = {}
+        for metric in metrics:
+            families[metric.name] = {
+                'type': metric.type,
+                'documentation': metric.documentation,
+                'labelnames': metric.labelnames,
+                'buckets': getattr(metric, 'buckets', None),
+                'samples': metric.samples()
+            }
+        for collector in self._collectors:
+            try:
+                for name, metric_type, documentation, labelnames, samples in collector():
+                    families[name] = {
+                        'type': metric_type,
+                        'documentation': documentation,
+                        'labelnames': tuple(labelnames),
+                        'buckets': None,
+                        'samples': dict(samples)
+                    }
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        return families
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+
+def merge_snapshots(snapshots):
+    # Führt die Stände mehrerer Worker zusammen: Counter und Histogramme werden addiert,
+    # bei Gauges gilt der Wert des zuletzt übergebenen Snapshots
+    merged = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            target = merged.setdefault(name, {**family, 'samples': {}})
+            for key, value in family['samples'].items():
+                current = target['samples'].get(key)
+                if current is None or family['type'] == 'gauge':
+                    target['samples'][key] = [list(value[0]), value[1], value[2]] if family['type'] == 'histogram' else value
+                elif family['type'] == 'histogram':
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+                    current[2] += value[2]
+                else:
+                    target['samples'][key] = current + value
+    return merged
+
+
+def render_text(families):
+    # Prometheus-Textformat (Version 0.0.4)
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {_escape_help(family['documentation'])}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        labelnames = family['labelnames']
+        for key in sorted(family['samples']):
+            value = family['samples'][key]
+            labels = list(zip(labelnames, key))
+            if family['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(list(family['buckets']) + [float('inf')], counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels) + '}'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) or abs(value) >= 1e15 else str(int(value)) + '.0'
+    return str(value)
+
+
+class MetricsExporter:
+    # Stellt die Metriken aller Gunicorn-Worker bereit: jeder Worker legt seinen Stand
+    # regelmäßig im gemeinsamen Speicher ab, /metrics führt die Stände zusammen
+    def __init__(self, registry, store=None, scope='metrics', interval=5.0, max_age=600.0):
+        self.registry = registry
+        self.store = store
+        self.scope = scope
+        self.interval = interval
+        self.max_age = max_age
+        self.worker = f"worker:{os.getpid()}"
+        self._last_publish = 0.0
+
+    def publish(self, force=False):
+        # Speichert den Stand dieses Workers (höchstens alle interval Sekunden)
+        if self.store is None:
+            return
+        now = time.time()
+        if not force and now - self._last_publish < self.interval:
+            return
+        self._last_publish = now
+        try:
+            self.store.put(self.scope, self.worker, {'updated_at': now, 'families': self.registry.snapshot()})
+        except Exception as e:
+            print(f"Metrics could not be stored: {e}")
+
+    def render(self):
+        # Textausgabe für /metrics
+        if self.store is None:
+            return render_text(self.registry.snapshot())
+
+        self.publish(force=True)
+        snapshots = []
+        now = time.time()
+        for name in self.store.versions(self.scope):
+            _, entry = self.store.get(self.scope, name)
+            if not entry:
+                continue
+            if now - entry['updated_at'] > self.max_age:
+                # Beendete Worker nicht weiter mitzählen
+                self.store.delete(self.scope, name)
+                continue
+            # Eigener Stand zuletzt, damit aktuelle Gauges Vorrang haben
+            if name != self.worker:
+                snapshots.append(entry['families'])
+        snapshots.append(self.registry.snapshot())
+        return render_text(merge_snapshots(snapshots))
+
+
+# Prozessweite Registry und die Metriken der Anwendung
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'palliroute_stage_seconds', 'Dauer der Verarbeitungsschritte in Sekunden', ['stage'])
+EXTERNAL_CALL_SECONDS = registry.histogram(
+    'palliroute_external_call_seconds', 'Dauer der Aufrufe externer APIs in Sekunden', ['api', 'outcome'])
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'palliroute_http_request_seconds', 'Dauer der HTTP-Anfragen in Sekunden', ['endpoint', 'status'])
+GEOCODE_FAILURES = registry.counter(
+    'palliroute_geocode_failures_total', 'Adressen, die nicht geocodiert werden konnten')
+UNASSIGNED_STOPS = registry.counter(
+    'palliroute_unassigned_stops_total', 'Nicht zugewiesene Stopps nach Optimierungen', ['type'])
+ROSTER_SIZE = registry.gauge(
+    'palliroute_roster_size', 'Anzahl geladener Patienten und Mitarbeiter', ['kind'])
+
+
+def timed_stage(stage):
+    # Dekorator/Kontextmanager für einen Verarbeitungsschritt
+    return STAGE_SECONDS.time(stage=stage)
+
+
+class timed_call(ContextDecorator):
+    # Misst einen externen API-Aufruf, getrennt nach Erfolg und Fehler
+    def __init__(self, api):
+        self.api = api
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        outcome = 'error' if exc_type else 'ok'
+        EXTERNAL_CALL_SECONDS.observe(time.perf_counter() - self._start, api=self.api, outcome=outcome)
+        return False
+
+    def _recreate_cm(self):
+        return timed_call(self.api)
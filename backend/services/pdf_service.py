@@ -1,85 +1,124 @@
+import io
+import multiprocessing
+import re
+import resource
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from io import BytesIO
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
-from pypdf import PdfMerger
+from pypdf import PdfWriter
+from config import Config
+from services.metrics import timed_stage
+
+STOP_HEADERS = ['Patient', 'Besuchsart', 'Adresse', 'Uhrzeit/Info', 'Telefon']
+NUMBERED_STOP_HEADERS = ['Nr.'] + STOP_HEADERS
+
+# Prozess-Pool für große Exporte (wird beim ersten parallelen Export erstellt)
+_process_pool = None
 
 def create_route_pdf(optimized_routes, unassigned_tk_stops, unassigned_regular_stops, selected_weekday, formatted_date):
     # Erstellt ein PDF-Dokument mit Route-Informationen
-    merger = PdfMerger()
-    
-    # Erstelle PDF für jeden Mitarbeiter
-    for route in optimized_routes:
-        if not route['stops']:
-            continue
-        
-        route_pdf = _create_single_route_pdf(
-            route, 
-            selected_weekday, 
-            formatted_date
-        )
-        merger.append(BytesIO(route_pdf.getvalue()))
+    output, _ = render_route_pdf(
+        optimized_routes,
+        unassigned_tk_stops,
+        unassigned_regular_stops,
+        selected_weekday,
+        formatted_date
+    )
+    return output
 
-    # Erstelle PDF für unzugewiesene Hausbesuche
-    if unassigned_regular_stops:
-        regular_pdf = _create_unassigned_regular_pdf(
-            unassigned_regular_stops,
-            selected_weekday,
-            formatted_date
-        )
-        merger.append(BytesIO(regular_pdf.getvalue()))
+@timed_stage('pdf_export')
+def render_route_pdf(optimized_routes, unassigned_tk_stops, unassigned_regular_stops, selected_weekday, formatted_date, parallel=None):
+    # Erstellt das PDF in einem Durchlauf und gibt (output, stats) zurück
+    # parallel=None entscheidet anhand der Anzahl der Abschnitte (PDF_PARALLEL_MIN_SECTIONS)
+    started = time.perf_counter()
+    sections = collect_sections(optimized_routes, unassigned_tk_stops, unassigned_regular_stops)
+
+    workers = max(1, Config.PDF_WORKERS)
+    if parallel is None:
+        parallel = workers > 1 and len(sections) >= Config.PDF_PARALLEL_MIN_SECTIONS
+
+    if parallel and workers > 1 and len(sections) > 1:
+        pdf_bytes, pages = _render_parallel(sections, selected_weekday, formatted_date, workers)
+        mode = 'parallel'
+    else:
+        pdf_bytes, pages = _render_sections(sections, selected_weekday, formatted_date)
+        mode = 'single'
+        workers = 1
+
+    output = BytesIO(pdf_bytes)
+    stats = {
+        'mode': mode,
+        'workers': workers,
+        'sections': len(sections),
+        'pages': pages,
+        'bytes': len(pdf_bytes),
+        'seconds': round(time.perf_counter() - started, 3),
+        'peak_rss_mb': _peak_rss_mb(include_children=mode == 'parallel')
+    }
+    return output, stats
 
-    # Erstelle PDF für unzugewiesene Telefonkontakte
+def collect_sections(optimized_routes, unassigned_tk_stops, unassigned_regular_stops):
+    # Abschnitte in Dokumentreihenfolge: Mitarbeiter, unzugewiesene Hausbesuche, Telefonkontakte
+    sections = [('route', route) for route in optimized_routes if route['stops']]
+    if unassigned_regular_stops:
+        sections.append(('regular', unassigned_regular_stops))
     if unassigned_tk_stops:
-        tk_pdf = _create_tk_pdf(
-            unassigned_tk_stops, 
-            selected_weekday, 
-            formatted_date
-        )
-        merger.append(BytesIO(tk_pdf.getvalue()))
+        sections.append(('tk', unassigned_tk_stops))
+    return sections
 
-    # Zusammengeführtes PDF erstellen
-    output = BytesIO()
-    merger.write(output)
-    merger.close()
-    output.seek(0)
-    return output
+@timed_stage('pdf_section')
+def render_section_pdf(section, selected_weekday, formatted_date):
+    # Erstellt das PDF für einen einzelnen Abschnitt (z.B. einen Mitarbeiter)
+    pdf_bytes, _ = _render_sections([section], selected_weekday, formatted_date)
+    return pdf_bytes
 
-def _create_single_route_pdf(route, selected_weekday, formatted_date):
-    # Erstellt eine PDF für eine einzelne Route
-    output = BytesIO()
-    doc = SimpleDocTemplate(
-        output,
-        pagesize=landscape(A4),
-        rightMargin=1*cm,
-        leftMargin=1*cm,
-        topMargin=1*cm,
-        bottomMargin=1*cm,
-        title=f"Optimierte Route: {route['vehicle']}",
-        author="PalliRoute",
-        subject=f"Optimierte Route für {selected_weekday}, {formatted_date}",
-    )
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=14,
-        spaceAfter=20,
-        alignment=1
-    )
-    
-    elements = []
-    elements.extend(_create_route_section(route, title_style, styles))
-    
-    doc.build(elements)
-    output.seek(0)
-    return output
+def section_file_name(index, section):
+    # Dateiname eines Abschnitts im ZIP-Export
+    kind, payload = section
+    if kind == 'route':
+        name = re.sub(r'[^\w.-]+', '_', payload['vehicle']).strip('_')
+        return f"{index:02d}_{name}.pdf"
+    if kind == 'regular':
+        return f"{index:02d}_Unzugewiesene_Hausbesuche.pdf"
+    return f"{index:02d}_Unzugewiesene_Telefonkontakte.pdf"
+
+def stream_route_zip(sections, selected_weekday, formatted_date, render_section=None):
+    # Erzeugt ein ZIP mit einem PDF je Abschnitt und gibt es stückweise zurück,
+    # sobald ein Abschnitt fertig ist (der Browser erhält sofort die ersten Bytes)
+    render_section = render_section or (lambda section: render_section_pdf(section, selected_weekday, formatted_date))
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for index, section in enumerate(sections, 1):
+            archive.writestr(section_file_name(index, section), render_section(section))
+            yield stream.pop()
+    yield stream.pop()
+
+class _ZipStream(io.RawIOBase):
+    # Nicht durchsuchbarer Ausgabepuffer; zipfile schreibt dann Datendeskriptoren statt zurückzuspringen
+    def __init__(self):
+        self._chunks = []
 
-def _create_tk_pdf(tk_stops, selected_weekday, formatted_date):
-    # Erstellt eine PDF für unzugewiesene Telefonkontakte
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _render_sections(sections, selected_weekday, formatted_date):
+    # Rendert alle Abschnitte in ein Dokument, jeder Abschnitt beginnt auf einer neuen Seite
     output = BytesIO()
     doc = SimpleDocTemplate(
         output,
@@ -88,42 +127,71 @@ def _create_tk_pdf(tk_stops, selected_weekday, formatted_date):
         leftMargin=1*cm,
         topMargin=1*cm,
         bottomMargin=1*cm,
-        title="Unzugewiesene Telefonkontakte",
+        title=f"Optimierte Routen {selected_weekday}, {formatted_date}",
         author="PalliRoute",
-        subject=f"Unzugewiesene Telefonkontakte für {selected_weekday}, {formatted_date}",
+        subject=f"Optimierte Routen für {selected_weekday}, {formatted_date}",
     )
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=14,
-        spaceAfter=20,
-        alignment=1
-    )
-    
+
+    title_style, styles = _get_styles()
+    builders = {
+        'route': _create_route_section,
+        'regular': _create_regular_section,
+        'tk': _create_tk_section
+    }
+
     elements = []
-    elements.extend(_create_tk_section(tk_stops, title_style, styles))
-    
+    for kind, payload in sections:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(builders[kind](payload, title_style, styles))
+
     doc.build(elements)
-    output.seek(0)
-    return output
+    return output.getvalue(), doc.page
+
+def _render_parallel(sections, selected_weekday, formatted_date, workers):
+    # Rendert zusammenhängende Blöcke von Abschnitten in mehreren Prozessen und hängt die Seiten aneinander
+    chunk_size = -(-len(sections) // workers)
+    chunks = [sections[i:i + chunk_size] for i in range(0, len(sections), chunk_size)]
+    futures = [
+        _get_process_pool(workers).submit(_render_sections, chunk, selected_weekday, formatted_date)
+        for chunk in chunks
+    ]
+
+    writer = PdfWriter()
+    for future in futures:
+        pdf_bytes, _ = future.result()
+        writer.append(BytesIO(pdf_bytes))
+    writer.add_metadata({
+        '/Title': f"Optimierte Routen {selected_weekday}, {formatted_date}",
+        '/Author': 'PalliRoute'
+    })
 
-def _create_unassigned_regular_pdf(regular_stops, selected_weekday, formatted_date):
-    # Erstellt eine PDF für unzugewiesene Hausbesuche
     output = BytesIO()
-    doc = SimpleDocTemplate(
-        output,
-        pagesize=landscape(A4),
-        rightMargin=1*cm,
-        leftMargin=1*cm,
-        topMargin=1*cm,
-        bottomMargin=1*cm,
-        title="Unzugewiesene Hausbesuche",
-        author="PalliRoute",
-        subject=f"Unzugewiesene Hausbesuche für {selected_weekday}, {formatted_date}",
-    )
-    
+    writer.write(output)
+    pages = len(writer.pages)
+    writer.close()
+    return output.getvalue(), pages
+
+def _get_process_pool(workers):
+    # Startet die Worker-Prozesse mit "spawn", da Gunicorn-Worker mehrere Threads haben
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _process_pool
+
+def _peak_rss_mb(include_children=False):
+    # Höchster Speicherverbrauch des Prozesses (Linux: ru_maxrss in KB)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if include_children:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak / 1024, 1)
+
+@lru_cache(maxsize=1)
+def _get_styles():
+    # Stylesheet und Titelstil werden nur einmal pro Prozess erstellt
     styles = getSampleStyleSheet()
     title_style = ParagraphStyle(
         'CustomTitle',
@@ -132,13 +200,7 @@ def _create_unassigned_regular_pdf(regular_stops, selected_weekday, formatted_da
         spaceAfter=20,
         alignment=1
     )
-    
-    elements = []
-    elements.extend(_create_regular_section(regular_stops, title_style, styles))
-    
-    doc.build(elements)
-    output.seek(0)
-    return output
+    return title_style, styles
 
 def _create_route_section(route, title_style, styles):
     # Erstellt PDF-Elemente für eine einzelne Route
@@ -173,9 +235,7 @@ def _create_regular_section(regular_stops, title_style, styles):
     elements = []
     elements.append(Paragraph("Unzugewiesene Hausbesuche", title_style))
     
-    # Header
-    headers = ['Patient', 'Besuchsart', 'Adresse', 'Uhrzeit/Info', 'Telefon']
-    data = [headers]
+    data = [STOP_HEADERS]
     
     for stop in regular_stops:
         data.append([
@@ -199,11 +259,7 @@ def _create_stops_table(stops, title, include_number, title_style, styles):
     elements.append(Paragraph(title, title_style))
     
     # Header
-    headers = ['Patient', 'Besuchsart', 'Adresse', 'Uhrzeit/Info', 'Telefon']
-    if include_number:
-        headers.insert(0, 'Nr.')
-    
-    data = [headers]
+    data = [NUMBERED_STOP_HEADERS if include_number else STOP_HEADERS]
     
     # Besuche
     for i, stop in enumerate(stops, 1):
@@ -226,8 +282,9 @@ def _create_stops_table(stops, title, include_number, title_style, styles):
     
     return elements
 
+@lru_cache(maxsize=1)
 def _get_table_style():
-    # Gibt die gemeinsame Tabellen-Stil zurück
+    # Gibt die gemeinsame Tabellen-Stil zurück (einmal erstellt, von allen Tabellen geteilt)
     return TableStyle([
         ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class CachedBody:
+    # Serialisierte JSON-Antwort mit starkem ETag; komprimierte Varianten werden bei Bedarf erzeugt
+    __slots__ = ('body', 'etag', '_encoded', '_lock')
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding, level):
+        with self._lock:
+            data = self._encoded.get(encoding)
+            if data is None:
+                if encoding == 'br':
+                    data = brotli.compress(self.body, quality=min(level, 11))
+                else:
+                    data = gzip.compress(self.body, compresslevel=min(level, 9), mtime=0)
+                self._encoded[encoding] = data
+            return data
+
+    def size(self):
+        return len(self.body) + sum(len(data) for data in self._encoded.values())
+
+
+class ResponseCache:
+    # Zwischenspeicher für häufig abgefragte JSON-Antworten (Marker, gespeicherte Routen)
+    # Schlüssel enthalten die Änderungszähler der Daten; ändert sich nichts, wird weder neu
+    # serialisiert noch komprimiert, und Clients mit aktuellem ETag erhalten 304 Not Modified
+    ENCODING_SUFFIX = {'gzip': '-gz', 'br': '-br'}
+
+    def __init__(self, max_entries=64, min_compress_bytes=1024, compress_level=6):
+        self.max_entries = max_entries
+        self.min_compress_bytes = min_compress_bytes
+        self.compress_level = compress_level
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key, build):
+        # Gibt den gespeicherten Body zurück oder serialisiert build() als JSON (wie jsonify)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = CachedBody(current_app.json.dumps(build()).encode('utf-8'))
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def respond(self, request, key, build):
+        # Antwort mit ETag, 304 bei passendem If-None-Match, sonst gzip/brotli je nach Accept-Encoding
+        entry = self.get_or_create(key, build)
+        encoding = self._choose_encoding(request, entry)
+        etag = entry.etag + self.ENCODING_SUFFIX.get(encoding, '')
+        headers = {
+            'ETag': f'"{etag}"',
+            'Vary': 'Accept-Encoding',
+            # Der Browser darf speichern, muss aber jedes Mal nachfragen (günstig über 304)
+            'Cache-Control': 'no-cache'
+        }
+        if self._matches(request, entry.etag):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status=304, headers=headers)
+
+        body = entry.body
+        if encoding:
+            body = entry.encoded(encoding, self.compress_level)
+            headers['Content-Encoding'] = encoding
+        return Response(body, status=200, headers=headers, content_type='application/json')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(entry.size() for entry in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'brotli': brotli is not None
+            }
+
+    def _choose_encoding(self, request, entry):
+        # Brotli, falls installiert und vom Client akzeptiert, sonst gzip; kleine Antworten unkomprimiert
+        if len(entry.body) < self.min_compress_bytes:
+            return None
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def _matches(self, request, etag):
+        # Vergleicht If-None-Match unabhängig von der Kodierung (gleicher Inhalt, gleiches ETag)
+        if_none_match = request.if_none_match
+        if not if_none_match:
+            return False
+        if if_none_match.star_tag:
+            return True
+        return any(tag in if_none_match for tag in
+                   [etag] + [etag + suffix for suffix in self.ENCODING_SUFFIX.values()])
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    # Cache für verarbeitete Optimierungsergebnisse (Schlüssel: Hash der Optimierungsanfrage)
+    # Häufig genutzte Ergebnisse liegen im Speicher (LRU), alle zusätzlich als JSON-Datei auf der Festplatte
+    def __init__(self, directory, max_entries=64, max_disk_entries=500):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts):
+        # SHA-256 über die kanonische JSON-Darstellung (sortierte Schlüssel, keine Leerzeichen)
+        canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        # Gibt eine Kopie des Ergebnisses zurück oder None
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(payload)
+
+        payload = self._read(key)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, payload)
+        return json.loads(payload)
+
+    def set(self, key, value):
+        # Speichert ein Ergebnis im Speicher und auf der Festplatte
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        with self._lock:
+            self._remember(key, payload)
+        self._write(key, payload)
+
+    def invalidate(self, key=None):
+        # Entfernt einen Eintrag oder (ohne key) den gesamten Cache
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                paths = self._disk_files()
+            else:
+                self._entries.pop(key, None)
+                paths = [self._path(key)]
+        removed = 0
+        for path in paths:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def stats(self):
+        # Trefferstatistiken des Caches
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'disk_entries': len(self._disk_files()),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / total, 4) if total else 0.0
+            }
+
+    def _remember(self, key, payload):
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while self.max_entries and len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _disk_files(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                payload = f.read()
+            # Zugriffszeit aktualisieren, damit häufig genutzte Einträge nicht verdrängt werden
+            os.utime(self._path(key))
+            return payload
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"Result cache read error: {e}")
+            return None
+
+    def _write(self, key, payload):
+        # Schreibt einen Eintrag atomar und entfernt die ältesten Dateien über dem Limit
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.result_')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+        except OSError as e:
+            print(f"Result cache write error: {e}")
+
+    def _evict_disk(self):
+        if not self.max_disk_entries:
+            return
+        files = self._disk_files()
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else time.time())
+        for path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
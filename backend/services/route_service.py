@@ -1,35 +1,257 @@
-from google.maps import routeoptimization_v1
+import threading
+
 from services.date_time_service import DateTimeService
-from models import patients, vehicles
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from services.route_solvers import create_solver, request_locations
+from services.result_cache import ResultCache
+from services.metrics import UNASSIGNED_STOPS, timed_stage
 from config import Config
 
+# Arbeitsbeginn der Planung (siehe DateTimeService.get_start_time)
+DEFAULT_START_TIME = '08:00'
+
 class RouteOptimizationService:
-    def __init__(self, project_id=Config.GOOGLE_PROJECT_ID):
+    def __init__(self, project_id=Config.GOOGLE_PROJECT_ID, default_solver=Config.ROUTE_SOLVER):
         self.project_id = project_id
-        self.client = routeoptimization_v1.RouteOptimizationClient()
+        self.default_solver = default_solver
+        self.solvers = {}
+        self._travel_matrix = None
+        # Solver und Matrix werden auch aus den Threads der Wochenplanung angefordert und nur einmal erstellt
+        # (RLock, da get_solver für den lokalen Optimierer die Matrix anfordert)
+        self._create_lock = threading.RLock()
+        self.result_cache = ResultCache(
+            Config.RESULT_CACHE_DIR,
+            max_entries=Config.RESULT_CACHE_MAX_ENTRIES,
+            max_disk_entries=Config.RESULT_CACHE_MAX_DISK_ENTRIES
+        )
 
-    def optimize_routes(self, non_tk_patients, available_vehicles, selected_weekday, week_number):
-        # Optimiert die Routen für die gegebenen Patienten und Fahrzeuge
+    @property
+    def travel_matrix(self):
+        # Gemeinsame Fahrzeitmatrix für lokale Optimierung und Dauerberechnung
+        if self._travel_matrix is None:
+            with self._create_lock:
+                if self._travel_matrix is None:
+                    from services.travel_matrix import TravelMatrix, create_matrix_provider
+                    from services.google_clients import google_clients
+                    self._travel_matrix = TravelMatrix(
+                        Config.TRAVEL_MATRIX_FILE,
+                        create_matrix_provider(Config.TRAVEL_MATRIX_PROVIDER, google_clients)
+                    )
+        return self._travel_matrix
+
+    def get_solver(self, name=None):
+        # Gibt den Optimierer zurück (wird beim ersten Zugriff erstellt)
+        name = name or self.default_solver
+        solver = self.solvers.get(name)
+        if solver is not None:
+            return solver
+        with self._create_lock:
+            if name not in self.solvers:
+                self.solvers[name] = self._create_solver(name)
+            return self.solvers[name]
+
+    def _create_solver(self, name):
+        solver = create_solver(
+            name,
+            project_id=self.project_id,
+            time_budget=Config.LOCAL_SOLVER_TIME_BUDGET,
+            travel_matrix=self.travel_matrix if name == 'local' else None
+        )
+        if Config.ROUTE_DECOMPOSITION == 'kmeans':
+            # Große Anfragen werden in Teilgebiete zerlegt und parallel gelöst
+            from services.decomposition import ClusteredSolver
+            solver = ClusteredSolver(
+                solver,
+                cluster_size=Config.DECOMPOSITION_CLUSTER_SIZE,
+                min_shipments=Config.DECOMPOSITION_MIN_SHIPMENTS,
+                max_workers=Config.DECOMPOSITION_WORKERS
+            )
+        return solver
+
+    @timed_stage('build_request')
+    def build_request(self, non_tk_patients, available_vehicles, selected_weekday, week_number, vehicles_model=None):
+        # Erstellt die Optimierungsanfrage (entspricht dem OptimizeToursRequest als dict)
         
         # Erstellt Lieferungen für Hausbesuche
         shipments = self._create_shipments(non_tk_patients)
         
-        # Erstellt Fahrzeugmodelle
-        vehicles_model = self._create_vehicle_models(available_vehicles)
+        # Erstellt Fahrzeugmodelle (bei der Wochenplanung einmal für alle Tage)
+        if vehicles_model is None:
+            vehicles_model = self._create_vehicle_models(available_vehicles)
         
-        # Erstellt und sendet die Optimierungsanfrage
-        request = routeoptimization_v1.OptimizeToursRequest({
-            "parent": f"projects/{self.project_id}",
+        return {
             "model": {
                 "shipments": shipments,
                 "vehicles": vehicles_model,
                 "global_start_time": DateTimeService.get_start_time(selected_weekday, week_number),
                 "global_end_time": DateTimeService.get_end_time(selected_weekday, week_number)
             },
-            "consider_road_traffic": True
-        })
-        
-        return self.client.optimize_tours(request)
+            "consider_road_traffic": True,
+            # Straßenverlauf je Route, damit die Karte ohne Directions-Anfragen zeichnen kann
+            "populate_polylines": True
+        }
+
+    def optimize_routes(self, non_tk_patients, available_vehicles, selected_weekday, week_number, solver=None, should_stop=None):
+        # Optimiert die Routen für die gegebenen Patienten und Fahrzeuge
+        request = self.build_request(non_tk_patients, available_vehicles, selected_weekday, week_number)
+        with timed_stage('optimize'):
+            return self.get_solver(solver).solve(request, should_stop=should_stop)
+
+    def optimize_and_process(self, non_tk_patients, available_vehicles, all_active_vehicles, tk_patients,
+                             selected_weekday, week_number, solver=None, should_stop=None, use_cache=True,
+                             previous_routes=None, vehicles_model=None):
+        # Optimiert und verarbeitet das Ergebnis; identische Anfragen werden aus dem Cache beantwortet
+        # previous_routes (bisherige Routen) dienen als Startlösung, damit kleine Änderungen schnell
+        # nachoptimiert werden und die übrigen Routen stabil bleiben
+        solver = solver or self.default_solver
+        request = self.build_request(non_tk_patients, available_vehicles, selected_weekday, week_number, vehicles_model)
+        key = ResultCache.make_key(
+            solver,
+            self._decomposition_settings(),
+            request,
+            self._result_fingerprint(available_vehicles, all_active_vehicles, non_tk_patients, tk_patients)
+        )
+
+        if use_cache:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return {**cached, 'cached': True}
+
+        # Die Startlösung ist nur ein Hinweis und gehört nicht zum Cache-Schlüssel
+        warm_start = self.build_warm_start(previous_routes, non_tk_patients, available_vehicles)
+        with timed_stage('optimize'):
+            response = self._solve(solver, request, warm_start, should_stop)
+        optimized_routes, unassigned_regular_stops, unassigned_tk_stops = self.process_optimization_result(
+            response,
+            available_vehicles,
+            all_active_vehicles,
+            non_tk_patients,
+            tk_patients
+        )
+        UNASSIGNED_STOPS.inc(len(unassigned_regular_stops), type='regular')
+        UNASSIGNED_STOPS.inc(len(unassigned_tk_stops), type='tk')
+        result = {
+            'routes': optimized_routes,
+            'regular_stops': unassigned_regular_stops,
+            'tk_patients': unassigned_tk_stops
+        }
+
+        # Abgebrochene Optimierungen liefern nur Zwischenstände und werden nicht gespeichert
+        if not (should_stop and should_stop()):
+            self.result_cache.set(key, result)
+        return {**result, 'cached': False}
+
+    def optimize_week(self, days, available_vehicles, all_active_vehicles, week_number, solver=None,
+                      should_stop=None, use_cache=True, previous_results=None, on_day_done=None):
+        # Optimiert mehrere Wochentage gleichzeitig (höchstens WEEK_OPTIMIZATION_WORKERS parallel)
+        # days: {weekday: (non_tk_patients, tk_patients)}; gibt {weekday: Ergebnis} zurück
+        solver = solver or self.default_solver
+        previous_results = previous_results or {}
+        vehicles_model = self._create_vehicle_models(available_vehicles)
+
+        if solver == 'local':
+            # Fahrzeiten aller Tage vorab gebündelt laden, damit die Tage sich die Matrix teilen
+            points = []
+            for weekday, (non_tk_patients, _) in days.items():
+                request = self.build_request(non_tk_patients, available_vehicles, weekday, week_number, vehicles_model)
+                points.extend(request_locations(request))
+            self.travel_matrix.ensure(points)
+
+        def optimize_day(weekday):
+            non_tk_patients, tk_patients = days[weekday]
+            return self.optimize_and_process(
+                non_tk_patients,
+                available_vehicles,
+                all_active_vehicles,
+                tk_patients,
+                weekday,
+                week_number,
+                solver=solver,
+                should_stop=should_stop,
+                use_cache=use_cache,
+                previous_routes=previous_results.get(weekday, {}).get('routes'),
+                vehicles_model=vehicles_model
+            )
+
+        results = {}
+        workers = max(1, min(Config.WEEK_OPTIMIZATION_WORKERS, len(days)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='week') as executor:
+            futures = {executor.submit(optimize_day, weekday): weekday for weekday in days}
+            for future in as_completed(futures):
+                weekday = futures[future]
+                results[weekday] = future.result()
+                if on_day_done:
+                    on_day_done(weekday, len(results))
+        return {weekday: results[weekday] for weekday in days}
+
+    def _solve(self, solver, request, warm_start, should_stop):
+        # Löst mit Startlösung; lehnt der Optimierer sie ab, wird ohne Startlösung neu gelöst
+        if not warm_start:
+            return self.get_solver(solver).solve(request, should_stop=should_stop)
+        try:
+            return self.get_solver(solver).solve(
+                {**request, 'injected_first_solution_routes': warm_start}, should_stop=should_stop)
+        except Exception as e:
+            # Nur eine abgelehnte Startlösung (ungültige Anfrage) wird ohne sie wiederholt; Timeouts,
+            # Kontingent- und Verbindungsfehler würden sonst die Wartezeit verdoppeln
+            from services.google_clients import GoogleClients
+            if GoogleClients.classify(e) != 'client':
+                raise
+            print(f"Warm start rejected, solving from scratch: {e}")
+            return self.get_solver(solver).solve(request, should_stop=should_stop)
+
+    def build_warm_start(self, previous_routes, non_tk_patients, available_vehicles):
+        # Wandelt bisherige Routen in injected_first_solution_routes um (Zuordnung über die Namen)
+        # Ohne ausreichende Überschneidung (z.B. anderer Wochentag) wird ohne Startlösung optimiert
+        if not previous_routes or not Config.ROUTE_WARM_START:
+            return None
+        shipment_by_name = {}
+        for index, patient in enumerate(non_tk_patients):
+            shipment_by_name.setdefault(patient.name, index)
+        vehicle_by_name = {}
+        for index, vehicle in enumerate(available_vehicles):
+            vehicle_by_name.setdefault(vehicle.name, index)
+
+        injected = []
+        used = set()
+        for route in previous_routes:
+            vehicle_index = vehicle_by_name.get(route.get('vehicle'))
+            if vehicle_index is None:
+                continue
+            visits = []
+            for stop in route.get('stops', []):
+                shipment_index = shipment_by_name.get(stop.get('patient'))
+                if shipment_index is None or shipment_index in used:
+                    continue
+                used.add(shipment_index)
+                visits.append({'shipment_index': shipment_index, 'is_pickup': True})
+            if visits:
+                injected.append({'vehicle_index': vehicle_index, 'visits': visits})
+
+        if not non_tk_patients or len(used) < Config.WARM_START_MIN_OVERLAP * len(non_tk_patients):
+            return None
+        return injected
+
+    def _decomposition_settings(self):
+        # Die Zerlegung verändert das Ergebnis und gehört daher zum Cache-Schlüssel
+        if Config.ROUTE_DECOMPOSITION == 'off':
+            return None
+        return [Config.ROUTE_DECOMPOSITION, Config.DECOMPOSITION_CLUSTER_SIZE, Config.DECOMPOSITION_MIN_SHIPMENTS]
+
+    def _result_fingerprint(self, available_vehicles, all_active_vehicles, non_tk_patients, tk_patients):
+        # Felder, die neben der Anfrage in die Verarbeitung des Ergebnisses einfließen
+        def patient_fields(p):
+            return [p.name, p.address, p.visit_type, p.time_info, p.phone_numbers]
+
+        return {
+            'available_vehicles': [v.name for v in available_vehicles],
+            'active_vehicles': [
+                [v.name, v.funktion, getattr(v, 'stellenumfang', 100), v.lat, v.lon]
+                for v in all_active_vehicles
+            ],
+            'patients': [patient_fields(p) for p in non_tk_patients],
+            'tk_patients': [patient_fields(p) + [p.lat, p.lon] for p in tk_patients]
+        }
 
     def _create_shipments(self, patients):
         # Erstellt Lieferungsmuster für Patienten
@@ -83,9 +305,11 @@ class RouteOptimizationService:
         }
         return durations.get(visit_type, 0)
 
+    @timed_stage('process_result')
     def process_optimization_result(self, response, available_vehicles, all_active_vehicles, non_tk_patients, tk_patients):
         # Verarbeitet die Optimierungsergebnisse und erstellt die Antwort
         optimized_routes = []
+        routes_by_vehicle = {}
         
         # Erstellt leere Container für alle aktiven Fahrzeuge
         for vehicle in all_active_vehicles:
@@ -95,9 +319,11 @@ class RouteOptimizationService:
                 "funktion": vehicle.funktion,
                 "duration_hrs": 0,
                 "max_hours": max_hours,
+                "limit_status": "ok",
                 "vehicle_start": {"lat": vehicle.lat, "lng": vehicle.lon},
                 "stops": []
             })
+            routes_by_vehicle.setdefault(vehicle.name, optimized_routes[-1])
         
         # Verarbeitet die Optimierungsergebnisse
         for i, route in enumerate(response.routes):
@@ -107,11 +333,24 @@ class RouteOptimizationService:
                 duration_hrs = 0
                 
             vehicle = available_vehicles[route.vehicle_index]
-            route_container = next(r for r in optimized_routes if r["vehicle"] == vehicle.name)
+            route_container = routes_by_vehicle[vehicle.name]
             route_container["duration_hrs"] = round(duration_hrs, 2)
+            route_container["limit_status"] = self.get_limit_status(duration_hrs, route_container["max_hours"])
+
+            # Fahrzeiten je Abschnitt (Start -> 1. Besuch, ..., letzter Besuch -> Start) und Straßenverlauf
+            legs = [
+                {
+                    "duration_s": self._seconds(transition.travel_duration),
+                    "distance_m": int(transition.travel_distance_meters or 0)
+                }
+                for transition in route.transitions
+            ]
+            route_container["start_time"] = self._format_time(route.vehicle_start_time)
+            route_container["legs"] = legs
+            route_container["polyline"] = self._route_polyline(route)
             
             # Fügt Besuche zur Route hinzu
-            for visit in route.visits:
+            for visit_index, visit in enumerate(route.visits):
                 if visit.shipment_index >= 0:
                     p = non_tk_patients[visit.shipment_index]
                     route_container["stops"].append({
@@ -120,7 +359,9 @@ class RouteOptimizationService:
                         "visit_type": p.visit_type,
                         "time_info": p.time_info,
                         "phone_numbers": p.phone_numbers,
-                        "location": {"lat": p.lat, "lng": p.lon}
+                        "location": {"lat": p.lat, "lng": p.lon},
+                        "arrival_time": self._format_time(visit.start_time),
+                        "travel_seconds": legs[visit_index]["duration_s"] if visit_index < len(legs) else None
                     })
         
         # Finde unzugewiesene Hausbesuche
@@ -138,6 +379,151 @@ class RouteOptimizationService:
         
         return optimized_routes, unassigned_regular_stops, unassigned_tk_stops
 
+    @timed_stage('evaluate_routes')
+    def evaluate_routes(self, routes, previous_routes=(), vehicles=()):
+        # Berechnet Dauer und Limit-Status nach manuellen Änderungen neu
+        # Nur Routen mit geänderter Reihenfolge der Hausbesuche werden neu berechnet
+        previous_by_vehicle = {r['vehicle']: r for r in previous_routes}
+        vehicles_by_name = {v.name: v for v in vehicles}
+        changed = []
+
+        for route in routes:
+            previous = previous_by_vehicle.get(route['vehicle'])
+            self._complete_route(route, previous, vehicles_by_name.get(route['vehicle']))
+            if previous is not None and self._route_signature(previous) == self._route_signature(route):
+                route['duration_hrs'] = previous.get('duration_hrs', 0)
+                route['duration_estimated'] = previous.get('duration_estimated', False)
+                self._copy_timeline(route, previous)
+            else:
+                changed.append(route)
+
+        # Nur die Abschnitte der geänderten Routen laden (keine Paare zwischen allen Punkten)
+        pairs = []
+        for route in changed:
+            points = self._route_points(route)
+            pairs.extend(zip(points, points[1:]))
+        if pairs:
+            self.travel_matrix.ensure_pairs(pairs)
+
+        # Ohne Distance Matrix API sind Dauer und Ankunftszeiten nur Schätzungen über die Luftlinie
+        estimated = self.travel_matrix.provider.name != 'google'
+        for route in changed:
+            legs = self._route_legs(route)
+            route['duration_hrs'] = round(self._route_duration_seconds(route, legs) / 3600.0, 2)
+            route['duration_estimated'] = estimated
+            self._update_timeline(route, previous_by_vehicle.get(route['vehicle']), legs)
+        for route in routes:
+            route['limit_status'] = self.get_limit_status(route['duration_hrs'], route['max_hours'])
+
+        return routes, [route['vehicle'] for route in changed]
+
+    def get_limit_status(self, duration_hrs, max_hours):
+        # 'ok' bis zum Stellenumfang, 'soft' bis zum Hard Cap (+30 Minuten), danach 'hard'
+        if duration_hrs <= max_hours:
+            return 'ok'
+        if duration_hrs <= max_hours + 0.5:
+            return 'soft'
+        return 'hard'
+
+    def _complete_route(self, route, previous, vehicle):
+        # Ergänzt Startpunkt und Stundenlimit aus dem letzten Ergebnis bzw. dem Fahrzeug
+        if previous is not None:
+            route['vehicle_start'] = route.get('vehicle_start') or previous.get('vehicle_start')
+            route['max_hours'] = previous.get('max_hours', route.get('max_hours'))
+        if vehicle is not None:
+            route['vehicle_start'] = route.get('vehicle_start') or {"lat": vehicle.lat, "lng": vehicle.lon}
+            if previous is None:
+                route['max_hours'] = round((getattr(vehicle, 'stellenumfang', 100) / 100.0) * 7, 2)
+        route.setdefault('max_hours', 7)
+
+    def _route_signature(self, route):
+        # Reihenfolge der Hausbesuche (Telefonkontakte haben keine Fahrzeit)
+        return [
+            (stop['patient'], stop['visit_type'], stop['location']['lat'], stop['location']['lng'])
+            for stop in route.get('stops', [])
+            if stop.get('visit_type') != 'TK' and stop.get('location')
+        ]
+
+    def _route_points(self, route):
+        # Start, Hausbesuche und Rückkehr zum Start als (lat, lon)-Punkte
+        stops = [(lat, lng) for _, _, lat, lng in self._route_signature(route)]
+        if not stops:
+            return []
+        start = route.get('vehicle_start')
+        if not start:
+            return stops
+        start = (start['lat'], start['lng'])
+        return [start] + stops + [start]
+
+    def _route_legs(self, route):
+        # (Sekunden, Meter) je Abschnitt zwischen den Punkten der Route aus der Fahrzeitmatrix
+        points = self._route_points(route)
+        return [self.travel_matrix.travel(origin, destination) for origin, destination in zip(points, points[1:])]
+
+    def _route_duration_seconds(self, route, legs=None):
+        # Fahrzeit über die Fahrzeitmatrix plus Verweildauer der Besuche
+        travel = sum(seconds for seconds, _ in (self._route_legs(route) if legs is None else legs))
+        dwell = sum(self._get_visit_duration(visit_type) for _, visit_type, _, _ in self._route_signature(route))
+        return travel + dwell
+
+    def _copy_timeline(self, route, previous):
+        # Unveränderte Route: Straßenverlauf, Abschnitte und Ankunftszeiten aus dem letzten Ergebnis übernehmen
+        for field in ('start_time', 'legs', 'polyline'):
+            if field in previous:
+                route[field] = previous[field]
+        previous_stops = {stop['patient']: stop for stop in previous.get('stops', [])}
+        for stop in route.get('stops', []):
+            previous_stop = previous_stops.get(stop['patient'], {})
+            for field in ('arrival_time', 'travel_seconds'):
+                if field in previous_stop:
+                    stop[field] = previous_stop[field]
+
+    def _update_timeline(self, route, previous, legs):
+        # Geänderte Route: Abschnitte und Ankunftszeiten aus den Fahrzeiten der Matrix neu berechnen
+        # Der Straßenverlauf entfällt (die Karte berechnet ihn für diese Route selbst)
+        start_time = route.get('start_time') or (previous or {}).get('start_time') or DEFAULT_START_TIME
+        if not route.get('vehicle_start'):
+            # Ohne Startpunkt passen die Abschnitte nicht zu den Besuchen
+            legs = []
+        route['start_time'] = start_time
+        route['legs'] = [{"duration_s": seconds, "distance_m": meters} for seconds, meters in legs]
+        route['polyline'] = None
+
+        hours, minutes = (int(part) for part in start_time.split(':'))
+        current = hours * 3600 + minutes * 60
+        regular_stops = [stop for stop in route.get('stops', [])
+                         if stop.get('visit_type') != 'TK' and stop.get('location')]
+        for stop, (seconds, _) in zip(regular_stops, legs):
+            current += seconds
+            stop['arrival_time'] = f"{current // 3600 % 24:02d}:{current % 3600 // 60:02d}"
+            stop['travel_seconds'] = seconds
+            current += self._get_visit_duration(stop['visit_type'])
+        timed = {id(stop) for stop in regular_stops} if legs else set()
+        for stop in route.get('stops', []):
+            if id(stop) not in timed:
+                stop.pop('arrival_time', None)
+                stop.pop('travel_seconds', None)
+
+    @staticmethod
+    def _seconds(value):
+        # Dauer als ganze Sekunden (timedelta aus der API bzw. dem lokalen Optimierer)
+        if value is None:
+            return 0
+        if hasattr(value, 'total_seconds'):
+            return int(round(value.total_seconds()))
+        return int(value)
+
+    @staticmethod
+    def _format_time(value):
+        # Uhrzeit "HH:MM" (die Planungszeiten werden wie in DateTimeService als UTC geführt)
+        return value.strftime('%H:%M') if value else None
+
+    @staticmethod
+    def _route_polyline(route):
+        # Kodierte Polyline der Route (nur die Google API liefert den Straßenverlauf)
+        polyline = getattr(route, 'route_polyline', None)
+        return getattr(polyline, 'points', None) or None
+
     def validate_optimization_input(self, vehicles, patients):
         # Validiert die Eingabedaten für die Optimierung
         has_active_nurses = any(v.is_active and v.funktion == 'Pflegekraft' for v in vehicles)
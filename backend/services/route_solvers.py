@@ -0,0 +1,77 @@
+from services.local_solver import LocalRouteSolver
+from services.google_clients import google_clients
+
+
+class RouteSolver:
+    # Schnittstelle für Routenoptimierer; request entspricht dem OptimizeToursRequest als dict
+    name = None
+
+    def solve(self, request, should_stop=None):
+        raise NotImplementedError
+
+
+class GoogleRouteSolver(RouteSolver):
+    # Optimierung über die Google Route Optimization API (gemeinsamer gRPC-Client mit Deadline)
+    name = 'google'
+
+    # Abstand zwischen Rechenzeit der API und Deadline, damit die beste Lösung noch übertragen wird
+    DEADLINE_MARGIN_SECONDS = 10
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+
+    @property
+    def client(self):
+        # Der gRPC-Client wird erst bei der ersten Optimierung erstellt und von allen Solvern geteilt
+        return google_clients.route_optimization
+
+    def solve(self, request, should_stop=None):
+        from google.maps import routeoptimization_v1
+        optimize_request = routeoptimization_v1.OptimizeToursRequest({
+            "parent": f"projects/{self.project_id}",
+            # Die API liefert ihre beste Lösung vor Ablauf der Deadline statt abzubrechen
+            "timeout": f"{max(1, int(google_clients.optimize_timeout - self.DEADLINE_MARGIN_SECONDS))}s",
+            **request
+        })
+        return google_clients.optimize_tours(optimize_request)
+
+
+class LocalSolver(RouteSolver):
+    # Lokale Optimierung ohne Netzwerkzugriff (Heuristik mit Zeitbudget)
+    name = 'local'
+
+    def __init__(self, time_budget=1.0, travel_matrix=None):
+        self.travel_matrix = travel_matrix
+        if travel_matrix is None:
+            self.engine = LocalRouteSolver(time_budget=time_budget)
+        else:
+            self.engine = LocalRouteSolver(time_budget=time_budget, travel_fn=travel_matrix.travel)
+
+    def solve(self, request, should_stop=None):
+        if self.travel_matrix is not None:
+            # Alle benötigten Paare vorab gebündelt in die Matrix laden
+            self.travel_matrix.ensure(request_locations(request))
+        return self.engine.solve(request, should_stop=should_stop)
+
+
+def request_locations(request):
+    # Alle Koordinaten (Besuche, Start- und Endpunkte) einer Anfrage
+    model = request['model']
+    locations = []
+    for shipment in model.get('shipments', []):
+        location = shipment['pickups'][0]['arrival_location']
+        locations.append((location['latitude'], location['longitude']))
+    for vehicle in model.get('vehicles', []):
+        for field in ('start_location', 'end_location'):
+            if field in vehicle:
+                locations.append((vehicle[field]['latitude'], vehicle[field]['longitude']))
+    return locations
+
+
+def create_solver(name, project_id=None, time_budget=1.0, travel_matrix=None):
+    # Erstellt einen Optimierer anhand seines Namens
+    if name == GoogleRouteSolver.name:
+        return GoogleRouteSolver(project_id)
+    if name == LocalSolver.name:
+        return LocalSolver(time_budget=time_budget, travel_matrix=travel_matrix)
+    raise ValueError(f"Unbekannter Optimierer: {name}")
@@ -9,10 +9,7 @@ class SessionService:
     @staticmethod
     def set_selected_weekday(weekday):
         # Setzt den ausgewählten Wochentag
-        if 'selected_weekday' not in session:
-            session['selected_weekday'] = 'Montag'
-        else:
-            session['selected_weekday'] = weekday
+        session['selected_weekday'] = weekday
 
     @staticmethod
     def get_selected_week():
@@ -0,0 +1,87 @@
+import builtins
+import importlib.util
+import sys
+import time
+
+
+class StartupProfiler:
+    # Misst beim Start die Importzeit je Modul (gesamt und ohne Untermodule) und die
+    # Initialisierung einzelner Schritte; aktiviert über STARTUP_PROFILE=true
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports = {}
+        self.steps = {}
+        self._stack = []
+        self._original_import = None
+
+    def install(self):
+        # Ersetzt __import__, um neu geladene Module zu messen (bereits geladene werden übersprungen)
+        if self._original_import is not None:
+            return self
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        return self
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def step(self, name):
+        # Kontextmanager für einen Initialisierungsschritt (z.B. create_app)
+        return _Step(self, name)
+
+    def report(self, limit=15):
+        # Gibt die langsamsten Module und Schritte aus
+        total = time.perf_counter() - self.started
+        lines = [f"Startup profile: {total:.3f}s total, {len(self.imports)} modules imported"]
+        for name, seconds in self.steps.items():
+            lines.append(f"  step   {seconds:8.3f}s  {name}")
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        for name, (cumulative, own) in slowest:
+            lines.append(f"  import {own:8.3f}s self {cumulative:8.3f}s total  {name}")
+        print('\n'.join(lines))
+        return {
+            'total_seconds': round(total, 4),
+            'steps': {name: round(seconds, 4) for name, seconds in self.steps.items()},
+            'imports': {name: {'total': round(cumulative, 4), 'self': round(own, 4)}
+                        for name, (cumulative, own) in slowest}
+        }
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module_name = name
+        if level:
+            try:
+                package = (globals or {}).get('__package__') or ''
+                module_name = importlib.util.resolve_name('.' * level + name, package)
+            except (ImportError, ValueError):
+                pass
+        if module_name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        frame = [module_name, 0.0]
+        self._stack.append(frame)
+        started = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][1] += elapsed
+            if module_name in sys.modules and module_name not in self.imports:
+                self.imports[module_name] = (elapsed, elapsed - frame[1])
+
+
+class _Step:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.steps[self.name] = time.perf_counter() - self._started
+        return False
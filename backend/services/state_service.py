@@ -0,0 +1,177 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+
+class StateStore:
+    # Versionierter Speicher für gemeinsame Daten; Einträge sind über (scope, name) adressiert
+    name = None
+
+    def get(self, scope, name):
+        # Gibt (version, value) zurück; (0, None), wenn kein Eintrag existiert
+        raise NotImplementedError
+
+    def put(self, scope, name, value):
+        # Speichert value und gibt die neue Version zurück
+        raise NotImplementedError
+
+    def delete(self, scope, name):
+        raise NotImplementedError
+
+    def versions(self, scope):
+        # Gibt {name: version} für alle Einträge eines Scopes zurück
+        raise NotImplementedError
+
+
+class MemoryStateStore(StateStore):
+    # Speicher im Prozess (nur für einen einzelnen Worker geeignet)
+    name = 'memory'
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, scope, name):
+        with self._lock:
+            return self._entries.get((scope, name), (0, None))
+
+    def put(self, scope, name, value):
+        with self._lock:
+            version = self._entries.get((scope, name), (0, None))[0] + 1
+            self._entries[(scope, name)] = (version, value)
+            return version
+
+    def delete(self, scope, name):
+        with self._lock:
+            self._entries.pop((scope, name), None)
+
+    def versions(self, scope):
+        with self._lock:
+            return {name: version for (s, name), (version, _) in self._entries.items() if s == scope}
+
+
+class SQLiteStateStore(StateStore):
+    # Gemeinsamer Speicher für mehrere Gunicorn-Worker (SQLite im WAL-Modus)
+    name = 'sqlite'
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                "scope TEXT NOT NULL, name TEXT NOT NULL, version INTEGER NOT NULL, "
+                "value BLOB, updated_at REAL NOT NULL, PRIMARY KEY (scope, name))"
+            )
+
+    def get(self, scope, name):
+        row = self._connection().execute(
+            "SELECT version, value FROM state WHERE scope = ? AND name = ?", (scope, name)
+        ).fetchone()
+        if row is None:
+            return 0, None
+        return row[0], pickle.loads(row[1])
+
+    def put(self, scope, name, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._connection()
+        # BEGIN IMMEDIATE sperrt für Schreiber, damit die Versionsnummer eindeutig bleibt
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT version FROM state WHERE scope = ? AND name = ?", (scope, name)
+            ).fetchone()
+            version = (row[0] if row else 0) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO state (scope, name, version, value, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (scope, name, version, data, time.time())
+            )
+            conn.execute("COMMIT")
+            return version
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, scope, name):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM state WHERE scope = ? AND name = ?", (scope, name))
+
+    def versions(self, scope):
+        rows = self._connection().execute(
+            "SELECT name, version FROM state WHERE scope = ?", (scope,)
+        ).fetchall()
+        return dict(rows)
+
+    def _connection(self):
+        # Eine Verbindung pro Thread (sqlite3-Verbindungen sind nicht threadsicher)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class StateService:
+    # Gleicht die Daten dieses Prozesses mit dem gemeinsamen Speicher ab
+    # Jeder Eintrag hat dump/load-Funktionen und optional eine lokale Revision für Änderungen
+    def __init__(self, store, scope):
+        self.store = store
+        self.scope = scope
+        self._entries = {}
+        self._versions = {}
+        self._revisions = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, dump, load, revision=None):
+        # dump() liefert den lokalen Stand, load(value) übernimmt einen fremden Stand
+        # revision() zählt lokale Änderungen, damit flush() nur Geändertes schreibt
+        self._entries[name] = (dump, load, revision)
+        self._revisions[name] = revision() if revision else None
+
+    def sync(self):
+        # Übernimmt Einträge, die ein anderer Worker seit dem letzten Abgleich geschrieben hat
+        versions = self.store.versions(self.scope)
+        with self._lock:
+            for name, (dump, load, revision) in self._entries.items():
+                version = versions.get(name, 0)
+                if version <= self._versions.get(name, 0):
+                    continue
+                version, value = self.store.get(self.scope, name)
+                load(value)
+                self._versions[name] = version
+                self._revisions[name] = revision() if revision else None
+
+    def flush(self):
+        # Schreibt lokal geänderte Einträge in den gemeinsamen Speicher
+        for name, (dump, load, revision) in self._entries.items():
+            if revision and revision() != self._revisions.get(name):
+                self.save(name)
+
+    def save(self, name):
+        # Schreibt einen Eintrag sofort (letzter Schreiber gewinnt)
+        dump, load, revision = self._entries[name]
+        with self._lock:
+            current_revision = revision() if revision else None
+            self._versions[name] = self.store.put(self.scope, name, dump())
+            self._revisions[name] = current_revision
+            return self._versions[name]
+
+    def versions(self):
+        # Lokal bekannte Versionen aller Einträge
+        with self._lock:
+            return dict(self._versions)
+
+
+def create_state_store(name, path=None):
+    # Erstellt den Speicher anhand seines Namens
+    if name == MemoryStateStore.name:
+        return MemoryStateStore()
+    if name == SQLiteStateStore.name:
+        return SQLiteStateStore(path)
+    raise ValueError(f"Unbekannter State Store: {name}")
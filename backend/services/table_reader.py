@@ -0,0 +1,156 @@
+import csv
+import io
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from config import Config
+
+# Standardwerte von pandas für fehlende Zellen
+DEFAULT_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+                     '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+SUPPORTED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'parquet'}
+
+
+def file_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+
+
+def read_table(source, filename=None, columns=None, na_values=DEFAULT_NA_VALUES, text_columns=()):
+    # Liest eine Tabelle (Excel, CSV oder Parquet) direkt aus einem Pfad oder Upload-Stream
+    # columns: nur diese Spalten werden übernommen (fehlende Spalten prüft die Validierung)
+    # na_values: Texte, die als leere Zelle gelten (NaN)
+    # text_columns: Spalten, die als Text gelesen werden (z.B. PLZ "01067" statt der Zahl 1067)
+    filename = filename or (source if isinstance(source, str) else getattr(source, 'name', ''))
+    extension = file_extension(str(filename))
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Nicht unterstütztes Dateiformat: {extension or 'unbekannt'}")
+
+    with _seekable(source) as stream:
+        if extension == 'xlsx':
+            return _read_xlsx(stream, columns, na_values, text_columns)
+        if extension == 'csv':
+            return _read_csv(stream, columns, na_values, text_columns)
+        if extension == 'parquet':
+            return _read_parquet(stream, columns, text_columns)
+        # Altes .xls-Format: openpyxl kann es nicht lesen
+        df = pd.read_excel(stream, keep_default_na=False, na_values=na_values,
+                           dtype={name: str for name in text_columns})
+        return df[[c for c in df.columns if c in columns]] if columns else df
+
+
+def _read_xlsx(stream, columns, na_values, text_columns):
+    # Liest das erste Tabellenblatt zeilenweise (read-only), gespeichert werden nur die benötigten Spalten
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        selected = [(index, str(name)) for index, name in enumerate(header)
+                    if name is not None and (columns is None or str(name) in columns)]
+        data = {name: [] for _, name in selected}
+        na_set = set(na_values)
+        text_set = set(text_columns)
+        nan = float('nan')
+        for row in rows:
+            values = [row[index] if index < len(row) else None for index, _ in selected]
+            # Leere Zeilen (z.B. formatierte, aber unbenutzte Zeilen am Ende) überspringen
+            if all(value is None or value == '' for value in values):
+                continue
+            for (_, name), value in zip(selected, values):
+                if value is None or (isinstance(value, str) and value in na_set):
+                    value = nan
+                elif name in text_set:
+                    value = _as_text(value)
+                data[name].append(value)
+        return pd.DataFrame(data)
+    finally:
+        workbook.close()
+
+
+def _read_csv(stream, columns, na_values, text_columns):
+    # CSV mit automatisch erkanntem Trennzeichen (Komma, Semikolon oder Tab)
+    sample = stream.read(64 * 1024)
+    stream.seek(0)
+    encoding = 'utf-8-sig'
+    try:
+        text = sample.decode(encoding)
+    except UnicodeDecodeError:
+        # Export aus Excel unter Windows
+        encoding = 'cp1252'
+        text = sample.decode(encoding)
+    try:
+        delimiter = csv.Sniffer().sniff(text.split('\n', 1)[0], delimiters=',;\t').delimiter
+    except csv.Error:
+        delimiter = ','
+    return pd.read_csv(
+        stream,
+        sep=delimiter,
+        encoding=encoding,
+        usecols=(lambda name: name in columns) if columns else None,
+        keep_default_na=False,
+        na_values=na_values,
+        dtype={name: str for name in text_columns}
+    )
+
+
+def _read_parquet(stream, columns, text_columns):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError('Parquet-Dateien benötigen das Paket pyarrow.')
+    parquet_file = pq.ParquetFile(stream)
+    available = parquet_file.schema_arrow.names
+    selected = [name for name in available if columns is None or name in columns]
+    df = parquet_file.read(columns=selected).to_pandas()
+    # Als Zahl gespeicherte Textspalten wie bei CSV und Excel als Text übernehmen
+    for name in text_columns:
+        if name in df.columns and df[name].dtype != object:
+            df[name] = df[name].map(lambda value: value if pd.isna(value) else _as_text(value)).astype(object)
+    return df
+
+
+def _as_text(value):
+    # Zahl aus einer Textspalte als Text (ganze Zahlen ohne ".0", z.B. 51643.0 -> "51643")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class _seekable:
+    # Stellt einen durchsuchbaren Stream bereit; nicht durchsuchbare Upload-Streams werden in eine
+    # SpooledTemporaryFile kopiert (im Speicher bis UPLOAD_SPOOL_MAX_MB, darüber auf der Festplatte)
+    def __init__(self, source):
+        self.source = source
+        self._opened = None
+
+    def __enter__(self):
+        if isinstance(self.source, (str, os.PathLike)):
+            self._opened = open(self.source, 'rb')
+            return self._opened
+        stream = getattr(self.source, 'stream', self.source)
+        if _is_seekable(stream):
+            stream.seek(0)
+            return stream
+        self._opened = tempfile.SpooledTemporaryFile(max_size=Config.UPLOAD_SPOOL_MAX_MB * 1024 * 1024)
+        shutil.copyfileobj(stream, self._opened)
+        self._opened.seek(0)
+        return self._opened
+
+    def __exit__(self, *exc):
+        if self._opened is not None:
+            self._opened.close()
+        return False
+
+
+def _is_seekable(stream):
+    try:
+        return stream.seekable()
+    except (AttributeError, io.UnsupportedOperation, ValueError):
+        return False
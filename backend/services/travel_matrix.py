@@ -0,0 +1,239 @@
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from services.local_solver import haversine_travel, ROAD_DETOUR_FACTOR, AVERAGE_SPEED_KMH
+
+
+class HaversineMatrixProvider:
+    # Lokale Schätzung der Fahrzeiten über die Luftlinie (ohne Netzwerk, z.B. für Tests)
+    name = 'haversine'
+
+    def fetch(self, origins, destinations):
+        # Gibt (Sekunden, Meter) als Matrizen origins x destinations zurück
+        origins = np.radians(np.asarray(origins, dtype=np.float64).reshape(-1, 2))
+        destinations = np.radians(np.asarray(destinations, dtype=np.float64).reshape(-1, 2))
+        lat1, lon1 = origins[:, 0:1], origins[:, 1:2]
+        lat2, lon2 = destinations[:, 0], destinations[:, 1]
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        distances = np.round(2 * 6371000 * np.arcsin(np.sqrt(a)) * ROAD_DETOUR_FACTOR)
+        durations = np.round(distances / (AVERAGE_SPEED_KMH * 1000 / 3600))
+        return durations.astype(np.float32), distances.astype(np.float32)
+
+
+class GoogleDistanceMatrixProvider:
+    # Fahrzeiten über die Google Distance Matrix API (in Blöcken von max. 100 Elementen)
+    name = 'google'
+    MAX_ORIGINS = 25
+    MAX_DESTINATIONS = 25
+    MAX_ELEMENTS = 100
+
+    def __init__(self, clients):
+        # clients: gemeinsame Google-Clients (Deadline, Backoff und Circuit Breaker je Aufruf)
+        self.clients = clients
+
+    def fetch(self, origins, destinations):
+        durations = np.full((len(origins), len(destinations)), np.nan, dtype=np.float32)
+        distances = np.full((len(origins), len(destinations)), np.nan, dtype=np.float32)
+        dest_chunk = min(self.MAX_DESTINATIONS, len(destinations))
+        origin_chunk = max(1, min(self.MAX_ORIGINS, self.MAX_ELEMENTS // dest_chunk))
+
+        for o_start in range(0, len(origins), origin_chunk):
+            for d_start in range(0, len(destinations), dest_chunk):
+                o_block = origins[o_start:o_start + origin_chunk]
+                d_block = destinations[d_start:d_start + dest_chunk]
+                result = self.clients.distance_matrix(o_block, d_block, mode='driving')
+                for i, row in enumerate(result.get('rows', [])):
+                    for j, element in enumerate(row.get('elements', [])):
+                        if element.get('status') != 'OK':
+                            continue
+                        durations[o_start + i, d_start + j] = element['duration']['value']
+                        distances[o_start + i, d_start + j] = element['distance']['value']
+
+        # Nicht auflösbare Paare werden lokal geschätzt
+        missing = np.argwhere(np.isnan(durations))
+        for i, j in missing:
+            durations[i, j], distances[i, j] = haversine_travel(origins[i], destinations[j])
+        return durations, distances
+
+
+class TravelMatrix:
+    # Persistente Fahrzeit-/Distanzmatrix zwischen geocodierten Punkten
+    # Punkte werden über gerundete Koordinaten identifiziert; fehlende Paare sind NaN
+    def __init__(self, path, provider, precision=5):
+        self.path = path
+        self.provider = provider
+        self.precision = precision
+        self.hits = 0
+        self.misses = 0
+        self.pairs_fetched = 0
+        self._index = {}
+        self._points = np.empty((0, 2), dtype=np.float64)
+        self._durations = np.empty((0, 0), dtype=np.float32)
+        self._distances = np.empty((0, 0), dtype=np.float32)
+        self._size = 0
+        self._lock = threading.RLock()
+        self._load()
+
+    def key(self, lat, lon):
+        # Gerundete Koordinaten als Schlüssel
+        return round(float(lat), self.precision), round(float(lon), self.precision)
+
+    def ensure(self, points):
+        # Stellt sicher, dass alle Paare zwischen den Punkten vorhanden sind (nur fehlende werden geladen)
+        with self._lock:
+            indices = [self._add_point(lat, lon) for lat, lon in points]
+            unique = sorted(set(indices))
+            if not unique:
+                return indices
+
+            # Zeilen mit gleichen fehlenden Spalten werden gemeinsam geladen (z.B. neue Patienten)
+            missing = np.isnan(self._durations[np.ix_(unique, unique)])
+            groups = {}
+            for row, row_missing in zip(unique, missing):
+                cols = tuple(unique[j] for j in np.flatnonzero(row_missing))
+                if cols:
+                    groups.setdefault(cols, []).append(row)
+            for cols, rows in groups.items():
+                self._fetch(rows, list(cols))
+            if groups:
+                self.save()
+            return indices
+
+    def ensure_pairs(self, pairs):
+        # Lädt nur die fehlenden (Start, Ziel)-Paare, z.B. die aufeinanderfolgenden Abschnitte einer Route
+        # (ensure lädt dagegen alle Paare zwischen allen Punkten)
+        with self._lock:
+            wanted = {}
+            for origin, destination in pairs:
+                i = self._add_point(*origin)
+                j = self._add_point(*destination)
+                if np.isnan(self._durations[i, j]):
+                    wanted.setdefault(i, set()).add(j)
+
+            # Starts mit denselben fehlenden Zielen werden gemeinsam geladen (rows x cols = genau die Paare)
+            groups = {}
+            for row, cols in wanted.items():
+                groups.setdefault(tuple(sorted(cols)), []).append(row)
+            for cols, rows in groups.items():
+                self._fetch(rows, list(cols))
+            if groups:
+                self.save()
+
+    def travel(self, origin, destination):
+        # Gibt (Sekunden, Meter) zwischen zwei (lat, lon)-Punkten zurück
+        with self._lock:
+            i = self._index.get(self.key(*origin))
+            j = self._index.get(self.key(*destination))
+            if i is not None and j is not None and not np.isnan(self._durations[i, j]):
+                self.hits += 1
+                return int(self._durations[i, j]), int(self._distances[i, j])
+
+            self.misses += 1
+            i, j = self.ensure([origin, destination])
+            return int(self._durations[i, j]), int(self._distances[i, j])
+
+    def stats(self):
+        # Trefferquote und Füllstand der Matrix
+        with self._lock:
+            total = self.hits + self.misses
+            filled = int(np.count_nonzero(~np.isnan(self._durations[:self._size, :self._size])))
+            return {
+                'points': self._size,
+                'filled_pairs': filled,
+                'pairs_fetched': self.pairs_fetched,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'provider': self.provider.name
+            }
+
+    def save(self):
+        # Speichert die Matrix atomar als komprimierte .npz-Datei
+        with self._lock:
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.travel_matrix_', suffix='.npz')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez_compressed(
+                        f,
+                        points=self._points[:self._size],
+                        durations=self._durations[:self._size, :self._size],
+                        distances=self._distances[:self._size, :self._size]
+                    )
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def _load(self):
+        # Lädt eine gespeicherte Matrix
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                points = data['points']
+                durations = data['durations']
+                distances = data['distances']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Travel matrix could not be loaded: {e}")
+            return
+
+        self._grow(len(points))
+        self._size = len(points)
+        self._points[:self._size] = points
+        self._durations[:self._size, :self._size] = durations
+        self._distances[:self._size, :self._size] = distances
+        self._index = {self.key(lat, lon): i for i, (lat, lon) in enumerate(points)}
+
+    def _add_point(self, lat, lon):
+        key = self.key(lat, lon)
+        index = self._index.get(key)
+        if index is not None:
+            return index
+        if self._size == len(self._points):
+            self._grow(self._size + max(16, self._size // 4))
+        index = self._size
+        self._points[index] = key
+        self._durations[index, index] = 0
+        self._distances[index, index] = 0
+        self._index[key] = index
+        self._size += 1
+        return index
+
+    def _grow(self, capacity):
+        # Vergrößert die Arrays mit Reserve, damit neue Punkte nicht jedes Mal kopiert werden
+        if capacity <= len(self._points):
+            return
+        points = np.zeros((capacity, 2), dtype=np.float64)
+        durations = np.full((capacity, capacity), np.nan, dtype=np.float32)
+        distances = np.full((capacity, capacity), np.nan, dtype=np.float32)
+        n = len(self._points)
+        points[:n] = self._points
+        durations[:n, :n] = self._durations
+        distances[:n, :n] = self._distances
+        self._points, self._durations, self._distances = points, durations, distances
+
+    def _fetch(self, rows, cols):
+        # Lädt die Paare rows x cols über den Provider und trägt nur fehlende Werte ein
+        origins = [tuple(self._points[i]) for i in rows]
+        destinations = [tuple(self._points[j]) for j in cols]
+        durations, distances = self.provider.fetch(origins, destinations)
+        target = np.ix_(rows, cols)
+        missing = np.isnan(self._durations[target])
+        self._durations[target] = np.where(missing, durations, self._durations[target])
+        self._distances[target] = np.where(missing, distances, self._distances[target])
+        self.pairs_fetched += int(missing.sum())
+
+
+def create_matrix_provider(name, clients=None):
+    # Erstellt den Provider für die Fahrzeitmatrix anhand seines Namens
+    if name == GoogleDistanceMatrixProvider.name:
+        return GoogleDistanceMatrixProvider(clients)
+    if name == HaversineMatrixProvider.name:
+        return HaversineMatrixProvider()
+    raise ValueError(f"Unbekannter Matrix-Provider: {name}")
@@ -4,13 +4,20 @@
 
 let map;                        // Google Maps Objekt
 let markers = [];               // Alle aktuellen Marker
-let directionsRenderers = [];   // DirectionsRenderer für Routen
+let lastRoutesData = null;      // Zuletzt angezeigte Routen (für Stoppnummern nach dem Nachladen der Marker)
+let markerRequestId = 0;        // Verwirft Antworten älterer Marker-Anfragen
+let directionsRenderers = [];   // DirectionsRenderer bzw. Polylines der Routen
 let optimized_routes = [];      // Optimierte Routen
 
-// Konstanten für Verweilzeiten
-const VISIT_DWELL_TIMES = {
-    'HB': 25 * 60,          // 35 Minuten in Sekunden
-    'NA': 120 * 60 // 120 Minuten in Sekunden
+// Cache für Directions-Ergebnisse (Schlüssel: Startpunkt und Reihenfolge der Stopps)
+const directionsCache = new Map();
+const DIRECTIONS_CACHE_SIZE = 200;
+
+// Farben für den Status der Routendauer (Soft-Limit = Stellenumfang, Hard-Limit = +30 Minuten)
+const LIMIT_STATUS_COLORS = {
+    'ok': 'green',
+    'soft': 'orange',
+    'hard': 'red'
 };
 
 // Feste Farbpalette (30 gut unterscheidbare Farben)
@@ -64,26 +71,54 @@ async function initMap() {
             document.getElementById('resultsSection').style.display = 'block';
         }
         
-        // Dann lade die Marker mit den bereits geladenen Routen
+        // Dann lade die Marker mit den bereits geladenen Routen (sobald der Kartenausschnitt feststeht)
+        await waitForMapIdle();
         await loadMarkers(routesData);
     } catch (error) {
         console.error("Fehler beim Laden der Daten:", error);
         // Lade Marker auch wenn keine Routen geladen werden konnten
         await loadMarkers();
     }
+
+    // Nach Verschieben oder Zoomen nur die Marker des neuen Ausschnitts laden
+    let idleTimer = null;
+    map.addListener('idle', () => {
+        clearTimeout(idleTimer);
+        idleTimer = setTimeout(() => loadMarkers(), 250);
+    });
+}
+
+// Wartet, bis die Karte ihren ersten Ausschnitt kennt
+function waitForMapIdle() {
+    if (map.getBounds()) return Promise.resolve();
+    return new Promise(resolve => google.maps.event.addListenerOnce(map, 'idle', resolve));
+}
+
+// URL für die Marker; mit Kartenausschnitt und Zoom liefert der Server nur sichtbare Punkte bzw. Cluster
+function getMarkersUrl() {
+    const bounds = map?.getBounds();
+    if (!bounds) return '/get_markers';
+    const sw = bounds.getSouthWest();
+    const ne = bounds.getNorthEast();
+    const bbox = [sw.lat(), sw.lng(), ne.lat(), ne.lng()].map(value => value.toFixed(5)).join(',');
+    return `/get_markers?bbox=${bbox}&zoom=${map.getZoom()}`;
 }
 
 // Marker vom Server laden
 async function loadMarkers(existingRoutesData = null) {
-    clearMarkers();
+    if (existingRoutesData) lastRoutesData = existingRoutesData;
+    const requestId = ++markerRequestId;
     try {
-        const response = await fetch('/get_markers');
+        const response = await fetch(getMarkersUrl());
         const data = await response.json();
+        // Eine neuere Anfrage (z.B. nach weiterem Verschieben) ist bereits unterwegs
+        if (requestId !== markerRequestId) return;
+        clearMarkers();
         
         // Erstelle Map von Patient zu Stopp-Nummer
         const stopNumbers = new Map();
-        if (existingRoutesData?.status === 'success') {
-            existingRoutesData.routes.forEach(route => {
+        if (lastRoutesData?.routes) {
+            lastRoutesData.routes.forEach(route => {
                 route.stops.forEach((stop, index) => {
                     if (stop.visit_type !== 'TK') {
                         stopNumbers.set(stop.patient, (index + 1).toString());
@@ -197,6 +232,44 @@ async function loadMarkers(existingRoutesData = null) {
                 name: v.name
             };
         });
+
+        // Cluster (nur bei niedriger Zoomstufe und vielen Patienten im Ausschnitt)
+        (data.clusters || []).forEach(c => {
+            const marker = new google.maps.Marker({
+                position: { lat: c.lat, lng: c.lng },
+                map: map,
+                label: {
+                    text: c.count.toString(),
+                    color: '#FFFFFF',
+                    fontSize: '11px',
+                    fontWeight: 'bold'
+                },
+                icon: {
+                    path: google.maps.SymbolPath.CIRCLE,
+                    scale: Math.min(12 + Math.log2(c.count) * 3, 30),
+                    fillColor: '#00a000',
+                    fillOpacity: 0.85,
+                    strokeWeight: 2,
+                    strokeColor: "#FFFFFF"
+                },
+                title: Object.entries(c.counts).map(([type, count]) => `${type}: ${count}`).join(', ')
+            });
+
+            // Klick zoomt auf die Patienten des Clusters
+            marker.addListener('click', () => {
+                const [south, west, north, east] = c.bounds;
+                map.fitBounds(new google.maps.LatLngBounds(
+                    { lat: south, lng: west },
+                    { lat: north, lng: east }
+                ));
+            });
+
+            markers.push(marker);
+            marker.customData = {
+                type: 'cluster',
+                count: c.count
+            };
+        });
     } catch (error) {
         console.error("Fehler beim Laden der Marker:", error);
     }
@@ -229,20 +302,28 @@ document.getElementById('optimizeButton').addEventListener('click', async () =>
     button.disabled = true;
     
     try {
-        // Sende eine POST-Anfrage an den Server, um die Routen zu optimieren
-        const response = await fetch('/optimize_route', { method: 'POST' });
+        // Optimierung als Hintergrund-Job starten
+        const response = await fetch('/optimize_jobs', { method: 'POST' });
         const data = await response.json();
+        if (data.status !== 'success') {
+            console.error("Optimierungsfehler:", data.message);
+            window.location.reload();
+            return;
+        }
 
-        // Wenn die Optimierung erfolgreich war, zeige die Routen an
-        if (data.status === 'success') {
-            displayRoutes(data);
+        // Auf das Ende des Jobs warten und das Ergebnis anzeigen
+        const job = await waitForJob(data.job.id);
+        if (job.status === 'succeeded') {
+            const resultResponse = await fetch(`/optimize_jobs/${job.id}/result`);
+            const result = await resultResponse.json();
+            displayRoutes(result);
             document.getElementById('resultsSection').style.display = 'block';
         } else {
-            console.error("Optimierungsfehler:", data.message);
+            console.error("Optimierungsfehler:", job.error || job.message);
             window.location.reload();
         }
     } catch (error) {
-        console.error("Fetch-Fehler bei /optimize_route:", error);
+        console.error("Fetch-Fehler bei /optimize_jobs:", error);
     } finally {
         // Animation stoppen
         icon.classList.remove('spinning');
@@ -250,6 +331,41 @@ document.getElementById('optimizeButton').addEventListener('click', async () =>
     }
 });
 
+// Wartet per Server-Sent Events auf das Ende eines Optimierungs-Jobs
+function waitForJob(jobId) {
+    return new Promise((resolve, reject) => {
+        const button = document.getElementById('optimizeButton');
+        const source = new EventSource(`/optimize_jobs/${jobId}/events`);
+
+        source.onmessage = (event) => {
+            const job = JSON.parse(event.data);
+            button.title = `${job.message} (${job.progress}%)`;
+            if (['succeeded', 'failed', 'cancelled'].includes(job.status)) {
+                source.close();
+                button.title = '';
+                resolve(job);
+            }
+        };
+
+        // Bei Verbindungsabbruch auf Abfragen des Status ausweichen
+        source.onerror = async () => {
+            source.close();
+            try {
+                let job;
+                do {
+                    await new Promise(r => setTimeout(r, 1000));
+                    const response = await fetch(`/optimize_jobs/${jobId}`);
+                    job = (await response.json()).job;
+                } while (job && !['succeeded', 'failed', 'cancelled'].includes(job.status));
+                button.title = '';
+                job ? resolve(job) : reject(new Error('Job nicht gefunden'));
+            } catch (error) {
+                reject(error);
+            }
+        };
+    });
+}
+
 // Funktion zum Aktualisieren des Wochentags
 async function updateWeekdayDisplay() {
     try {
@@ -288,7 +404,15 @@ document.addEventListener('DOMContentLoaded', async function() {
                     body: JSON.stringify({ weekday: this.value })
                 });
                 const data = await response.json();
-                
+
+                // Ergebnis der Wochenplanung für den neuen Tag anzeigen
+                if (data.routes_restored) {
+                    const routesResponse = await fetch('/get_saved_routes');
+                    clearRoutes();
+                    displayRoutes(await routesResponse.json());
+                    document.getElementById('resultsSection').style.display = 'block';
+                }
+
                 // Aktualisiere die Anzeige und lade die Marker neu
                 await updateWeekdayDisplay();
             } catch (err) {
@@ -338,6 +462,8 @@ document.addEventListener('DOMContentLoaded', async function() {
 // Routen anzeigen
 function displayRoutes(data) {
     clearRoutes();
+    lastRoutesData = data;
+    const routePromises = [];
     // Aktualisiere die Marker-Labels für die neuen Routen
     markers.forEach(marker => {
         if (marker.customData?.type === 'patient' && !marker.customData?.isTK) {
@@ -380,7 +506,7 @@ function displayRoutes(data) {
         
         // Fahrzeug-Header mit Duration aus dem Backend
         const vehicleHeader = document.createElement('h3');
-        const durationColor = (route.duration_hrs || 0) <= route.max_hours ? 'green' : 'red';
+        const durationColor = getDurationColor(route);
 
         // Fahrzeug-Header mit Name, Funktion und Duration
         vehicleHeader.innerHTML = `
@@ -394,7 +520,9 @@ function displayRoutes(data) {
                     route.funktion === 'PDL' ? 'pdl' : ''
                 }">${route.funktion || ''}</span>
             </div>
-            <div class="duration" style="color: ${durationColor}">${route.duration_hrs || 0} / ${route.max_hours}h</div>
+            <div class="duration" style="color: ${durationColor}"${
+                route.duration_estimated ? ' title="Geschätzt über die Luftlinie (keine Straßenfahrzeiten)"' : ''
+            }>${route.duration_estimated ? 'ca. ' : ''}${route.duration_hrs || 0} / ${route.max_hours}h</div>
         `;
         routeCard.appendChild(vehicleHeader);
         
@@ -409,8 +537,11 @@ function displayRoutes(data) {
         // Filtere TK-Stopps für die Route aus
         const regularStops = route.stops.filter(stop => stop.visit_type !== 'TK');
         
-        // Nur reguläre Stopps für die Wegpunkte und Route verwenden
-        if (regularStops.length > 0) {
+        // Straßenverlauf vom Server zeichnen (ohne Directions-Anfrage)
+        if (regularStops.length > 0 && route.polyline) {
+            drawRoutePolyline(route, routeColor);
+        } else if (regularStops.length > 0) {
+            // Ohne Polyline (lokaler Optimierer oder manuell geänderte Route) über den DirectionsService
             const waypoints = regularStops.map(s => ({
                 location: new google.maps.LatLng(s.location.lat, s.location.lng),
                 stopover: true
@@ -428,9 +559,9 @@ function displayRoutes(data) {
                 optimizeWaypoints: false
             };
 
-            calculateRoute(request, routeColor, routeCard).catch(err => {
+            routePromises.push(calculateRoute(request, routeColor, routeCard).catch(err => {
                 console.error("Fehler bei der Routenberechnung:", err);
-            });
+            }));
         }
 
         // Container für alle Stopps
@@ -451,6 +582,9 @@ function displayRoutes(data) {
                     </div>
                     <div class="address">${stop.address}</div>
                     <div class="time-info">${stop.time_info || ''}</div>
+                    ${stop.arrival_time ? `<div class="arrival-time">Ankunft ${route.duration_estimated ? 'ca. ' : ''}${stop.arrival_time}${
+                        stop.travel_seconds != null ? ` · ${Math.round(stop.travel_seconds / 60)} min Fahrt` : ''
+                    }</div>` : ''}
                     <div style="display:none" data-lat="${stop.location.lat}" data-lng="${stop.location.lng}"></div>
                     <div style="display:none" data-phone="${stop.phone_numbers || ''}"></div>
                 </div>
@@ -559,77 +693,104 @@ function displayRoutes(data) {
 
     // Effekte für Routen-Hover anzeigen
     setupRouteHoverEffects();
-}
 
-// Funktion zum Aktualisieren der Routendauer
-function updateRouteDuration(routeCard, durationHrs = 0) {
-    const header = routeCard.querySelector('h3');
-    const durationSpan = header.querySelector('.duration');
-    if (!durationSpan) return;
+    return Promise.all(routePromises);
+}
 
-    const maxHours = parseFloat(durationSpan.textContent.split('/')[1].replace('h)', ''));
-    
-    // Setze die Textfarbe basierend auf dem Vergleich
-    if (parseFloat(durationHrs) <= maxHours) {
-        durationSpan.style.color = 'green';
-    } else {
-        durationSpan.style.color = 'red';
+// Farbe der Routendauer anhand des Limit-Status aus dem Backend
+function getDurationColor(route) {
+    if (route.limit_status) {
+        return LIMIT_STATUS_COLORS[route.limit_status] || 'red';
     }
-    
-    durationSpan.textContent = `${durationHrs} / ${maxHours}h`;
-    routeCard.dataset.durationHrs = durationHrs;
+    return (route.duration_hrs || 0) <= route.max_hours ? 'green' : 'red';
 }
 
-// Route berechnen mit DirectionsService
-async function calculateRoute(request, routeColor, routeCard) {
-    const directionsService = new google.maps.DirectionsService();
-    
-    return new Promise((resolve, reject) => {
-        directionsService.route(request, (result, status) => {
-            if (status === 'OK') {
-                const renderer = new google.maps.DirectionsRenderer({
-                    map: map,
-                    directions: result,
-                    suppressMarkers: true,
-                    preserveViewport: true,
-                    polylineOptions: {
-                        strokeColor: routeColor,
-                        strokeOpacity: 0.8,
-                        strokeWeight: 4
-                    }
-                });
+// Dekodiert eine Google Encoded Polyline in eine Liste von {lat, lng}
+function decodePolyline(encoded) {
+    const points = [];
+    let index = 0, lat = 0, lng = 0;
+    while (index < encoded.length) {
+        for (const axis of ['lat', 'lng']) {
+            let result = 0, shift = 0, byte;
+            do {
+                byte = encoded.charCodeAt(index++) - 63;
+                result |= (byte & 0x1f) << shift;
+                shift += 5;
+            } while (byte >= 0x20);
+            const delta = (result & 1) ? ~(result >> 1) : (result >> 1);
+            if (axis === 'lat') lat += delta; else lng += delta;
+        }
+        points.push({ lat: lat / 1e5, lng: lng / 1e5 });
+    }
+    return points;
+}
 
-                // Setze den Namen der Route in customData
-                const vehicleName = routeCard.querySelector('.stops-container').getAttribute('data-vehicle');
-                renderer.customData = {
-                    vehicleName: vehicleName
-                };
+// Zeichnet den vom Optimierer gelieferten Straßenverlauf einer Route
+function drawRoutePolyline(route, routeColor) {
+    const polyline = new google.maps.Polyline({
+        map: map,
+        path: decodePolyline(route.polyline),
+        strokeColor: routeColor,
+        strokeOpacity: 0.8,
+        strokeWeight: 4
+    });
+    // Wird wie ein DirectionsRenderer ein- und ausgeblendet
+    polyline.customData = {
+        vehicleName: route.vehicle
+    };
+    directionsRenderers.push(polyline);
+}
 
-                directionsRenderers.push(renderer);
+// Schlüssel für den Directions-Cache aus Start, Wegpunkten und Ziel
+function getDirectionsCacheKey(request) {
+    const points = [request.origin, ...request.waypoints.map(w => w.location), request.destination];
+    return points.map(p => `${p.lat().toFixed(5)},${p.lng().toFixed(5)}`).join('|');
+}
 
-                // Berechne Gesamtdauer (Fahrzeit)
-                let totalDuration = 0;
-                result.routes[0].legs.forEach(leg => {
-                    totalDuration += leg.duration.value;
-                });
+// Route berechnen mit DirectionsService (unveränderte Routen kommen aus dem Cache)
+async function calculateRoute(request, routeColor, routeCard) {
+    const cacheKey = getDirectionsCacheKey(request);
+    let result = directionsCache.get(cacheKey);
+
+    if (!result) {
+        const directionsService = new google.maps.DirectionsService();
+        result = await new Promise((resolve, reject) => {
+            directionsService.route(request, (result, status) => {
+                if (status === 'OK') {
+                    resolve(result);
+                } else {
+                    reject(status);
+                }
+            });
+        });
 
-                // Füge Verweilzeiten für jeden Stop hinzu
-                const stops = routeCard.querySelector('.stops-container').querySelectorAll('.stop-card:not(.tk-stop)');
-                stops.forEach(stop => {
-                    const visitType = stop.querySelector('.visit-type').textContent;
-                    totalDuration += VISIT_DWELL_TIMES[visitType] || 0;
-                });
-                
-                // Konvertiere zu Stunden und aktualisiere die Anzeige
-                const durationHrs = (totalDuration / 3600).toFixed(2);
-                updateRouteDuration(routeCard, durationHrs);
+        // Ältesten Eintrag entfernen, wenn der Cache voll ist
+        if (directionsCache.size >= DIRECTIONS_CACHE_SIZE) {
+            directionsCache.delete(directionsCache.keys().next().value);
+        }
+        directionsCache.set(cacheKey, result);
+    }
 
-                resolve(result);
-            } else {
-                reject(status);
-            }
-        });
+    const renderer = new google.maps.DirectionsRenderer({
+        map: map,
+        directions: result,
+        suppressMarkers: true,
+        preserveViewport: true,
+        polylineOptions: {
+            strokeColor: routeColor,
+            strokeOpacity: 0.8,
+            strokeWeight: 4
+        }
     });
+
+    // Setze den Namen der Route in customData
+    const vehicleName = routeCard.querySelector('.stops-container').getAttribute('data-vehicle');
+    renderer.customData = {
+        vehicleName: vehicleName
+    };
+
+    directionsRenderers.push(renderer);
+    return result;
 }
 
 // ==========================================
@@ -754,60 +915,12 @@ async function handleDrop(e) {
         // Aktualisiere die Stoppnummern
         updateStopNumbers();
 
-        const routePromises = [];
-        
-        // Aktualisiere ALLE Mitarbeiter-Container
-        document.querySelectorAll('.stops-container:not([data-vehicle="tk"]):not([data-vehicle="regular"])').forEach(container => {
-            const routeCard = container.closest('.route-card');
-            if (!routeCard) return;
-
-            const routeColor = routeCard.style.borderColor;
-            const regularStops = [...container.querySelectorAll('.stop-card:not(.tk-stop)')];
-            
-            // Wenn keine Hausbesuche in der Route sind, setze die Dauer auf 0
-            if (regularStops.length === 0) {
-                updateRouteDuration(routeCard, 0);
-            } else {
-                // Hole den Startpunkt der Route
-                const origin = new google.maps.LatLng(
-                    routeCard.dataset.vehicleStartLat, 
-                    routeCard.dataset.vehicleStartLng
-                );
-                
-                // Erstelle Waypoints für die Route
-                const waypoints = regularStops.map(stop => ({
-                    location: new google.maps.LatLng(
-                        parseFloat(stop.querySelector('[data-lat]').dataset.lat),
-                        parseFloat(stop.querySelector('[data-lat]').dataset.lng)
-                    ),
-                    stopover: true
-                }));
-
-                // Erstelle die DirectionsRequest
-                const request = {
-                    origin: origin,
-                    destination: origin,
-                    waypoints: waypoints,
-                    travelMode: google.maps.TravelMode.DRIVING,
-                    optimizeWaypoints: false
-                };
-
-                routePromises.push(calculateRoute(request, routeColor, routeCard));
-            }
-        });
-
         try {
-            await Promise.all(routePromises);
-            
             // Hole den Namen direkt vom targetContainer
             const vehicleName = targetContainer.getAttribute('data-vehicle');
             
-            // Warte auf das Update der optimierten Routen
-            await new Promise(resolve => {
-                updateOptimizedRoutes();
-                // Gib dem System Zeit, die Routen zu aktualisieren
-                setTimeout(resolve, 100);
-            });
+            // Dauern werden im Backend neu berechnet, nur geänderte Routen werden neu gezeichnet
+            await updateOptimizedRoutes();
 
             // Setze Zoom zurück
             map.setZoom(9);
@@ -967,7 +1080,7 @@ function updateOptimizedRoutes() {
     });
 
     // Sende die Routen und unzugewiesenen Stops an das Backend
-    fetch('/update_routes', {
+    return fetch('/update_routes', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
@@ -981,9 +1094,8 @@ function updateOptimizedRoutes() {
     .then(response => response.json())
     .then(data => {
         if (data.status === 'success') {
-            clearRoutes();
             // Zeige die Routen mit den aktualisierten Werten aus dem Backend an
-            displayRoutes(data);
+            return displayRoutes(data);
         }
     })
     .catch(error => console.error('Error updating routes:', error));
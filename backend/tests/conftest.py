@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests laufen aus backend/tests, die Module liegen in backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,41 @@
+import threading
+import time
+
+from services.metrics import Histogram, timed_call, EXTERNAL_CALL_SECONDS
+
+
+def test_timer_decorator_measures_concurrent_calls_separately():
+    # Parallele Aufrufe derselben dekorierten Funktion dürfen sich den Startzeitpunkt nicht teilen
+    histogram = Histogram('test_stage_seconds', 'Test', ['stage'])
+
+    @histogram.time(stage='parallel')
+    def work(seconds):
+        time.sleep(seconds)
+
+    slow = threading.Thread(target=work, args=(0.5,))
+    slow.start()
+    time.sleep(0.1)
+    work(0.05)
+    slow.join()
+
+    counts, total, count = histogram.samples()[('parallel',)]
+    assert count == 2
+    # Ohne eigene Instanz je Aufruf ergibt sich etwa 0.5 - 0.1 + 0.05 statt 0.5 + 0.05
+    assert total >= 0.55
+
+
+def test_timed_call_decorator_measures_concurrent_calls_separately():
+    @timed_call('test_api')
+    def call(seconds):
+        time.sleep(seconds)
+
+    before = EXTERNAL_CALL_SECONDS.samples().get(('test_api', 'ok'), [None, 0.0, 0])
+    slow = threading.Thread(target=call, args=(0.5,))
+    slow.start()
+    time.sleep(0.1)
+    call(0.05)
+    slow.join()
+
+    _, total, count = EXTERNAL_CALL_SECONDS.samples()[('test_api', 'ok')]
+    assert count - before[2] == 2
+    assert total - before[1] >= 0.55